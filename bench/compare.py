@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+'''
+performance regression gate: run the pipeline benchmark suite, write the
+results to JSON and compare them with the committed baseline (baseline.json)
+
+Each configuration of SUITE runs --repeat times, each run in a fresh
+process (pipeline_bench.py), and the median is compared, so one slow run
+does not fail the gate. A metric regresses when its median is worse than
+the baseline median by more than the threshold *and* the new runs do not
+overlap with the baseline runs, i.e. even the best new run is worse than
+the worst baseline run.
+
+Times are scaled by a calibration loop that does not touch the repo's
+code, run just before and after each configuration, so a baseline recorded
+on another machine (or while this one was busier) is still usable.
+
+usage:
+  ./compare.py                  # run, write results.json, compare with baseline.json
+  ./compare.py --update         # run and write the new baseline.json
+  ./compare.py --results r.json # compare an existing results file, do not run
+exit status: 1 if anything regressed
+'''
+
+import os, sys, json, time, subprocess, tempfile, argparse, statistics
+
+__author__ = "Hai Hu"
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, 'baseline.json')
+
+# configurations of pipeline_bench.py
+SUITE = [
+    {'name': 'easyccg-len12', 'parser': 'easyccg', 'n': 300, 'length': 12},
+    {'name': 'easyccg-len40', 'parser': 'easyccg', 'n': 60, 'length': 40},
+    {'name': 'candc-len12', 'parser': 'candc', 'n': 200, 'length': 12},
+]
+
+# per-stage totals below this (ms) are too small to compare reliably
+MIN_STAGE_MS = 5.0
+
+# stages that were merged into another one: { old metric : metric now }
+MERGED = {'ms.getImpSign': 'ms.polarize'}  # polarize(impSign=True) does it
+
+def calibrate(rounds=5):
+    """ seconds of a fixed pure-python workload (min of rounds) """
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        d = {}
+        for i in range(200000):
+            d[i % 1000] = str(i) + 'x'
+        ''.join(sorted(d.values()))
+        secs = time.perf_counter() - start
+        best = secs if best is None else min(best, secs)
+    return best
+
+def run_config(config, repeat):
+    """ run one configuration repeat times, return the list of reports """
+    reports = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for i in range(repeat):
+            fn_json = os.path.join(tmpdir, 'r{}.json'.format(i))
+            cmd = [sys.executable, os.path.join(HERE, 'pipeline_bench.py'),
+                   '--parser', config['parser'], '-n', str(config['n']),
+                   '--length', str(config['length']), '--json', fn_json]
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+            with open(fn_json) as f: reports.append(json.load(f))
+    return reports
+
+def summarize(reports):
+    """ {metric: [value of each run]} of one configuration """
+    runs = {'trees_per_sec': [r['trees_per_sec'] for r in reports],
+            'peak_rss_kb': [r['peak_rss_kb'] for r in reports]}
+    for name in reports[0]['run']:
+        runs['ms.' + name] = [r['run'][name] for r in reports]
+    for name in reports[0]['stages']:
+        runs['ms.' + name] = [r['stages'][name]['total_ms'] for r in reports]
+    if 'gc' in reports[0]: runs['ms.gc'] = [r['gc']['total_ms'] for r in reports]
+    return runs
+
+def run_suite(repeat):
+    results = {'repeat': repeat, 'configs': {}}
+    for config in SUITE:
+        print('running {} x{} ...'.format(config['name'], repeat), file=sys.stderr)
+        calibration = calibrate()
+        runs = summarize(run_config(config, repeat))
+        results['configs'][config['name']] = {
+            'config': config, 'calibration_sec': min(calibration, calibrate()), 'runs': runs}
+    return results
+
+def merge_stages(base_runs, new_runs):
+    """ base_runs with the stages of MERGED added to the ones they are now
+    part of, if new_runs no longer has them """
+    base_runs = dict(base_runs)
+    for old, now in MERGED.items():
+        if old in base_runs and old not in new_runs and now in base_runs:
+            base_runs[now] = [a + b for a, b in zip(base_runs[now], base_runs.pop(old))]
+    return base_runs
+
+def compare(base, new, max_time_pct, max_mem_pct):
+    """ print a per-stage diff, return the number of regressions """
+    n_regress = 0
+    for name, new_config in new['configs'].items():
+        if name not in base['configs']:
+            print('\n{}: not in baseline, skipped'.format(name))
+            continue
+        base_runs = merge_stages(base['configs'][name]['runs'], new_config['runs'])
+        # > 1 if this machine is slower than the one the baseline was recorded on
+        speed = new_config['calibration_sec'] / base['configs'][name]['calibration_sec']
+        print('\n{} (calibration: {:.2f}x the baseline speed)'.format(name, 1 / speed))
+        print('  {:<22} {:>12} {:>12} {:>9}  {}'.format('metric', 'baseline', 'new', 'change', ''))
+        for metric, new_values in new_config['runs'].items():
+            if metric not in base_runs: continue
+            base_values = base_runs[metric]
+            # scale the baseline to this machine; memory is not scaled
+            if metric.startswith('ms.'): base_values = [v * speed for v in base_values]
+            elif metric == 'trees_per_sec': base_values = [v / speed for v in base_values]
+            base_med, new_med = statistics.median(base_values), statistics.median(new_values)
+            if base_med == 0: continue
+            change = 100 * (new_med - base_med) / base_med
+            # higher is better for throughput, lower for time and memory
+            if metric == 'trees_per_sec':
+                worse = -change > max_time_pct and max(new_values) < min(base_values)
+            elif metric == 'peak_rss_kb':
+                worse = change > max_mem_pct and min(new_values) > max(base_values)
+            else:
+                worse = change > max_time_pct and min(new_values) > max(base_values) \
+                        and new_med >= MIN_STAGE_MS
+            status = 'REGRESSION' if worse else ''
+            n_regress += worse
+            print('  {:<22} {:>12.1f} {:>12.1f} {:>+8.1f}%  {}'.format(
+                metric, base_med, new_med, change, status))
+    return n_regress
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark regression gate')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=5,
+                        help="runs per configuration [default: %(default)s]")
+    parser.add_argument('--baseline', dest='baseline', type=str, default=BASELINE,
+                        help="[default: %(default)s]")
+    parser.add_argument('--out', dest='out', type=str, default='results.json',
+                        help="where to write the results [default: %(default)s]")
+    parser.add_argument('--results', dest='results', type=str, default=None,
+                        help="compare this results file instead of running the suite")
+    parser.add_argument('--update', dest='update', action='store_true',
+                        help="write the results as the new baseline, do not compare")
+    parser.add_argument('--max-time-regress', dest='max_time_pct', type=float, default=10,
+                        help="allowed slowdown of throughput and each stage, in %% "
+                             "[default: %(default)s]")
+    parser.add_argument('--max-mem-regress', dest='max_mem_pct', type=float, default=10,
+                        help="allowed increase of peak memory, in %% [default: %(default)s]")
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results) as f: new = json.load(f)
+    else:
+        new = run_suite(args.repeat)
+        fn_out = args.baseline if args.update else args.out
+        with open(fn_out, 'w') as f:
+            json.dump(new, f, indent=1)
+            f.write('\n')
+        print('results written to {}'.format(fn_out), file=sys.stderr)
+        if args.update: return
+
+    with open(args.baseline) as f: base = json.load(f)
+    n_regress = compare(base, new, args.max_time_pct, args.max_mem_pct)
+    if n_regress:
+        print('\n{} regression(s) over {}% time / {}% memory'.format(
+            n_regress, args.max_time_pct, args.max_mem_pct))
+        sys.exit(1)
+    print('\nno regressions')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+'''
+deterministic generator of synthetic CCG parses, so the pipeline can be
+benchmarked offline without a parser installed
+
+Sentences come from a small grammar (determiners, quantifiers, proper names,
+adjectives, relative clauses, NP and VP coordination, `did not') and are
+written as derivations in the formats getMono.py reads:
+
+- easyccg / depccg extended format, after the ( -> { substitution in
+  parse.sh (--raw for the parser's own parentheses)
+- C&C xml
+
+usage: ./gen_parses.py -n 1000 --length 12 --parser easyccg -o bench
+writes bench.easyccg.parsed.txt, bench.tok.clean and an empty bench.tok.preprocess.log
+'''
+
+import os, random, argparse
+
+__author__ = "Hai Hu"
+
+PARSERS = ('candc', 'easyccg', 'depccg')
+
+# (word, lemma)
+QUANTIFIERS = [("every", "every"), ("no", "no"), ("some", "some"), ("each", "each"),
+               ("most", "most"), ("several", "several")]
+ARTICLES = [("a", "a"), ("the", "the")]
+NOUNS = [("man", "man"), ("woman", "woman"), ("dog", "dog"), ("cat", "cat"),
+         ("student", "student"), ("linguist", "linguist"), ("bird", "bird"), ("car", "car")]
+NAMES = [("John", "john"), ("Mary", "mary"), ("Fido", "fido"), ("Kim", "kim")]
+ADJS = [("old", "old"), ("red", "red"), ("happy", "happy"), ("small", "small")]
+# (3rd person, base, lemma)
+IVS = [("sleeps", "sleep", "sleep"), ("runs", "run", "run"), ("walks", "walk", "walk"),
+       ("barks", "bark", "bark"), ("dances", "dance", "dance")]
+TVS = [("likes", "like", "like"), ("sees", "see", "see"), ("chases", "chase", "chase"),
+       ("knows", "know", "know"), ("admires", "admire", "admire")]
+RC_PRONS = [("who", "who", "WP"), ("that", "that", "WDT")]
+
+class Options:
+    """ knobs of the grammar; probabilities are per expandable node """
+    def __init__(self, length=12, max_depth=6, quant=0.6, rc=0.25, conj=0.15,
+                 neg=0.15, adj=0.2, period=0.5):
+        self.length = length        # target number of tokens per sentence
+        self.max_depth = max_depth  # max nesting of NPs / VPs
+        self.quant = quant          # P(determiner is a quantifier, not a/the)
+        self.rc = rc                # P(NP has a relative clause)
+        self.conj = conj            # P(NP / VP is a coordination)
+        self.neg = neg              # P(VP is `did not VP')
+        self.adj = adj              # P(NP has an adjective)
+        self.period = period        # P(sentence ends with .)
+
+# ----------------------------------------------
+# trees: ('L', cat, word, lemma, pos) and ('T', cat, rule, [children])
+
+def leaf(cat, word, lemma, pos):
+    return ('L', cat, word, lemma, pos)
+
+def node(cat, rule, *children):
+    return ('T', cat, rule, list(children))
+
+def n_tokens(tree):
+    if tree[0] == 'L': return 1
+    return sum(n_tokens(child) for child in tree[3])
+
+class Generator:
+    def __init__(self, opts, seed=0):
+        self.opts = opts
+        self.rand = random.Random(seed)
+
+    def choice(self, lst):
+        return self.rand.choice(lst)
+
+    def p(self, prob):
+        return self.rand.random() < prob
+
+    def sentence(self):
+        """ S[dcl] of about opts.length tokens """
+        length = max(2, self.opts.length)
+        period = length >= 4 and self.p(self.opts.period)
+        if period: length -= 1
+        subj = self.np(self.rand.randint(1, max(1, length // 3)), 0)
+        vp = self.vp(max(1, length - n_tokens(subj)), 0, 'dcl')
+        tree = node('S[dcl]', 'ba', subj, vp)
+        if period: tree = node('S[dcl]', 'rp', tree, leaf('.', '.', '.', '.'))
+        return tree
+
+    def det(self):
+        if self.p(self.opts.quant): word, lemma = self.choice(QUANTIFIERS)
+        else: word, lemma = self.choice(ARTICLES)
+        return leaf('NP/N', word, lemma, 'DT')
+
+    def noun(self):
+        word, lemma = self.choice(NOUNS)
+        return leaf('N', word, lemma, 'NN')
+
+    def np(self, budget, depth):
+        """ NP of about budget tokens """
+        opts = self.opts
+        if budget < 2 or depth >= opts.max_depth:
+            if budget < 2:  # proper name
+                word, lemma = self.choice(NAMES)
+                return node('NP', 'lex', leaf('N', word, lemma, 'NNP'))
+            return node('NP', 'fa', self.det(), self.noun())
+        # det (adj) noun is at most 3 tokens: a bigger NP has to grow
+        # by coordination or a relative clause
+        grow = budget > 3 and (opts.conj + opts.rc) > 0
+        if budget >= 5 and (self.p(opts.conj) or
+                            grow and self.p(opts.conj / (opts.conj + opts.rc))):
+            left = self.np((budget - 1) // 2, depth + 1)
+            right = self.np(budget - 1 - n_tokens(left), depth + 1)
+            return node('NP', 'ba', left,
+                        node('NP\\NP', 'conj', leaf('conj', 'and', 'and', 'CC'), right))
+        n = self.noun()
+        if budget >= 3 and self.p(opts.adj):
+            adj_word, adj_lemma = self.choice(ADJS)
+            n = node('N', 'fa', leaf('N/N', adj_word, adj_lemma, 'JJ'), n)
+        if budget - n_tokens(n) >= 3 and (grow or self.p(opts.rc)):
+            word, lemma, pos = self.choice(RC_PRONS)
+            vp = self.vp(budget - n_tokens(n) - 2, depth + 1, 'dcl')
+            rc = node('N\\N', 'fa', leaf('(N\\N)/(S[dcl]\\NP)', word, lemma, pos), vp)
+            n = node('N', 'ba', n, rc)
+        return node('NP', 'fa', self.det(), n)
+
+    def vp(self, budget, depth, form):
+        """ S[form]\\NP of about budget tokens, form: dcl or b """
+        opts = self.opts
+        vp_cat = 'S[{}]\\NP'.format(form)
+        if budget <= 1 or depth >= opts.max_depth:
+            word3, base, lemma = self.choice(IVS)
+            if form == 'dcl': return leaf(vp_cat, word3, lemma, 'VBZ')
+            return leaf(vp_cat, base, lemma, 'VB')
+        if form == 'dcl' and budget >= 4 and self.p(opts.neg):
+            aux = node('(S[dcl]\\NP)/(S[b]\\NP)', 'bx',
+                       leaf('(S[dcl]\\NP)/(S[b]\\NP)', 'did', 'do', 'VBD'),
+                       leaf('(S\\NP)\\(S\\NP)', 'not', 'not', 'RB'))
+            return node(vp_cat, 'fa', aux, self.vp(budget - 2, depth + 1, 'b'))
+        if budget >= 5 and self.p(opts.conj):
+            left = self.vp((budget - 1) // 2, depth + 1, form)
+            right = self.vp(budget - 1 - n_tokens(left), depth + 1, form)
+            return node(vp_cat, 'ba', left,
+                        node('({0})\\({0})'.format(vp_cat), 'conj',
+                             leaf('conj', 'and', 'and', 'CC'), right))
+        word3, base, lemma = self.choice(TVS)
+        tv_cat = '({})/NP'.format(vp_cat)
+        if form == 'dcl': tv = leaf(tv_cat, word3, lemma, 'VBZ')
+        else: tv = leaf(tv_cat, base, lemma, 'VB')
+        return node(vp_cat, 'fa', tv, self.np(budget - 1, depth + 1))
+
+def capitalize(tree):
+    """ capitalize the first word """
+    if tree[0] == 'L':
+        return leaf(tree[1], tree[2][0].upper() + tree[2][1:], tree[3], tree[4])
+    return node(tree[1], tree[2], capitalize(tree[3][0]), *tree[3][1:])
+
+# ----------------------------------------------
+# writers
+
+def words(tree):
+    if tree[0] == 'L': return [tree[2]]
+    return [w for child in tree[3] for w in words(child)]
+
+def to_easyccg(tree, raw=False):
+    """ one line of easyccg/depccg extended format """
+    out = []
+    to_easyccg_helper(tree, out)
+    s = ' '.join(out)
+    if raw: s = s.replace('{<', '(<').replace('>}', '>)').replace(' }', ' )')
+    return s
+
+def to_easyccg_helper(tree, out):
+    if tree[0] == 'L':
+        _, cat, word, lemma, pos = tree
+        out.append('{{<L {} {} {} {} O O {}>}}'.format(cat, word, lemma, pos, cat))
+    else:
+        _, cat, rule, children = tree
+        out.append('{{<T {} {} 0 {}>'.format(cat, rule, len(children)))
+        for child in children: to_easyccg_helper(child, out)
+        out.append('}')
+
+def candc_cat(cat):
+    """ C&C marks the NPs of determiners with [nb] """
+    return 'NP[nb]/N' if cat == 'NP/N' else cat
+
+def to_candc(tree):
+    """ one <ccg> element of C&C xml """
+    out = ['<ccg>']
+    to_candc_helper(tree, out, [0])
+    out.append('</ccg>')
+    return '\n'.join(out)
+
+def to_candc_helper(tree, out, start):
+    if tree[0] == 'L':
+        _, cat, word, lemma, pos = tree
+        chunk = 'I-NP' if pos in {'DT', 'NN', 'NNP', 'JJ'} else 'I-VP' if pos.startswith('V') else 'O'
+        out.append('<lf start="{}" span="1" word="{}" lemma="{}" pos="{}" chunk="{}" '
+                   'entity="O" cat="{}" />'.format(start[0], word, lemma, pos, chunk, candc_cat(cat)))
+        start[0] += 1
+    else:
+        _, cat, rule, children = tree
+        if rule == 'fa' and children[0][0] == 'L' and children[0][1] == 'NP/N': cat = 'NP[nb]'
+        out.append('<rule type="{}" cat="{}">'.format(rule, cat))
+        for child in children: to_candc_helper(child, out, start)
+        out.append('</rule>')
+
+def gen_trees(n, opts, seed=0):
+    gen = Generator(opts, seed)
+    return [capitalize(gen.sentence()) for _ in range(n)]
+
+def write_corpus(prefix, parser, n, opts, seed=0, raw=False):
+    """ write prefix.{parser}.parsed.{txt,xml}, prefix.tok.clean and an empty
+    prefix.tok.preprocess.log; return the name of the parser output """
+    trees = gen_trees(n, opts, seed)
+    if parser == 'candc':
+        fn = prefix + '.candc.parsed.xml'
+        with open(fn, 'w') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<candc>\n')
+            for tree in trees: f.write(to_candc(tree) + '\n')
+            f.write('</candc>\n')
+    else:
+        fn = prefix + '.{}.parsed.txt'.format(parser)
+        with open(fn, 'w') as f:
+            for idx, tree in enumerate(trees):
+                if parser == 'depccg': f.write('ID={}, log probability=-1.0\n'.format(idx + 1))
+                else: f.write('ID={}\n'.format(idx + 1))
+                f.write(to_easyccg(tree, raw) + '\n')
+    with open(prefix + '.tok.clean', 'w') as f:
+        for tree in trees: f.write(' '.join(words(tree)) + '\n')
+    with open(prefix + '.tok.preprocess.log', 'w') as f:
+        f.write('sentId,before,after,idx,len_sent\n')
+    return fn
+
+def add_options(parser):
+    """ grammar options, shared with the other benchmarks """
+    parser.add_argument('-n', dest='n', type=int, default=1000,
+                        help="number of trees [default: %(default)s]")
+    parser.add_argument('--length', dest='length', type=int, default=12,
+                        help="tokens per sentence [default: %(default)s]")
+    parser.add_argument('--max-depth', dest='max_depth', type=int, default=6,
+                        help="max nesting of NPs / VPs [default: %(default)s]")
+    parser.add_argument('--quant', dest='quant', type=float, default=0.6,
+                        help="quantifier density: P(determiner is a quantifier) "
+                             "[default: %(default)s]")
+    parser.add_argument('--rc', dest='rc', type=float, default=0.25,
+                        help="P(NP has a relative clause) [default: %(default)s]")
+    parser.add_argument('--conj', dest='conj', type=float, default=0.15,
+                        help="P(NP or VP is a coordination) [default: %(default)s]")
+    parser.add_argument('--neg', dest='neg', type=float, default=0.15,
+                        help="P(VP is negated) [default: %(default)s]")
+    parser.add_argument('--seed', dest='seed', type=int, default=0,
+                        help="[default: %(default)s]")
+
+def options(args):
+    return Options(length=args.length, max_depth=args.max_depth, quant=args.quant,
+                   rc=args.rc, conj=args.conj, neg=args.neg)
+
+def main():
+    parser = argparse.ArgumentParser(description='generate synthetic CCG parses')
+    add_options(parser)
+    parser.add_argument('--parser', dest='parser', choices=PARSERS, default='easyccg',
+                        help="output format [default: %(default)s]")
+    parser.add_argument('--raw', dest='raw', action='store_true',
+                        help="easyccg/depccg: keep the parser's ( ), "
+                             "i.e. before the sed command in parse.sh")
+    parser.add_argument('-o', dest='prefix', type=str, default='bench',
+                        help="output prefix [default: %(default)s]")
+    args = parser.parse_args()
+    fn = write_corpus(args.prefix, args.parser, args.n, options(args), args.seed, args.raw)
+    print('wrote {} ({} bytes)'.format(fn, os.path.getsize(fn)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+'''
+import-time benchmark: `python -X importtime -c "import X"` for the scripts
+that parse.sh spawns for every file, checked against a budget.
+
+Also checks that modules only needed for candc xml (bs4, lxml) or for the
+command line (argparse) are not imported by `import X`.
+
+usage: ./importtime.py [-n 5] [--budget-scale 1.0]
+exit status is 1 if any module is over budget or imports a lazy module.
+'''
+
+import os, sys, subprocess, statistics, argparse
+
+__author__ = "Hai Hu"
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# cumulative import time budget in ms, with cached bytecode
+BUDGET_MS = {
+    'utils': 5,
+    'preprocess': 15,
+    'getMono': 20,
+    'mytree2transccg': 20,
+}
+
+# must not be imported at module level
+LAZY_MODULES = {'bs4', 'lxml', 'argparse'}
+
+def importtime(module):
+    """ run one `python -X importtime` and return
+    ({module: cumulative us}, set of imported top-level module names) """
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # measure with cached bytecode
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                         cwd=SRC, env=env, stderr=subprocess.PIPE,
+                         universal_newlines=True).stderr
+    cumulative = {}
+    imported = set()
+    for line in out.splitlines():
+        # import time:  self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line: continue
+        _, cum, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        cumulative[name] = int(cum)
+        imported.add(name.split('.')[0])
+    return cumulative, imported
+
+def main():
+    parser = argparse.ArgumentParser(description='import-time benchmark for ccg2mono')
+    parser.add_argument('-n', dest='repeat', type=int, default=5,
+                        help='number of runs per module, the median is reported '
+                             "[default: %(default)s]")
+    parser.add_argument('--budget-scale', dest='scale', type=float, default=1.0,
+                        help='multiply all budgets, e.g. 2 on a slow machine '
+                             "[default: %(default)s]")
+    args = parser.parse_args()
+
+    failed = False
+    print('{:<18}{:>12}{:>12}  {}'.format('module', 'median ms', 'budget ms', 'status'))
+    for module, budget in BUDGET_MS.items():
+        importtime(module)  # warm up: write bytecode, fill the page cache
+        times = []
+        lazy = set()
+        for _ in range(args.repeat):
+            cumulative, imported = importtime(module)
+            times.append(cumulative[module] / 1000)
+            lazy |= imported & LAZY_MODULES
+        median = statistics.median(times)
+        status = 'ok'
+        if median > budget * args.scale:
+            status = 'OVER BUDGET'
+        if lazy:
+            status = 'imports {}'.format(', '.join(sorted(lazy)))
+        failed = failed or status != 'ok'
+        print('{:<18}{:>12.1f}{:>12.1f}  {}'.format(module, median, budget * args.scale, status))
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+'''
+benchmark of the lexical marking of leaf nodes (src/lexicon.py)
+
+Times CCGtree.mark_LeafNodes per token on synthetic parses (see
+gen_parses.py), with the rules of lexicon.json and with --extra N rules
+that never match in front of them, once with the dispatch table and once
+matching every token against the rules. With the table, the cost per
+token should not depend on the number of rules.
+
+usage: ./lexicon_bench.py [-n 1000] [--extra 100 1000 10000]
+'''
+
+import os, sys, json, time, tempfile, argparse, contextlib
+
+__author__ = "Hai Hu"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import gen_parses
+import lexicon
+import getMono
+from getMono import CCGtrees, EXCLUDE
+
+class ScanLexicon(lexicon.Lexicon):
+    """ no dispatch table: every token is matched against the rules """
+    def lookup(self, token):
+        sig = self.signature(token)
+        return next((rule for rule in self.rules if rule.matches(*sig)), None)
+
+def dummy_rules(n):
+    """ n rules that match no token, with words and categories of their own """
+    return [{'word': ['DUMMY{}'.format(i)], 'cat': ['X{}/Y'.format(i)], 'mark': {'.': '+'}}
+            for i in range(n)]
+
+def time_marking(trees, lex, repeat):
+    """ best of repeat, in ns per token """
+    getMono.LEXICON = lex
+    n_tokens = sum(len(t.leafNodes) for t in trees)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for t in trees: t.mark_LeafNodes()
+        secs = time.perf_counter() - start
+        best = secs if best is None else min(best, secs)
+    return 1e9 * best / n_tokens
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark the lexical marking of leaf nodes')
+    gen_parses.add_options(parser)
+    parser.add_argument('--extra', dest='extra', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='numbers of never matching rules to add [default: %(default)s]')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=5,
+                        help='best of this many runs [default: %(default)s]')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir, open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        prefix = os.path.join(tmpdir, 'bench')
+        fn = gen_parses.write_corpus(prefix, 'easyccg', args.n, gen_parses.options(args), args.seed)
+        trees = CCGtrees(prefix + '.tok.preprocess.log')
+        trees.readEasyccgStr(fn)
+        trees = [trees.build_one_tree(idx, 'easyccg') for idx in trees.tree_idxs]
+    trees = [t for t in trees if not isinstance(t, str)]
+    with open(lexicon.DEFAULT) as f: base = json.load(f)['rules']
+    print('{} trees, {} tokens, {} rules in lexicon.json'.format(
+        len(trees), sum(len(t.leafNodes) for t in trees), len(base)))
+    print('{:>8} {:>14} {:>14}'.format('rules', 'table ns/tok', 'scan ns/tok'))
+    for extra in [0] + args.extra:
+        rules = dummy_rules(extra) + base
+        table = time_marking(trees, lexicon.Lexicon(rules, EXCLUDE), args.repeat)
+        scan = time_marking(trees, ScanLexicon(rules, EXCLUDE), args.repeat)
+        print('{:>8} {:>14.0f} {:>14.0f}'.format(len(rules), table, scan))
+    getMono.LEXICON = None
+
+if __name__ == '__main__':
+    main()
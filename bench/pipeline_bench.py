@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+'''
+benchmark of the polarization pipeline on synthetic parses (see gen_parses.py)
+
+Times each stage separately with src/timers.py:
+read -> build -> fixQuantifier -> fixNot -> fixRC -> mark -> polarize
+(with getImpSign) -> output (transccg xml, as mytree2transccg.py)
+
+and reports trees/sec, bytes/tree (parser output in, xml out), peak
+memory and the time spent in the cyclic gc. Like a batch run of
+getMono.py / mytree2transccg.py, the heap is frozen after reading
+(freeze_heap()) and each tree is dropped once it is written. Runs offline,
+no parser needed; -f benchmarks real parser output instead.
+
+usage: ./pipeline_bench.py [-n 1000] [--length 12] [--parser easyccg] [--json report.json]
+'''
+
+import os, sys, io, gc, json, time, tempfile, argparse, contextlib, resource
+
+__author__ = "Hai Hu"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import gen_parses
+from getMono import CCGtrees, Cat, CAT_CACHE, POLARIZE_ERRORS, freeze_heap
+from mytree2transccg import sentence2transccg
+from timers import StageTimers
+
+def run(fn, parser, fn_log, per_sentence=False):
+    """ run the pipeline on parser output fn, return the report (a dict) """
+    timers = StageTimers(per_sentence)
+    timed = timers.stage
+    timers.instrument(Cat, '__init__', 'cat')
+    CAT_CACHE.clear()  # every run starts cold
+    xml = io.StringIO()
+    n_trees = n_error = 0
+    start = time.perf_counter()
+    # the pipeline prints diagnostics to stdout and stderr
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        with timed('read'):
+            trees = CCGtrees(fn_log)
+            if parser == 'candc': trees.readCandCxml(fn)
+            else: trees.readEasyccgStr(fn)
+        freeze_heap()
+        gc_timer = GcTimer()
+        gc.callbacks.append(gc_timer)
+        for idx in trees.tree_idxs:
+            timers.sentence(idx)
+            with timed('build'): t = trees.build_one_tree(idx, parser, use_lemma=False)
+            trees.trees.pop(idx, None)
+            if isinstance(t, str):  # failed_to_parse
+                n_error += 1
+                continue
+            n_trees += 1
+            try:
+                with timed('fixQuantifier'): t.fixQuantifier()
+                with timed('fixNot'): t.fixNot()
+                if parser == 'candc':
+                    with timed('fixRC'): t.fixRC()
+                with timed('mark'): t.mark()
+                with timed('polarize'): t.polarize(impSign=True)
+            except POLARIZE_ERRORS:
+                n_error += 1
+            with timed('output'), contextlib.redirect_stdout(xml):
+                sentence2transccg(t, idx)
+        del t
+        gc.callbacks.remove(gc_timer)
+    wall = time.perf_counter() - start
+    timers.uninstrument()
+    gc.unfreeze()
+
+    report = timers.report()
+    report.update({
+        'parser': parser, 'trees': n_trees, 'errors': n_error,
+        'wall_sec': round(wall, 4),
+        'trees_per_sec': round(n_trees / wall, 2) if wall else None,
+        'bytes_in_per_tree': round(os.path.getsize(fn) / max(1, n_trees), 1),
+        'bytes_out_per_tree': round(len(xml.getvalue().encode('utf-8')) / max(1, n_trees), 1),
+        'peak_rss_kb': peak_rss_kb(),
+        'gc': gc_timer.report(),
+        'cat_cache': CAT_CACHE.stats(),
+    })
+    return report
+
+class GcTimer:
+    """ gc.callbacks hook: collections and time of the cyclic gc, by generation """
+    def __init__(self):
+        self.collections = [0, 0, 0]
+        self.ms = [0.0, 0.0, 0.0]
+        self.max_ms = 0.0
+        self.unreachable = 0  # objects in cycles it freed
+        self.start = None
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self.start = time.perf_counter()
+            return
+        ms = 1000 * (time.perf_counter() - self.start)
+        self.collections[info['generation']] += 1
+        self.ms[info['generation']] += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.unreachable += info['collected']
+
+    def report(self):
+        return {'collections': self.collections, 'ms': [round(ms, 3) for ms in self.ms],
+                'total_ms': round(sum(self.ms), 3), 'max_pause_ms': round(self.max_ms, 3),
+                'collected': self.unreachable}
+
+def peak_rss_kb():
+    """ peak resident memory of this process so far, in KB """
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': maxrss //= 1024  # bytes on macOS
+    return maxrss
+
+def print_report(report):
+    print('{parser}: {trees} trees ({errors} errors) in {wall_sec} s, '
+          '{trees_per_sec} trees/sec'.format(**report))
+    print('bytes/tree: {bytes_in_per_tree} in, {bytes_out_per_tree} out; '
+          'peak memory {peak_rss_kb} KB'.format(**report))
+    print('cat cache: {size} categories, {hits} hits, {misses} misses'.format(**report['cat_cache']))
+    print('gc: {} collections (gen 0/1/2), {} ms ({} ms in gen 2), max pause {} ms, '
+          '{} objects freed'.format('/'.join(map(str, report['gc']['collections'])),
+                                    report['gc']['total_ms'], report['gc']['ms'][2],
+                                    report['gc']['max_pause_ms'], report['gc']['collected']))
+    print('{:<15} {:>10} {:>10} {:>10} {:>10} {:>7}'.format(
+        'stage', 'total ms', 'mean ms', 'p90 ms', 'max ms', '%'))
+    for name, ms in report['run'].items():
+        print('{:<15} {:>10.1f} {:>10} {:>10} {:>10} {:>7.1f}'.format(
+            name, ms, '', '', '', 100 * ms / (report['wall_sec'] * 1000)))
+    for name, stats in report['stages'].items():
+        print('{:<15} {:>10.1f} {:>10.4f} {:>10.4f} {:>10.4f} {:>7.1f}'.format(
+            name, stats['total_ms'], stats['mean_ms'], stats['p90_ms'], stats['max_ms'],
+            100 * stats['total_ms'] / (report['wall_sec'] * 1000)))
+    print('(cat is the time spent in Cat(), already counted in the other stages)')
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark the polarization pipeline')
+    gen_parses.add_options(parser)
+    parser.add_argument('--parser', dest='parser', choices=gen_parses.PARSERS, default='easyccg',
+                        help="[default: %(default)s]")
+    parser.add_argument('-f', dest='filename', type=str, default=None,
+                        help='benchmark this parser output instead of generated parses')
+    parser.add_argument('-flog', dest='filename_log', type=str, default=None,
+                        help='preprocess log of -f; an empty one if not given')
+    parser.add_argument('--json', dest='json', type=str, default=None,
+                        help='also write the report as JSON to this file')
+    parser.add_argument('--per-sent', dest='per_sentence', action='store_true',
+                        help='include per-sentence timings in the JSON report')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prefix = os.path.join(tmpdir, 'bench')
+        if args.filename:
+            fn = args.filename
+            fn_log = args.filename_log
+            if fn_log is None:
+                fn_log = prefix + '.tok.preprocess.log'
+                with open(fn_log, 'w') as f: f.write('sentId,before,after,idx,len_sent\n')
+        else:
+            fn = gen_parses.write_corpus(prefix, args.parser, args.n,
+                                         gen_parses.options(args), args.seed)
+            fn_log = prefix + '.tok.preprocess.log'
+        report = run(fn, args.parser, fn_log, args.per_sentence)
+        if not args.filename:
+            report['corpus'] = {'n': args.n, 'length': args.length, 'max_depth': args.max_depth,
+                                'quant': args.quant, 'rc': args.rc, 'conj': args.conj,
+                                'neg': args.neg, 'seed': args.seed}
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=1)
+            f.write('\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+'''
+benchmark for preprocess_line() on a generated corpus (1M lines by default)
+
+Checks that the table-driven preprocess_line() gives exactly the same lines
+and the same log rows as the original chain of str.replace / re.sub, which is
+kept below as preprocess_line_reference(), then reports lines/sec for both.
+
+usage: ./preprocess_bench.py [-n 1000000] [--seed 0] [--no-reference]
+'''
+
+import os, sys, io, time, random, argparse
+
+__author__ = "Hai Hu"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import preprocess
+from preprocess import pat, fix_a_lot_of, QUANTIFIERS, \
+    PAT_someone, PAT_noone, PAT_everyone, PAT_something, PAT_nothing, PAT_everything, \
+    PAT_somewhere, PAT_nowhere, PAT_everywhere, PAT_more_than_n, PAT_less_than_n, \
+    PAT_at_least_n, PAT_at_most_n, PAT_exactly_n, PAT_some_but_not_all
+
+S_PATTERN = "{},{},{},{},{}\n"
+
+# SICK-like sentences: most lines hit one or two rewrites
+SUBJ = ["A man", "The woman", "Two dogs", "Three kids", "Someone", "Nobody", "No one",
+        "A group of four people", "A group of people", "A cluster of four men",
+        "A lot of people", "At most 5 cats", "More than three birds", "Every boy",
+        "Somebody", "Exactly 2 girls", "Some but not all players", "Less than nine cows",
+        "A few children", "At least seven men", "Everybody", "# 6"]
+VERB = ["is playing", "are not running", "does n't like", "is eating", "were sleeping",
+        "is looking at", "is riding", "are standing near", "is cutting"]
+OBJ = ["a guitar", "something", "the ball", "nothing", "a few apples", "exactly 2 fish",
+       "some but not all toys", "everything", "somewhere", "nowhere", "everywhere",
+       "five onions", "a lot of water", "at most six eggs", "the stage", "a horse"]
+# words the rewrites look for, mixed at random to catch interactions between rewrites
+NOISE = ["two", "Two", "three", "four", "Four", "five", "nine", "one", "no", "some",
+         "every", "body", "thing", "where", "someone", "nobody", "n't", "more", "less",
+         "than", "at", "most", "least", "exactly", "5", "12", "a", "A", "group", "of",
+         "lot", "few", "#", "but", "not", "all", "dog", "somewhereveryone", "at-most-3"]
+
+def gen_corpus(n, seed=0):
+    """ n deterministic lines, 1 in 10 is random noise """
+    rand = random.Random(seed)
+    lines = []
+    for _ in range(n):
+        if rand.random() < 0.1:
+            lines.append(' '.join(rand.choice(NOISE) for _ in range(rand.randint(1, 12))))
+        else:
+            lines.append(' '.join([rand.choice(SUBJ), rand.choice(VERB), rand.choice(OBJ)]))
+    return lines
+
+def preprocess_line_reference(line, fh_log, s_pattern, sent_id):
+    """ preprocess_line() before the rewrite tables, kept as the oracle """
+    line_lower = line.lower()
+    line = line.replace("#", "number")
+    line = line.replace("A group of four", "Four").replace("A group of five", "Five")
+    line = line.replace("A cluster of four", "Four")
+    line = line.replace("A group of", "Some").replace("a group of", "some")
+    if "a lot of " in line_lower:
+        line = fix_a_lot_of(line, fh_log, s_pattern, sent_id)
+    line = PAT_someone.sub("some person", line)
+    line = PAT_noone.sub("no person", line)
+    line = PAT_everyone.sub("every person", line)
+    line = PAT_something.sub("some thing", line)
+    line = PAT_nothing.sub("no thing", line)
+    line = PAT_everything.sub("every thing", line)
+    line = PAT_somewhere.sub("some place", line)
+    line = PAT_nowhere.sub("no place", line)
+    line = PAT_everywhere.sub("every place", line)
+    line = line.replace(" n't ", " not ")
+    line = line.replace('Two ', '2 ').replace(' two ', ' 2 ')
+    line = line.replace('Three ', '3 ').replace(' three ', ' 3 ')
+    line = line.replace('Four ', '4 ').replace(' four ', ' 4 ')
+    line = line.replace('Five ', '5 ').replace(' five ', ' 5 ')
+    line = line.replace('Six ', '6 ').replace(' six ', ' 6 ')
+    line = line.replace('Seven ', '7 ').replace(' seven ', ' 7 ')
+    line = line.replace('Eight ', '8 ').replace(' eight ', ' 8 ')
+    line = line.replace('Nine ', '9 ').replace(' nine ', ' 9 ')
+    if 'a few' in line_lower:
+        line = pat['a_few'].sub('several', line)
+    line = PAT_more_than_n.sub("more-than-\\1", line)
+    line = PAT_less_than_n.sub("less-than-\\1", line)
+    line = PAT_at_least_n.sub("at-least-\\1", line)
+    line = PAT_at_most_n.sub("at-most-\\1", line)
+    line = PAT_exactly_n.sub("exactly-\\1", line)
+    line = PAT_some_but_not_all.sub("some-but-not-all", line)
+    quant_cnt = 0
+    new_line = []
+    len_sent = len(line.split())
+    for idx, word in enumerate(line.split()):
+        if word.lower() in QUANTIFIERS:
+            quant_cnt += 1
+            new_line.append(word)
+        elif word.lower().startswith("more-than-") or word.lower().startswith("at-least-"):
+            new_line.append("some")
+            fh_log.write(s_pattern.format(str(sent_id), word, "some", str(idx), len_sent))
+        elif word.lower().startswith("less-than-") or word.lower().startswith("at-most-"):
+            new_line.append("no")
+            fh_log.write(s_pattern.format(str(sent_id), word, "no", str(idx), len_sent))
+        elif word.lower().startswith("exactly-"):
+            new_line.append("some")
+            fh_log.write(s_pattern.format(str(sent_id), word, "some", str(idx), len_sent))
+        else:
+            new_line.append(word)
+    line = " ".join(new_line)
+    line = line[0].upper() + line[1:]
+    return line
+
+def run(func, lines):
+    """ return (clean lines, log, seconds) """
+    fh_log = io.StringIO()
+    out = []
+    start = time.perf_counter()
+    for sent_id, line in enumerate(lines):
+        out.append(func(line, fh_log, S_PATTERN, sent_id))
+    return out, fh_log.getvalue(), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark preprocess_line()')
+    parser.add_argument('-n', dest='n', type=int, default=1000000,
+                        help="number of lines [default: %(default)s]")
+    parser.add_argument('--seed', dest='seed', type=int, default=0,
+                        help="seed of the corpus generator [default: %(default)s]")
+    parser.add_argument('--no-reference', dest='reference', action='store_false',
+                        help='only time preprocess_line(), skip the oracle and the diff')
+    args = parser.parse_args()
+
+    lines = gen_corpus(args.n, args.seed)
+    out, log, secs = run(preprocess.preprocess_line, lines)
+    print('preprocess_line           {:>10.0f} lines/sec  {:.2f} us/line'.format(
+        len(lines) / secs, secs / len(lines) * 1e6))
+    if not args.reference: return
+
+    out_ref, log_ref, secs_ref = run(preprocess_line_reference, lines)
+    print('preprocess_line_reference {:>10.0f} lines/sec  {:.2f} us/line'.format(
+        len(lines) / secs_ref, secs_ref / len(lines) * 1e6))
+    print('speedup: {:.2f}x'.format(secs_ref / secs))
+
+    n_diff = 0
+    for line, a, b in zip(lines, out, out_ref):
+        if a != b:
+            n_diff += 1
+            if n_diff <= 5: print('DIFF: {!r}\n  got:      {!r}\n  expected: {!r}'.format(line, a, b))
+    if log != log_ref:
+        print('DIFF in log rows')
+        n_diff += 1
+    if n_diff:
+        print('{} differences'.format(n_diff))
+        sys.exit(1)
+    print('output and log identical on {} lines'.format(len(lines)))
+
+if __name__ == '__main__':
+    main()
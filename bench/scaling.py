@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+'''
+complexity scaling of the pipeline stages in sentence length
+
+Runs every stage (see pipeline_bench.py) on generated trees of 5 to 500
+tokens, fits the growth exponent b of time ~ n^b per stage by least squares
+on log-log scale, and flags every stage that grows faster than n log n,
+i.e. whose exponent is above the exponent n log n itself has over the same
+lengths, plus --tolerance.
+
+A stage is fitted only over the lengths where it does work (above
+WORK_MS): the generated sentences of up to 20 tokens have almost no
+negation, so fixNot goes from nothing at n=20 to its real cost at n=50,
+which a fit over all lengths reads as n^2.
+
+Two tree shapes (gen_parses.py):
+- balanced: the default grammar, NP/VP coordination keeps trees shallow
+- deep:     no coordination, relative clauses nest, depth grows with length
+
+usage: ./scaling.py [--lengths 5 10 20 50 100 200 500] [--shape balanced deep]
+exit status: 1 if a stage is above O(n log n)
+'''
+
+import os, sys, json, math, tempfile, argparse
+
+__author__ = "Hai Hu"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import gen_parses
+import pipeline_bench
+from timers import STAGES
+
+# deep trees need more than the default recursion limit of 1000
+sys.setrecursionlimit(20000)
+
+SHAPES = {
+    'balanced': {},
+    'deep': {'conj': 0.0, 'rc': 0.5},
+}
+
+# stages faster than this (ms per tree) at the longest length are not fitted
+MIN_MS = 0.05
+# below this (ms per tree) a stage does no work, only its timer (1-4 us)
+WORK_MS = 0.005
+
+def fit_exponent(xs, ys):
+    """ slope and r^2 of log(y) = a + b log(x) """
+    lx = [math.log(x) for x in xs]
+    ly = [math.log(y) for y in ys]
+    mx, my = sum(lx) / len(lx), sum(ly) / len(ly)
+    sxx = sum((x - mx) ** 2 for x in lx)
+    sxy = sum((x - mx) * (y - my) for x, y in zip(lx, ly))
+    b = sxy / sxx
+    ss_tot = sum((y - my) ** 2 for y in ly)
+    ss_res = sum((y - (my + b * (x - mx))) ** 2 for x, y in zip(lx, ly))
+    return b, (1 - ss_res / ss_tot) if ss_tot else 1.0
+
+def measure(parser, lengths, shape, tokens, seed):
+    """ { length : (mean tokens per tree, { stage : median ms per tree }) } """
+    points = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prefix = os.path.join(tmpdir, 'scaling')
+        for length in lengths:
+            n = max(3, tokens // length)
+            opts = gen_parses.Options(length=length, max_depth=10 ** 6, **SHAPES[shape])
+            fn = gen_parses.write_corpus(prefix, parser, n, opts, seed)
+            with open(prefix + '.tok.clean') as f:
+                n_tok = sum(len(line.split()) for line in f) / n
+            report = pipeline_bench.run(fn, parser, prefix + '.tok.preprocess.log')
+            stages = {name: stats['p50_ms'] for name, stats in report['stages'].items()}
+            stages['total'] = sum(ms for name, ms in stages.items() if name != 'cat')
+            points[length] = (n_tok, stages)
+            print('  {} {:>4} tokens: {} trees'.format(shape, length, n), file=sys.stderr)
+    return points
+
+def analyse(points, tolerance):
+    """ nlogn exponent over all lengths, { stage : {exponent, r2, ms, fitted,
+    verdict} }; fitted: the lengths the exponent is fitted over """
+    lengths = sorted(points)
+    xs = [points[length][0] for length in lengths]
+    ref, _ = fit_exponent(xs, [x * math.log(x) for x in xs])
+    result = {}
+    for stage in STAGES + ('output', 'cat', 'total'):
+        if stage not in points[lengths[0]][1]: continue
+        ys = [points[length][1].get(stage, 0) for length in lengths]
+        entry = {'ms': dict(zip(lengths, ys))}
+        fitted = [i for i, y in enumerate(ys) if y >= WORK_MS]
+        if ys[-1] < MIN_MS or len(fitted) < 3:
+            entry['verdict'] = 'too fast to fit'
+        else:
+            fxs = [xs[i] for i in fitted]
+            b, r2 = fit_exponent(fxs, [ys[i] for i in fitted])
+            stage_ref, _ = fit_exponent(fxs, [x * math.log(x) for x in fxs])
+            entry.update({'exponent': round(b, 3), 'r2': round(r2, 3),
+                          'fitted': [lengths[i] for i in fitted]})
+            if b > stage_ref + tolerance: entry['verdict'] = 'ABOVE O(n log n)'
+            elif b > 1 + tolerance: entry['verdict'] = 'O(n log n)'
+            else: entry['verdict'] = 'O(n) or below'
+        result[stage] = entry
+    return ref, result
+
+def print_result(shape, lengths, ref, result):
+    print('\n{}: n log n has exponent {:.2f} over these lengths'.format(shape, ref))
+    print('{:<15} {:>8} {:>6}  {}  {}'.format(
+        'stage', 'exponent', 'r2', ' '.join('{:>8}'.format('n=' + str(l)) for l in lengths),
+        'verdict'))
+    for stage, entry in result.items():
+        verdict = entry['verdict']
+        fitted = entry.get('fitted', lengths)
+        if len(fitted) < len(lengths): verdict += ' (n >= {})'.format(fitted[0])
+        print('{:<15} {:>8} {:>6}  {}  {}'.format(
+            stage, entry.get('exponent', '-'), entry.get('r2', '-'),
+            ' '.join('{:>8.3f}'.format(entry['ms'][l]) for l in lengths), verdict))
+
+def main():
+    parser = argparse.ArgumentParser(description='complexity scaling of the pipeline stages')
+    parser.add_argument('--lengths', dest='lengths', type=int, nargs='+',
+                        default=[5, 10, 20, 50, 100, 200, 500],
+                        help="sentence lengths in tokens [default: %(default)s]")
+    parser.add_argument('--shape', dest='shapes', nargs='+', choices=sorted(SHAPES),
+                        default=['balanced', 'deep'], help="[default: %(default)s]")
+    parser.add_argument('--parser', dest='parser', choices=gen_parses.PARSERS, default='easyccg',
+                        help="[default: %(default)s]")
+    parser.add_argument('--tokens', dest='tokens', type=int, default=3000,
+                        help="tokens per length, i.e. trees = tokens / length (at least 3) "
+                             "[default: %(default)s]")
+    parser.add_argument('--tolerance', dest='tolerance', type=float, default=0.15,
+                        help="slack on the exponent before a stage is flagged "
+                             "[default: %(default)s]")
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help="[default: %(default)s]")
+    parser.add_argument('--json', dest='json', type=str, default=None,
+                        help='also write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = {}
+    flagged = []
+    for shape in args.shapes:
+        points = measure(args.parser, args.lengths, shape, args.tokens, args.seed)
+        ref, result = analyse(points, args.tolerance)
+        print_result(shape, args.lengths, ref, result)
+        results[shape] = {'nlogn_exponent': round(ref, 3), 'stages': result,
+                          'tokens_per_tree': {l: points[l][0] for l in args.lengths}}
+        flagged += ['{}/{}'.format(shape, stage) for stage, entry in result.items()
+                    if entry['verdict'].startswith('ABOVE')]
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+            f.write('\n')
+    if flagged:
+        print('\nabove O(n log n): {}'.format(', '.join(flagged)))
+        sys.exit(1)
+    print('\nno stage above O(n log n)')
+
+if __name__ == '__main__':
+    main()
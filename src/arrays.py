@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+'''
+token and span polarities of polarized trees as NumPy arrays, for
+training sets: no regex over .polarized, no xml2text.py over the xml
+
+--npz PATH on mytree2transccg.py writes PATH, either
+- a directory of .npy files (PATH does not end in .npz), which
+  load(PATH) memory-maps, so nothing is copied or read until used, or
+- one .npz file, which load(PATH) reads into memory.
+
+Sentences are rows of ragged arrays: the values of all sentences one
+after the other, and offsets, n_sent + 1 int64, where sentence i is
+values[offsets[i]:offsets[i + 1]].
+
+token_offsets                       int64
+token_ids                           int32, index in vocab (word as in the sentence)
+token_polarity, token_impsign       int8, see the codes below
+span_offsets                        int64, with --npz-spans
+span_start, span_end                int32, token indices in the sentence, end excluded
+span_polarity, span_impsign         int8, one per non-terminal node in pre-order
+polarized                           uint8, per sentence: 1 if polarized, 0 if
+                                    not (its polarities are partial) or not parsed
+vocab                               str, the token of each token_id
+
+polarity: UP 1, DOWN -1, UNK 0 (=), none 2
+impSign:  + 1, - -1, bullet 0, none 2
+
+The writer streams: every `batch` sentences the values are appended to
+the .npy files, whose headers are rewritten with the final shapes on
+close(); an .npz is zipped from them at the end. Memory is one batch
+and the vocab, whatever the number of sentences.
+'''
+
+import os, sys, struct, shutil, zipfile
+import numpy as np
+
+__author__ = "Hai Hu"
+
+POLARITY_CODES = {'UP': 1, 'DOWN': -1, 'UNK': 0, None: 2}
+IMPSIGN_CODES = {'+': 1, '-': -1, '\u2022': 0, None: 2}
+
+TOKEN_ARRAYS = (('token_ids', np.int32), ('token_polarity', np.int8),
+                ('token_impsign', np.int8))
+SPAN_ARRAYS = (('span_start', np.int32), ('span_end', np.int32),
+               ('span_polarity', np.int8), ('span_impsign', np.int8))
+HEADER_SIZE = 128  # of the .npy files, room for any shape (see npy_header)
+
+class ArrayWriter:
+    """ write getMono.Result's (e.g. Result(tree)) as ragged arrays to path """
+    def __init__(self, path, spans=False, batch=10000):
+        self.path = path
+        self.npz = path.endswith('.npz')
+        self.dir = path + '.tmp' if self.npz else path
+        os.makedirs(self.dir, exist_ok=True)
+        self.spans = spans
+        self.batch = batch
+        self.vocab = {}  # { word : token id }
+        names = TOKEN_ARRAYS + (SPAN_ARRAYS if spans else ()) + \
+            (('token_offsets', np.int64), ('polarized', np.uint8))
+        if spans: names += (('span_offsets', np.int64),)
+        self.files = {name: NpyAppender(os.path.join(self.dir, name + '.npy'), dtype)
+                      for name, dtype in names}
+        self.buffers = {name: [] for name in self.files}
+        self.n_tokens = self.n_spans = 0
+        self.buffers['token_offsets'].append(0)
+        if spans: self.buffers['span_offsets'].append(0)
+        self.n_sent = 0
+
+    def write(self, result):
+        """ append one sentence; Result() (no tree) for one that did not parse """
+        buffers, vocab = self.buffers, self.vocab
+        for word in result.words:
+            token_id = vocab.get(word)
+            if token_id is None: token_id = vocab[word] = len(vocab)
+            buffers['token_ids'].append(token_id)
+        buffers['token_polarity'] += [POLARITY_CODES.get(p, 2) for p in result.polarities]
+        buffers['token_impsign'] += [IMPSIGN_CODES.get(s, 2) for s in result.impSigns]
+        self.n_tokens += len(result.words)
+        buffers['token_offsets'].append(self.n_tokens)
+        if self.spans:
+            for start, end, _, _, polarity, impSign in result.spans:
+                buffers['span_start'].append(start); buffers['span_end'].append(end)
+                buffers['span_polarity'].append(POLARITY_CODES.get(polarity, 2))
+                buffers['span_impsign'].append(IMPSIGN_CODES.get(impSign, 2))
+            self.n_spans += len(result.spans)
+            buffers['span_offsets'].append(self.n_spans)
+        buffers['polarized'].append(1 if result.error is None and result.words else 0)
+        self.n_sent += 1
+        if self.n_sent % self.batch == 0: self.flush()
+
+    def flush(self):
+        for name, values in self.buffers.items():
+            self.files[name].append(values)
+            values.clear()
+
+    def close(self):
+        self.flush()
+        for fh in self.files.values(): fh.close()
+        vocab = np.array(list(self.vocab), dtype=str) if self.vocab else np.zeros(0, dtype='U1')
+        np.save(os.path.join(self.dir, 'vocab.npy'), vocab)
+        if self.npz:
+            # stored, as np.savez does, member by member from the .npy files
+            with zipfile.ZipFile(self.path, 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+                for name in list(self.files) + ['vocab']:
+                    zf.write(os.path.join(self.dir, name + '.npy'), name + '.npy')
+            shutil.rmtree(self.dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+class NpyAppender:
+    """ a 1-d .npy file written in pieces: a header with room for any shape,
+    the values, then the real header on close() """
+    def __init__(self, fn, dtype):
+        self.fh = open(fn, 'wb')
+        self.dtype = np.dtype(dtype)
+        self.n = 0
+        self.fh.write(npy_header(self.dtype, 0))
+
+    def append(self, values):
+        if not values: return
+        np.asarray(values, dtype=self.dtype).tofile(self.fh)
+        self.n += len(values)
+
+    def close(self):
+        self.fh.seek(0)
+        self.fh.write(npy_header(self.dtype, self.n))
+        self.fh.close()
+
+def npy_header(dtype, n):
+    """ .npy (format 1.0) header of a 1-d array of n dtype, padded to HEADER_SIZE """
+    magic = b'\x93NUMPY\x01\x00'
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': ({},), }}".format(
+        np.lib.format.dtype_to_descr(dtype), n)
+    size = HEADER_SIZE - len(magic) - 2
+    return magic + struct.pack('<H', size) + (header.ljust(size - 1) + '\n').encode('latin1')
+
+def load(path, mmap=True):
+    """ { name : array } written by ArrayWriter; the .npy of a directory are
+    memory-mapped unless mmap is False """
+    if path.endswith('.npz'):
+        with np.load(path) as npz: return {name: npz[name] for name in npz.files}
+    return {fn[:-4]: np.load(os.path.join(path, fn), mmap_mode='r' if mmap else None)
+            for fn in sorted(os.listdir(path)) if fn.endswith('.npy')}
+
+def sentence(arrays, i):
+    """ (tokens, polarity codes, impSign codes) of sentence i of load() """
+    start, end = arrays['token_offsets'][i], arrays['token_offsets'][i + 1]
+    return ([str(arrays['vocab'][j]) for j in arrays['token_ids'][start:end]],
+            arrays['token_polarity'][start:end], arrays['token_impsign'][start:end])
+
+def main():
+    """ print the sentences of an ArrayWriter output, one token + arrow at a time """
+    import argparse
+    parser = argparse.ArgumentParser(description='print the polarities of an --npz output')
+    parser.add_argument('path', help='directory of .npy files, or .npz file')
+    args = parser.parse_args()
+    arrays = load(args.path)
+    arrows = {1: '\u2191', -1: '\u2193', 0: '=', 2: '\u2193'}  # as printSent_raw()
+    for i in range(len(arrays['polarized'])):
+        tokens, polarity, _ = sentence(arrays, i)
+        sys.stdout.write(''.join('{}{} '.format(token, arrows[int(p)])
+                                 for token, p in zip(tokens, polarity)) + '\n')
+
+if __name__ == '__main__':
+    main()
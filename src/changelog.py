@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+'''
+structured preprocess change log, written by preprocess.py and read by
+CCGtrees in getMono.py
+
+test.tok.preprocess.jsonl: one line per *changed* sentence, e.g.
+
+{"sentId": 1, "len_sent": 5, "changes": [{"before": "at-most-3", "after": "no",
+ "idx": 3, "tokens": ["at-most", "3"]}]}
+
+- len_sent: number of tokens in the clean sentence (= leaves of the parse)
+- idx:      position of `after` in the clean sentence, i.e. the leaf to replace
+- tokens:   the leaves `after` is replaced with when recovering the tree
+
+test.tok.preprocess.jsonl.idx: offset index, the sorted sentIds followed by
+the byte offset of their line, both as arrays of int64 in native byte order.
+ChangeLog mmaps it and binary searches it, so looking up one sentence reads
+one line of the log, however big the corpus is.
+
+The old csv log (test.tok.preprocess.log) can still be read, see read_csv_log().
+'''
+
+import os, json, mmap, array, bisect
+
+__author__ = "Hai Hu"
+
+def change_tokens(before):
+    """ leaves to recover from `before` in the log:
+    at-most-5 -> [at-most, 5], exactly-5 -> [exactly, 5], a-lot-of -> [a-lot-of] """
+    if before == "a-lot-of": return [before]
+    if before.startswith("exactly-"): return ["exactly", before.split("-")[-1]]
+    return ["-".join(before.split("-")[:2]), before.split("-")[-1]]
+
+class ChangeLogWriter:
+    """ write test.tok.preprocess.jsonl and its index; sentIds must be increasing """
+    def __init__(self, fn):
+        self.fn = fn
+        self.fh = open(fn, 'w')
+        self.offset = 0
+        self.sent_ids = array.array('q')
+        self.offsets = array.array('q')
+
+    def write(self, sent_id, len_sent, changes):
+        # ensure_ascii (the default), so len(line) is the size in bytes
+        line = json.dumps({"sentId": sent_id, "len_sent": len_sent, "changes": changes}) + '\n'
+        self.sent_ids.append(sent_id)
+        self.offsets.append(self.offset)
+        self.fh.write(line)
+        self.offset += len(line)
+
+    def write_changes(self, sent_id, changes):
+        """ write changes as returned by ChangeLog.get() or read_csv_log() """
+        self.write(sent_id, changes[0]['len_sent'],
+                   [{key: value for key, value in change.items() if key != 'len_sent'}
+                    for change in changes])
+
+    def close(self):
+        self.fh.close()
+        with open(self.fn + '.idx', 'wb') as fh_idx:
+            self.sent_ids.tofile(fh_idx)
+            self.offsets.tofile(fh_idx)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ChangeLog:
+    """ read-only, dict-like view of test.tok.preprocess.jsonl:
+    changelog.get(sentId) returns the list of changes of that sentence or None.
+
+    Nothing is parsed up front; each lookup is a binary search in the
+    mmapped index plus one seek into the log. Without an index file,
+    the index is built by one pass over the log.
+    """
+    def __init__(self, fn):
+        self.fn = fn
+        self.fh = open(fn, 'rb')
+        self.mm = None
+        fn_idx = fn + '.idx'
+        if os.path.isfile(fn_idx) and os.path.getsize(fn_idx) > 0:
+            with open(fn_idx, 'rb') as fh_idx:
+                self.mm = mmap.mmap(fh_idx.fileno(), 0, access=mmap.ACCESS_READ)
+            index = memoryview(self.mm).cast('q')
+            n = len(index) // 2
+            self.sent_ids, self.offsets = index[:n], index[n:]
+        elif os.path.isfile(fn_idx):  # empty index: nothing changed
+            self.sent_ids, self.offsets = [], []
+        else:
+            self.sent_ids, self.offsets = self.build_index()
+
+    def build_index(self):
+        sent_ids, offsets = array.array('q'), array.array('q')
+        offset = 0
+        for line in self.fh:
+            sent_ids.append(json.loads(line)["sentId"])
+            offsets.append(offset)
+            offset += len(line)
+        return sent_ids, offsets
+
+    def get(self, sent_id, default=None):
+        i = bisect.bisect_left(self.sent_ids, sent_id)
+        if i == len(self.sent_ids) or self.sent_ids[i] != sent_id:
+            return default
+        self.fh.seek(self.offsets[i])
+        record = json.loads(self.fh.readline())
+        return [dict(change, len_sent=record["len_sent"]) for change in record["changes"]]
+
+    def __contains__(self, sent_id):
+        return self.get(sent_id) is not None
+
+    def __len__(self):
+        return len(self.sent_ids)
+
+def read_csv_log(fn):
+    """ read the old csv log (sentId,before,after,idx,len_sent) into
+    { sentId: [change, ...] } with the same fields as ChangeLog.get() """
+    changes = {}
+    with open(fn) as f:
+        for line in f:
+            if line.startswith('sentId'): continue
+            line_l = line.split(',')
+            sentId, before, after, idx, len_sent = int(line_l[0]), line_l[1], line_l[2],\
+                                                   int(line_l[3]), int(line_l[4])
+            # may have multiple changes per sentence
+            changes.setdefault(sentId, []).append(
+                {'before':before, 'after':after, 'idx':idx, 'len_sent':len_sent,
+                 'tokens':change_tokens(before)})
+    return changes
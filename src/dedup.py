@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+'''
+sentence-level deduplication between preprocess.py and the parser
+
+NLI corpora (SICK, MED, ...) repeat premises and hypotheses a lot. For
+test.tok, after ./preprocess.py test.tok:
+
+input:  test.tok.clean, test.tok.preprocess.jsonl (or the csv .log)
+output:
+1. test.tok.uniq                    the distinct sentences, for the parser
+2. test.tok.uniq.preprocess.jsonl   their changes, by index in test.tok.uniq
+3. test.tok.dedup                   for every line of test.tok.clean, the index
+                                    of its sentence in test.tok.uniq
+
+Two sentences are the same if they are equal after normalizing whitespace
+and have the same preprocess changes (`at most 3` and `at least 3` both
+become a determiner, but are recovered differently).
+
+mytree2transccg.py --dedup test.tok.dedup then polarizes each distinct
+sentence once and fans the results out to all its lines, in the
+.polarized and transccg output. parse.sh does all of this with DEDUP=1.
+
+usage: ./dedup.py test.tok
+'''
+
+__author__ = "Hai Hu"
+
+import os
+from utils import eprint
+from changelog import ChangeLog, ChangeLogWriter, read_csv_log
+
+def normalize(line):
+    return ' '.join(line.split())
+
+def dedup(fn):
+    """ write fn.uniq, fn.uniq.preprocess.jsonl and fn.dedup, return
+    (number of sentences, number of distinct sentences) """
+    fn_log = fn + '.preprocess.jsonl'
+    if os.path.isfile(fn_log): changes = ChangeLog(fn_log)
+    else: changes = read_csv_log(fn + '.preprocess.log')
+    uniq = {}  # { (sentence, changes) : index in fn.uniq }
+    n_sent = 0
+    with open(fn + '.clean') as fh_clean, open(fn + '.uniq', 'w') as fh_uniq, \
+            open(fn + '.dedup', 'w') as fh_map, \
+            ChangeLogWriter(fn + '.uniq.preprocess.jsonl') as changelog:
+        for sent_id, line in enumerate(fh_clean):
+            sent = normalize(line)
+            changes_sent = changes.get(sent_id)
+            key = (sent, tuple((c['before'], c['after'], c['idx']) for c in changes_sent)
+                         if changes_sent else ())
+            uniq_id = uniq.get(key)
+            if uniq_id is None:
+                uniq_id = uniq[key] = len(uniq)
+                fh_uniq.write(sent + '\n')
+                if changes_sent: changelog.write_changes(uniq_id, changes_sent)
+            fh_map.write('{}\n'.format(uniq_id))
+            n_sent += 1
+    return n_sent, len(uniq)
+
+def read_map(fn):
+    """ the list written to fn.dedup: index in fn.uniq of every sentence """
+    with open(fn) as f:
+        return [int(line) for line in f]
+
+def report(n_sent, n_uniq):
+    return 'dedup: {} sentences, {} distinct, ratio {:.2f} ({:.1f}% duplicates)'.format(
+        n_sent, n_uniq, n_sent / n_uniq if n_uniq else 1.0,
+        100 * (n_sent - n_uniq) / n_sent if n_sent else 0.0)
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='deduplicate the sentences of test.tok.clean')
+    parser.add_argument('filename', help='the tokenized file given to preprocess.py, e.g. test.tok')
+    args = parser.parse_args()
+    eprint(report(*dedup(args.filename)))
+
+if __name__ == '__main__':
+    main()
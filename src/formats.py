@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+'''
+output formats of mytree2transccg.py --format, besides transccg
+
+Each writer writes one record per sentence as soon as it is polarized,
+in one pass over the leaves, with no xml in between (as xml2text.py
+would undo it):
+
+jsonl       {"id": 0, "tokens": ["Every", "man"], "arrows": ["↑", "↓"],
+             "impSigns": ["+", "+"], "error": null}
+            error: the exception of a sentence that could not be polarized
+            (its arrows are partial), or failed_to_parse
+conll       # sent_id = 0
+            # error = AttributeError     (only if any)
+            1<TAB>Every<TAB>every<TAB>DT<TAB>NP/N<TAB>↑<TAB>+
+            one line per token: id, word, lemma, POS, category, arrow,
+            impSign (_ for none), then an empty line
+polarized   the lines of the .polarized file
+text        as xml2text.py over the transccg xml: the words (surf), then
+            their labels UP DOWN NEUTRAL; nothing for a sentence that did
+            not parse
+
+--tree adds the bracketed tree: "tree" in jsonl, `# tree = ` in conll;
+{category arrow children} or {category arrow word}, e.g.
+{S↑ {NP↑ {NP/N↑ Every} {N↓ man}} {S\\NP↑ walks}}
+
+Arrows are ↑ ↓ =, = also for a node that did not get a polarity (as
+getMono.Result). A sentence that did not parse has its words with =.
+'''
+
+__author__ = "Hai Hu"
+
+from getMono import ARROWS
+
+LABELS = {'UP': 'UP', 'DOWN': 'DOWN'}  # of xml2text.py, NEUTRAL for the others
+
+class FormatWriter:
+    """ begin(), then sentence() in the order of the sentences, then end() """
+    def __init__(self, stream, tree=False):
+        self.stream = stream
+        self.tree = tree
+
+    def begin(self):
+        pass
+
+    def sentence(self, idx, t, line, error, raw):
+        """ t: the CCGtree, None if the sentence did not parse; line: its
+        line of the .polarized file; error: exception name or None; raw: the
+        sentence from .tok.clean """
+        raise NotImplementedError
+
+    def end(self):
+        pass
+
+class PolarizedWriter(FormatWriter):
+    def sentence(self, idx, t, line, error, raw):
+        self.stream.write(line)
+
+class TextWriter(FormatWriter):
+    def sentence(self, idx, t, line, error, raw):
+        if t is None: return
+        leaves = t.leafNodes
+        self.stream.write(' '.join([leaf.word for leaf in leaves]) + '\n' +
+                          ' '.join([LABELS.get(leaf.cat.monotonicity, 'NEUTRAL')
+                                    for leaf in leaves]) + '\n')
+
+class JsonlWriter(FormatWriter):
+    def begin(self):
+        import json
+        self.dumps = json.dumps
+
+    def sentence(self, idx, t, line, error, raw):
+        if t is None:
+            tokens = raw.split()
+            record = {'id': idx, 'tokens': tokens, 'arrows': ['='] * len(tokens),
+                      'impSigns': [None] * len(tokens), 'error': 'failed_to_parse'}
+        else:
+            leaves = t.leafNodes
+            record = {'id': idx, 'tokens': [leaf.word_raw for leaf in leaves],
+                      'arrows': [ARROWS.get(leaf.cat.monotonicity, '=') for leaf in leaves],
+                      'impSigns': [leaf.impSign for leaf in leaves], 'error': error}
+            if self.tree: record['tree'] = bracketed(t.root)
+        self.stream.write(self.dumps(record, ensure_ascii=False) + '\n')
+
+class ConllWriter(FormatWriter):
+    def sentence(self, idx, t, line, error, raw):
+        write = self.stream.write
+        write('# sent_id = {}\n'.format(idx))
+        if t is None:
+            write('# error = failed_to_parse\n')
+            for i, token in enumerate(raw.split(), 1):
+                write('{}\t{}\t_\t_\t_\t=\t_\n'.format(i, token))
+        else:
+            if error: write('# error = {}\n'.format(error))
+            if self.tree: write('# tree = {}\n'.format(bracketed(t.root)))
+            for i, leaf in enumerate(t.leafNodes, 1):
+                write('{}\t{}\t{}\t{}\t{}\t{}\t{}\n'.format(
+                    i, leaf.word_raw, leaf.lemma or '_', leaf.pos or '_', leaf.cat.originalType,
+                    ARROWS.get(leaf.cat.monotonicity, '='), leaf.impSign or '_'))
+        write('\n')
+
+def bracketed(node):
+    """ {category arrow children}, {category arrow word} for a leaf """
+    parts = []
+    def helper(node):
+        parts.append('{' + node.cat.originalType + ARROWS.get(node.cat.monotonicity, '='))
+        if node.children:
+            for child in node.children:
+                parts.append(' ')
+                helper(child)
+        else: parts.append(' ' + node.word_raw)
+        parts.append('}')
+    helper(node)
+    return ''.join(parts)
+
+FORMATS = {'polarized': PolarizedWriter, 'text': TextWriter, 'jsonl': JsonlWriter, 'conll': ConllWriter}
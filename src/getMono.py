@@ -17,9 +17,13 @@ PIPELINE:
 Hai Hu, Feb, 2018
 '''
 
-import sys, os, re, copy, argparse
+import sys, os, re, copy, atexit, collections, weakref
 from sys import exit
-from bs4 import BeautifulSoup
+from utils import eprint, log, DEBUG, LEVELS
+import timers as stage_timers
+import lexicon
+# BeautifulSoup (candc xml only) and argparse (command line only) are
+# imported where they are used, to keep `import getMono` fast
 # from IPython.display import Markdown, display
 
 # TODO: standardize 'UP' and 'DOWN' instead of using those strings throughout
@@ -67,13 +71,40 @@ QUANTIFIERS_TO_FIX = {'MOST', 'FEW', 'SEVERAL', 'ONE', '2', '3', '4', '5'}
 # TODO for all semCat, make everything + except NP, N, PP, PR, S
 EXCLUDE = {"((e,t),t)", "(e,t)", "t", "pp", "pr"}
 
-# downward entailing prepositions
-# DE_PREP = {'OUTSIDE', 'WITHOUT', 'OUT', 'EXCEPT'}
-DE_PREP = {'WITHOUT'}  # except seems to be =
+# lexical marking rules of mark_LeafNodes: quantifiers, negation, verbs,
+# prepositions, downward entailing prepositions (WITHOUT; except seems to
+# be =), ... in lexicon.json, or $CCG2MONO_LEXICON; loaded by the first mark
+LEXICON = None
+
+def get_lexicon():
+    global LEXICON
+    if LEXICON is None: LEXICON = lexicon.load(os.environ.get(lexicon.ENV_LEXICON), EXCLUDE)
+    return LEXICON
+
+def set_lexicon(fn):
+    """ use the marking rules of fn instead of lexicon.json """
+    global LEXICON
+    LEXICON = lexicon.load(fn, EXCLUDE)
+
+def freeze_heap():
+    """ batch runs, before the loop over the sentences: load the lexicon, then
+    move everything alive (lexicon, parser output, modules, cached Cats) to
+    the permanent generation of the gc, so its collections during the run
+    do not walk them again and again """
+    import gc
+    get_lexicon()
+    gc.collect()
+    gc.freeze()
 
 RC_PRON = {'WHO', 'WHICH', 'THAT'}
 
+PARSERS = ('candc', 'easyccg', 'depccg')
+
+# monotonicity -> arrow, as in transccg output
+ARROWS = {'UP': '\u2191', 'DOWN': '\u2193', 'UNK': '='}
+
 def main():
+    import argparse
     # -------------------------------------
     # parse cmd arguments
     description = """
@@ -96,96 +127,179 @@ def main():
                              'tmp.candc.parsed.xml '
                              "[default: %(default)s]")
     parser.add_argument('-flog', dest='filename_log', type=str, default='',
-                        help='preprocess log filename. E.g. test.tok.preprocess.log'
+                        help='preprocess log filename. E.g. test.tok.preprocess.jsonl '
+                             '(or the csv log test.tok.preprocess.log) '
                              "[default: %(default)s]")
     parser.add_argument('-t', dest='test', action='store_const', const=True, default=False,
                         help='if -t, run test()')
+    parser.add_argument('-timers', '--timers', dest='timers', type=str, default=None,
+                        help='write a JSON report of the time spent in each stage '
+                             'to this file, - for stderr (see timers.py)')
+    parser.add_argument('-timers-per-sent', '--timers-per-sent', dest='timers_per_sent', action='store_true',
+                        help='include the timings of every sentence in the -timers report')
+    parser.add_argument('-profile', '--profile', dest='profile', type=str, default=None,
+                        help='profile each stage: write PREFIX.prof, PREFIX.STAGE.prof '
+                             '(pstats) and PREFIX.collapsed (flamegraph) (see profiling.py)')
+    parser.add_argument('-profile-every', '--profile-every', dest='profile_every', type=int, default=1,
+                        help='with -profile, profile only every Nth sentence [default: %(default)s]')
+    parser.add_argument('-metrics', '--metrics', dest='metrics', type=str, default=None,
+                        help='write throughput, stage latency histograms, errors and rule '
+                             'counts to PREFIX.json and PREFIX.prom (Prometheus) (see metrics.py)')
+    parser.add_argument('-metrics-window', '--metrics-window', dest='metrics_window', type=float,
+                        default=1.0, help='seconds per throughput sample of -metrics '
+                                          '[default: %(default)s]')
+    parser.add_argument('-slow', '--slow', dest='slow', type=str, default=None,
+                        help='write reproducer bundles of the slowest sentences to this '
+                             'directory (see watchdog.py)')
+    parser.add_argument('-slow-top', '--slow-top', dest='slow_top', type=int, default=10,
+                        help='with -slow, keep the N slowest sentences [default: %(default)s]')
+    parser.add_argument('-slow-budget', '--slow-budget', dest='slow_budget', type=float, default=None,
+                        help='with -slow, also keep every sentence slower than this many seconds')
+    parser.add_argument('-log-level', '--log-level', dest='log_level', choices=sorted(LEVELS),
+                        default=None, help='messages on stderr: error, warning, info (reading '
+                                           'banners) or debug (per-sentence diagnostics) '
+                                           '[default: warning, or $CCG2MONO_LOG]')
+    parser.add_argument('-progress', '--progress', dest='progress', type=float, default=10,
+                        help='write a progress line every this many seconds, 0 for none '
+                             '[default: %(default)s]')
+    parser.add_argument('-lexicon', '--lexicon', dest='lexicon', type=str, default=None,
+                        help='lexical marking rules (see lexicon.py) '
+                             '[default: lexicon.json, or $CCG2MONO_LEXICON]')
     args = parser.parse_args()
     # -------------------------------------
+    if args.log_level: log.set_level(args.log_level)
+    if args.lexicon: set_lexicon(args.lexicon)
 
     if args.test:
         print('in test')
         test()
         exit()
 
-    eprint("trees to build: ", args.sentNo)
+    log.info("trees to build: {}", args.sentNo)
     if args.sentNo == ['all']:
         args.sentNo = []
     else:
         args.sentNo = [int(i) for i in args.sentNo]
 
+    timers = stage_timers.StageTimers(args.timers_per_sent) if args.timers else None
+    if timers: timers.instrument(Cat, '__init__', 'cat')
+    profiler = None
+    if args.profile:
+        from profiling import StageProfiler
+        profiler = StageProfiler(args.profile, args.profile_every)
+    metrics = None
+    if args.metrics:
+        from metrics import Metrics
+        metrics = Metrics(args.metrics_window)
+        metrics.instrument(CCGtree)
+    watchdog = None
+    if args.slow:
+        from watchdog import SlowSentences
+        watchdog = SlowSentences(args.slow, args.slow_top, args.slow_budget)
+    progress = stage_timers.Progress(args.progress) if args.progress > 0 else None
+    hooks = [hook for hook in (timers, profiler, metrics, watchdog, progress) if hook]
+    timed = stage_timers.stage_hooks(hooks)
+
     # intialize trees
     try:
         trees = CCGtrees(args.filename_log)
     except FileNotFoundError:
-        eprint('please specify filename of pre process log, using -flog')
+        log.error('please specify filename of pre process log, using -flog')
         exit()
 
     # parser output filename
-    if os.path.isfile(args.filename):
-        if '.candc.' in args.filename:
-            args.parser = 'candc'
-            trees.readCandCxml(args.filename, args.sentNo)
-        elif '.easyccg' in args.filename:
-            args.parser = 'easyccg'
-            trees.readEasyccgStr(args.filename, args.sentNo)
-        elif '.depccg' in args.filename:
-            args.parser = 'depccg'  # same as easyccg
-            trees.readEasyccgStr(args.filename, args.sentNo)
+    with timed('read'):
+        if os.path.isfile(args.filename):
+            if '.candc.' in args.filename:
+                args.parser = 'candc'
+                trees.readCandCxml(args.filename, args.sentNo)
+            elif '.easyccg' in args.filename:
+                args.parser = 'easyccg'
+                trees.readEasyccgStr(args.filename, args.sentNo)
+            elif '.depccg' in args.filename:
+                args.parser = 'depccg'  # same as easyccg
+                trees.readEasyccgStr(args.filename, args.sentNo)
+            else:
+                log.error('parser not supported')
+                exit()
         else:
-            eprint('parser not supported')
-            exit()
-    else:
-        try:
-            if args.parser == 'candc':
-                trees.readCandCxml('tmp.candc.parsed.xml')
-            else: trees.readEasyccgStr('tmp.easyccg.parsed.txt')
-        except FileNotFoundError:
-            eprint('please specify filename of parser output, using -f')
-            exit()
+            try:
+                if args.parser == 'candc':
+                    trees.readCandCxml('tmp.candc.parsed.xml')
+                else: trees.readEasyccgStr('tmp.easyccg.parsed.txt')
+            except FileNotFoundError:
+                log.error('please specify filename of parser output, using -f')
+                exit()
+    if watchdog: watchdog.attach(trees, args.parser)
+    if progress: progress.total = len(trees.tree_idxs)
+    freeze_heap()
 
     idx_cant_polarize = {}
     for idx in trees.tree_idxs:
+        for hook in hooks: hook.sentence(idx)
         # build the tree here
-        t = trees.build_one_tree(idx, args.parser)
+        try:
+            with timed('build'): t = trees.build_one_tree(idx, args.parser)
+            trees.trees.pop(idx, None)  # t only: freed with it (see TreeNode)
+        except POLARIZE_ERRORS as e:
+            idx_cant_polarize[idx] = type(e).__name__
+            print('{}\tBuilding error: {}'.format(idx, type(e).__name__))
+            if metrics: metrics.error(e, 'build')
+            continue
 
         # print()
         # print('-' * 20)
         # print('tree {}\n'.format(idx))
         print('{}\t'.format(idx), end="")
 
+        if t in ["failed_to_parse", "parse_exception"]:  # parser failed, no tree
+            idx_cant_polarize[idx] = t
+            print(t)
+            if metrics: metrics.outcome(t)
+            continue
+
         if args.verbose in [0, 4]:
             t.printSent()
             t.printTree()
 
-        # fix tree
-        t.fixQuantifier()
-        t.fixNot()
-        if args.parser == 'candc': t.fixRC()  # only fix RC for candc
-
+        stage = 'fix'
         try:
+            # fix tree
+            with timed('fixQuantifier'): t.fixQuantifier()
+            with timed('fixNot'): t.fixNot()
+            if args.parser == 'candc':  # only fix RC for candc
+                with timed('fixRC'): t.fixRC()
+
             if args.verbose in [1, 4]: t.printTree()
 
-            t.mark()
+            stage = 'mark'
+            with timed('mark'): t.mark()
             if args.verbose in [2, 4]: t.printTree()
 
-            t.polarize()
+            stage = 'polarize'
+            with timed('polarize'): t.polarize(impSign=True)  # and getImpSign()
             if args.verbose in [3, 4]: t.printTree()
-        except (ErrorCompareSemCat, ErrorCCGtree) as e:
+        except POLARIZE_ERRORS as e:
             idx_cant_polarize[idx] = type(e).__name__
             # print(e)
             print("Polarizing error:", type(e).__name__, end="; ")
+            if metrics: metrics.error(e, stage)
             t.printSent_raw_no_pol()
             continue
 
-        t.getImpSign()
-
+        if metrics: metrics.outcome('polarized')
         t.printSent_raw()
         # t.printSent()
         # t.printSentLatex()
 
         # testTrees(trees)
 
+    if timers: timers.write(args.timers)
+    if profiler: profiler.close()
+    if metrics: metrics.write(args.metrics)
+    if watchdog: watchdog.close()
+    if progress: progress.close()
+
     # return
     print("\ncannot polarize the following trees:")
     for idx, e in sorted(idx_cant_polarize.items()):
@@ -263,9 +377,124 @@ def test():
     # cat = Cat(originalType=r'((S[X=true]\NP)\(S[X=true]\NP))\((S[X=true]\NP)\(S[X=true]\NP))')
     # cat = Cat(originalType=r'(S[dcl=true]\NP)/(S[b=true]\NP)')
 
-def eprint(*args, **kwargs):
-    """ print to stderr """
-    print(*args, file=sys.stderr, **kwargs)
+def polarize(parse_str, parser='easyccg', changes=None, use_lemma=True, keep_tree=False):
+    """ polarize one parse in-process, return a Result; nothing is printed,
+    diagnostics go to utils.log at the level the caller set (warning by
+    default, log.set_level('error') to keep warnings out)
+
+    parse_str: one tree from the parser output, i.e. an easyccg/depccg
+      extended-format line (with or without the ( -> { substitution in
+      parse.sh), or one <ccg>...</ccg> element of candc xml
+    changes: the preprocess changes of this sentence, i.e. one value
+      of CCGtrees.changes, or None
+    keep_tree: keep the polarized CCGtree in Result.tree
+
+    e.g. polarize(line, 'depccg').arrows  ->  ['↑', '↓', '↓']
+    """
+    if parser not in PARSERS:
+        raise ValueError('parser can only be: {}'.format(', '.join(PARSERS)))
+    timers = get_env_timers()
+    if timers: timers.sentence()
+    return polarize_helper(parse_str, parser, changes, use_lemma, keep_tree,
+                           timers.stage if timers else stage_timers.no_stage)
+
+# StageTimers of polarize(), from the CCG2MONO_TIMERS environment variable;
+# None until the first call, then False if the variable is not set
+ENV_TIMERS = None
+
+def get_env_timers():
+    """ StageTimers for library use, reported to $CCG2MONO_TIMERS at exit """
+    global ENV_TIMERS
+    if ENV_TIMERS is None:
+        ENV_TIMERS = stage_timers.from_env() or False
+        if ENV_TIMERS:
+            ENV_TIMERS.instrument(Cat, '__init__', 'cat')
+            atexit.register(ENV_TIMERS.write, os.environ[stage_timers.ENV_TIMERS])
+    return ENV_TIMERS
+
+def polarize_helper(parse_str, parser, changes, use_lemma, keep_tree,
+                    timed=stage_timers.no_stage):
+    """ build, fix, mark, polarize and getImpSign, same as convert2transccg() """
+    stage = 'build'
+    t = None
+    try:
+        if parser == 'candc':
+            from bs4 import BeautifulSoup
+            ccgXml = BeautifulSoup(parse_str, 'lxml').find('ccg')
+            if ccgXml is None: return Result(error='failed_to_parse', stage=stage)
+            with timed('build'): t = CCGtree(ccgXml=ccgXml, changes=changes)
+        else:
+            if parse_str.strip() in {'', 'failed_to_parse'}:
+                return Result(error='failed_to_parse', stage=stage)
+            if '(<' in parse_str:  # same as the sed command in parse.sh
+                parse_str = parse_str.replace('(<', '{<').replace('>)', '>}').replace(' )', ' }')
+            with timed('build'): t = CCGtree(easyccg_tree_str=parse_str, changes=changes)
+        if t.root is None: return Result(error='failed_to_parse', stage=stage)
+        t.use_lemma = use_lemma
+
+        stage = 'fix'
+        with timed('fixQuantifier'): t.fixQuantifier()
+        with timed('fixNot'): t.fixNot()
+        if parser == 'candc':  # only fix RC for candc
+            with timed('fixRC'): t.fixRC()
+
+        stage = 'mark'
+        with timed('mark'): t.mark()
+        stage = 'polarize'
+        with timed('polarize'): t.polarize(impSign=True)  # and getImpSign()
+    except POLARIZE_ERRORS as e:
+        return Result(t, error=type(e).__name__, error_msg=str(e), stage=stage,
+                      keep_tree=keep_tree)
+    return Result(t, keep_tree=keep_tree)
+
+class Result:
+    """ polarities of one sentence, as returned by polarize()
+
+    token arrays, one entry per leafNode:
+      words, lemmas, polarities ('UP', 'DOWN', 'UNK' or None), arrows (↑ ↓ =),
+      impSigns ('+', '-', '•' or None)
+    spans: one tuple per nonTermNode in pre-order:
+      (start, end, category, rule, polarity, impSign), end is exclusive
+    error: None if polarized, else the name of the exception (or 'failed_to_parse');
+      error_msg and stage (build, fix, mark, polarize) say where it failed
+    """
+    def __init__(self, tree=None, error=None, error_msg='', stage=None, keep_tree=False):
+        self.words = []; self.lemmas = []
+        self.polarities = []; self.arrows = []; self.impSigns = []
+        self.spans = []
+        self.error = error; self.error_msg = error_msg; self.stage = stage
+        self.tree = tree if keep_tree else None
+        if tree is None or tree.root is None: return
+        for lfnode in tree.leafNodes:
+            self.words.append(lfnode.word_raw)
+            self.lemmas.append(lfnode.word)
+            self.polarities.append(lfnode.cat.monotonicity)
+            self.arrows.append(ARROWS.get(lfnode.cat.monotonicity, '='))
+            self.impSigns.append(lfnode.impSign)
+        self.getSpans(tree.root, 0)
+
+    def getSpans(self, node, start):
+        """ pre-order traversal, return the index after the last leaf under node """
+        if len(node.children) == 0: return start + 1
+        i = len(self.spans)
+        self.spans.append(None)  # placeholder, end is known after the children
+        end = start
+        for child in node.children:
+            end = self.getSpans(child, end)
+        self.spans[i] = (start, end, node.cat.originalType, node.ruleType,
+                         node.cat.monotonicity, node.impSign)
+        return end
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __str__(self):
+        return ' '.join('{}{}'.format(w, a) for w, a in zip(self.words, self.arrows))
+
+    def __repr__(self):
+        if self.error: return 'Result(error={})'.format(self.error)
+        return 'Result({})'.format(self.__str__())
 
 class CCGtrees:
     def __init__(self, fn_log):
@@ -273,33 +502,27 @@ class CCGtrees:
         self.numTrees = 0
         self.CandC_xml = {}    # { tree_idx : candc_xml   }
         self.easyccg_str = {}  # { tree_idx : easyccg_str }
-        self.changes = {}      # { tree_idx : {'before':at most 5, 'after':no, 'idx':0}  }
-        self.readLog(fn_log)   # "test.tok.preprocess.log"
+        self.changes = {}      # { tree_idx : [ {'before':at-most-5, 'after':no, 'idx':0, ...} ] }
+        self.readLog(fn_log)   # "test.tok.preprocess.jsonl" or "test.tok.preprocess.log"
         self.tree_idxs = []
 
     def readLog(self, log_fn):
         """ read log for pre processing """
-        # log_fn: test.tok.preprocess.log
-        eprint("\nreading log file: {}".format(log_fn))
-        with open(log_fn) as f:
-            for line in f:
-                if line.startswith('sentId'): continue
-                line_l = line.split(',')
-                sentId, before, after, idx, len_sent = int(line_l[0]), line_l[1], line_l[2],\
-                                                       int(line_l[3]), int(line_l[4])
-                # may have multiple changes per sentence
-                if sentId in self.changes:
-                    self.changes[sentId].append({'before':before, 'after':after, 'idx':idx, 'len_sent':len_sent})
-                else:
-                    self.changes[sentId] = [ {'before':before, 'after':after, 'idx':idx, 'len_sent':len_sent} ]
-        eprint("reading log file done!\n")
+        # log_fn: test.tok.preprocess.jsonl, opened lazily with its offset index,
+        # or the old csv log test.tok.preprocess.log, read in full
+        from changelog import ChangeLog, read_csv_log  # not on import: it needs json
+        log.info("\nreading log file: {}", log_fn)
+        if log_fn.endswith('.jsonl'): self.changes = ChangeLog(log_fn)
+        else: self.changes = read_csv_log(log_fn)
+        log.info("reading log file done!\n")
 
     def idx2change(self, idx):
         """ return the changes made to one tree """
         return self.changes.get(idx, None)
 
     def readCandCxml(self, xml_fn, treeIdxs=None):  # treeIdx starts at 0
-        eprint('reading trees from candc output')
+        log.info('reading trees from candc output')
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(open(xml_fn).read(), 'lxml')
         counterSent = -1
         for ccgXml in soup.find_all('ccg'):
@@ -320,10 +543,10 @@ class CCGtrees:
             #     tree = CCGtree(ccgXml=ccgXml, changes=None)
             # self.trees[counterSent] = tree
 
-        eprint('\ntrees read in from candc output!\n\n')
+        log.info('\ntrees read in from candc output!\n\n')
 
     def readEasyccgStr(self, easyccg_fn, treeIdxs=None):  # treeIdx starts at 0
-        eprint('reading trees from easyccg / depccg output ...')
+        log.info('reading trees from easyccg / depccg output ...')
         easyccg_str = open(easyccg_fn).readlines()
 
         # for each tree
@@ -343,7 +566,7 @@ class CCGtrees:
             #### build the tree  ####
             # eprint('reading tree {}...'.format(counterSent))
             if tree_str == "\n":  # easyccg failed to parse this sentence
-                eprint("- easyccg / depccg failed to parse sent {}".format(counterSent))
+                log.debug("- easyccg / depccg failed to parse sent {}", tree_id)
                 tree_str = "failed_to_parse"
             self.easyccg_str[tree_id] = tree_str
             self.tree_idxs.append(tree_id)
@@ -353,11 +576,11 @@ class CCGtrees:
             #     tree = CCGtree(easyccg_tree_str=tree_str, changes=None)
             # self.trees[counterSent] = tree
 
-        eprint('\ntrees read in from easyccg / depccg output!\n\n')
+        log.info('\ntrees read in from easyccg / depccg output!\n\n')
 
     def build_one_tree(self, idx, parser, use_lemma=True):
         # t = None
-        eprint('building tree {}...'.format(idx))
+        log.debug('building tree {}...', idx)
         if parser in ['candc']:
             t = CCGtree(ccgXml=self.CandC_xml[idx], changes=self.idx2change(idx))
         else:
@@ -389,6 +612,7 @@ class CCGtree:
     def __init__(self, **kwargs):
         self.leafNodes = []; self.words = []; self.nonTermNodes = []
         self.root = None
+        self.dummyRoot = None  # parent of self.root; keeps it alive (see TreeNode)
         self.allNodes = []  # self.leafNodes + self.nonTermNodes
 
         # when making tree out of a NonTermNode/LeafNode
@@ -410,6 +634,7 @@ class CCGtree:
         #  ------------tr
         #   (x-->y1)-->y2
         self.trTypes = []
+        self.impSignWalk = None  # during polarize(impSign=True)
 
         # build tree based on xml
         if kwargs.get('ccgXml') is not None:
@@ -432,27 +657,26 @@ class CCGtree:
         self.use_lemma = kwargs.get('use_lemma')  # whether use lemma in replacement_contra()
 
     def buildFromRoot(self):
+        ''' leafNodes, nonTermNodes, and parent, sisters, depth and wholeStr
+        of every node, in one walk from self.root '''
         self.leafNodes = []
         self.nonTermNodes = []
-        self.words = []
-        self.buildFromRootHelper(self.root)  # get the leafNodes
-        for lfnode in self.leafNodes:
-            self.words.append(lfnode.word.upper())
+        self.buildFromRootHelper(self.root, 0)  # get the leafNodes
+        self.words = [lfnode.word.upper() for lfnode in self.leafNodes]
         # fix dummy root
-        dummyRoot = NonTermNode(depth=-1)
+        self.dummyRoot = dummyRoot = NonTermNode(depth=-1)
         self.root.sisters = []
         self.root.parent = dummyRoot
         dummyRoot.children = [self.root]
-        # fix wholeStr
-        self.getWholeStrAllNodes()
         self.wholeStr = self.root.wholeStr
         # allNodes
         self.allNodes = self.leafNodes + self.nonTermNodes
-        self.regetDepth()
 
-    def buildFromRootHelper(self, node):
+    def buildFromRootHelper(self, node, depth):
+        node.depth = depth
         if len(node.children) == 0:
             self.leafNodes.append(node)
+            node.wholeStr = node.word.upper()
         else:
             self.nonTermNodes.append(node)
             # take care of sisters
@@ -464,7 +688,9 @@ class CCGtree:
             # recurse
             for child in node.children:
                 child.parent = node
-                self.buildFromRootHelper(child)
+                self.buildFromRootHelper(child, depth + 1)
+            # wholeStr on the way up, as getWholeStrAllNodes()
+            node.wholeStr = ' '.join([x.wholeStr for x in node.children]).rstrip()
 
     def getWholeStrAllNodes(self):
         self.getWholeStrAllNodesHelper(self.root)
@@ -477,6 +703,19 @@ class CCGtree:
                 self.getWholeStrAllNodesHelper(child)
             node.wholeStr = ' '.join([x.wholeStr for x in node.children]).rstrip()
 
+    def getDepthWholeStrAllNodes(self):
+        ''' regetDepth() and getWholeStrAllNodes() in one walk '''
+        self.getDepthWholeStrHelper(self.root, 0)
+
+    def getDepthWholeStrHelper(self, node, depth):
+        node.depth = depth
+        if len(node.children) == 0:
+            node.wholeStr = node.word.upper()
+        else:
+            for child in node.children:
+                self.getDepthWholeStrHelper(child, depth + 1)
+            node.wholeStr = ' '.join([x.wholeStr for x in node.children]).rstrip()
+
     def tree_str(self, lemma=True, arrow=True):
         """ return the sentence as string """
         s = ''
@@ -516,7 +755,7 @@ class CCGtree:
         return s
 
     def printSent_raw(self, stream=sys.stdout):
-        """ print sent word by word, not lemma by lemma """
+        """ print sent word by word, not lemma by lemma; only return it if stream is None """
         s = ''
         for lfnode in self.leafNodes:
             if lfnode.cat.monotonicity is None: mono = '\u2193'
@@ -524,7 +763,7 @@ class CCGtree:
             s += '{}{} '.format(lfnode.word_raw, mono)
         s = s.replace('DOWN', '\u2193').replace('UP', '\u2191').\
               replace('UNK', '=')
-        print(s, file=stream)
+        if stream is not None: print(s, file=stream)
         return s
 
     def printSent_raw_no_pol(self, stream=sys.stdout, verbose=True):
@@ -776,7 +1015,6 @@ class CCGtree:
 
             # rebuild tree
             newTree.buildFromRoot()
-            newTree.regetDepth()
             newTree.mark()
             newTree.polarize()
 
@@ -952,13 +1190,13 @@ class CCGtree:
                     # eprint()
 
                     if full_N_node.cat.typeWOfeats != "N":
-                        eprint("full_N_node not N")
+                        log.debug("full_N_node not N")
                         break  # can't handle it
                     if ADJ_node.cat.typeWOfeats not in {r"S\NP", r"N"}:
-                        eprint(r"ADJ_node not S\NP or N")
+                        log.debug(r"ADJ_node not S\NP or N")
                         break  # can't handle it
                     if N_node.cat.typeWOfeats != "N":
-                        eprint("N_node not N")
+                        log.debug("N_node not N")
                         break  # can't handle it
 
                     # --------------------------------
@@ -979,11 +1217,10 @@ class CCGtree:
                         full_N_node_new.parent = full_N_node.parent
                         full_N_node.parent = None
                     else:
-                        eprint("full_N_node has no parent")
+                        log.debug("full_N_node has no parent")
                         break  # can't handle it
 
                     new_tree.buildFromRoot()
-                    new_tree.regetDepth()
                     new_tree.mark()
                     new_tree.polarize()
 
@@ -1131,316 +1368,10 @@ class CCGtree:
                     # eprint('after equate marking:', node)
 
     def mark_LeafNodes(self):
-        ''' mark leaf nodes '''
+        ''' mark leaf nodes, by the rules of the lexicon (see lexicon.py) '''
+        mark = get_lexicon().mark
         for token in self.leafNodes:
-            # -----------------------
-            # quantifiers   TODO what if not of type NP/N
-            # # TODO (SST): MANY actually here? HH: MANY with BOTH, MOST, THE ...
-            if token.word.upper() in {'SOME', 'A', 'AN', 'SEVERAL',
-                                      'ONE',
-                                      'SOME-BUT-NOT-ALL'}:  # + +
-                # if token.cat.semCat.semCatStr == '((e,t),((e,t),t))':
-                try:
-                    token.cat.semCat.marking = '+'
-                    token.cat.semCat.OUT.marking = '+'
-                    if token.cat.typeWOfeats != r"NP/N":
-                        token.cat.semCat.assignRecursive("+", EXCLUDE)
-                except AttributeError:
-                    eprint('Attribute error')
-            elif token.word.upper() in {'EVERY', 'ALL', 'EACH'}:  # - +
-                # if token.cat.semCat.semCatStr == '((e,t),((e,t),t))':
-                token.cat.semCat.marking = '-'
-                token.cat.semCat.OUT.marking = '+'
-            elif token.word.upper() in {'NO', 'FEW'}:  # - -
-                # if token.cat.semCat.semCatStr == '((e,t),((e,t),t))':
-                token.cat.semCat.marking = '-'
-                token.cat.semCat.OUT.marking = '-'
-            elif token.word.upper() in {'BOTH', 'EITHER', 'MOST', 'THE', 'THOSE', 'THESE', 'MANY', 'THIS', 'THAT'}:
-                # TODO: restore 'MANY' here??? HH: Yes!
-                token.cat.semCat.OUT.marking = '+'
-            elif token.word.upper() in {'NEITHER'}:
-                token.cat.semCat.OUT.marking = '-'
-            elif token.word.upper() in {'2', '3', '4', '5', '6', '7', '8', '9', '10'} and \
-                token.cat.typeWOfeats in {r'NP/N', r'N/N'}:
-                # = =                     NP/N = I have 3 apples, N/N = at most 3 apples
-                token.cat.semCat.marking = None
-                token.cat.semCat.OUT.marking = None
-
-            # TODO other DTs: this, that?
-            # TODO(SST): is this right?! It seems like it should be '-' and
-            # '+', but when embedded under negative words, that gives the wrong
-            # results
-            elif token.word.upper() in {'ANY'}:  # this is the existential any
-                token.cat.semCat.marking = '+'
-                token.cat.semCat.OUT.marking = '+'
-            # universal any:
-            # -, +
-
-            elif token.pos.upper() == "PRP$":  # pos
-                token.cat.semCat.assignRecursive("+", EXCLUDE)
-                pass
-
-            # -----------------------
-            # at-most, at-least
-            elif token.note in {"at-most", "less-than"}:
-                # (NP/N)/(N/N)
-                # ((et,et),+(et-,(et-,t)))
-                token.cat.semCat.marking = '+'
-                token.cat.semCat.OUT.marking = '-'
-                token.cat.semCat.OUT.OUT.marking = '-'
-            elif token.note in {"at-least", "more-than"}:
-                # (NP/N)/(N/N)
-                # ((et,et),-(et+,(et+,t)))
-                token.cat.semCat.marking = '-'
-                token.cat.semCat.OUT.marking = '+'
-                token.cat.semCat.OUT.OUT.marking = '+'
-            elif token.note == "exactly":
-                # (NP/N)/(N/N)
-                # ((et,et),(et,(et,t)))
-                token.cat.semCat.marking = None
-                token.cat.semCat.OUT.marking = None
-                token.cat.semCat.OUT.OUT.marking = None
-
-            # -----------------------
-            # TODO negation
-            elif token.word.upper() in {'NOT', "N'T"}:  # N'T: (S\NP)\(S\NP)
-                token.cat.semCat.marking = '-'  # check semCatStr??
-                # TODO is this correct?
-                if token.cat.typeWOfeats == r"NP/NP": # not every person
-                    token.cat.semCat.OUT.marking = '-'
-                elif token.cat.typeWOfeats != r"N/N":
-                    token.cat.semCat.OUT.marking = '+'
-                    token.cat.semCat.IN.marking = '+'
-                    # token.cat.semCat.OUT.IN.marking = '+'  # (S+\NP+)-\(S+\NP)
-                    # token.cat.semCat.IN.IN.marking = '+'  # (S+\NP)-\(S+\NP+)
-
-            # -----------------------
-            # TODO nouns
-            # nobody DT, NP
-            elif token.word.upper() == "NOBODY":
-                if token.cat.typeWOfeats == "NP":
-                    token.cat.semCat.marking = "-"
-            # if the leafNode is NP, e.g. pronouns such as I, make it NP+
-            elif token.cat.originalType == 'NP':
-                token.cat.semCat.marking = '+'
-                # token.cat.semCat.OUT.marking = token.cat.semCat.IN.marking = '+'
-            elif token.word.upper() == 'IT':
-                token.cat.semCat.marking = '+'
-
-            # -----------------------
-            # TODO noun can be: N/(S\NP)
-            # e.g. the `right` to live in Europe
-            elif (token.pos.upper() == 'NN') and \
-                    (token.cat.typeWOfeats == r'N/(S\NP)'):
-                token.cat.semCat.marking = '+'
-                token.cat.semCat.IN.marking = '+'
-                token.cat.semCat.IN.IN.marking = '+'
-
-            # TODO (SS-T): is this the right way of handling None?
-            elif token.word.upper() in {'NONE'}:
-                eprint('Labeling NONE')
-                token.cat.semCat.marking = "-"
-                token.cat.semCat.OUT.marking = '-'
-            # TODO NNS, NN
-            elif token.pos.upper().startswith("NN"):
-                token.cat.semCat.assignRecursive("+", EXCLUDE)
-
-            # THERE BE
-            elif token.pos.upper() == "EX":
-                if token.word.upper() == "THERE":
-                    if token.cat.semCat.semCatStr == "((e,t),t)":
-                        token.cat.semCat.marking = "+"
-
-            # -----------------------
-            # if = (t,-(t,+t))
-            elif token.word.upper() == 'IF':
-                token.cat.semCat.marking = '-'
-                token.cat.semCat.OUT.marking = '+'
-            elif token.word.upper() == 'THEN':
-                token.cat.semCat.marking = '+'
-
-            # that, who
-            elif token.word.upper() in ['THAT', 'WHO', 'WHICH'] and \
-                    (token.pos in ['WDT', 'IN', 'WP']):
-                # !! already handled in Cat() !! modified #
-                token.cat.semCat.marking = '+'
-                token.cat.semCat.OUT.marking = '+'
-                # token.cat.semCat.OUT.assignRecursive("+", EXCLUDE)
-
-            # possessive 's
-            elif token.word.upper() == "'S" and token.pos == "POS":
-                # (NP/+N)\+NP
-                token.cat.semCat.marking = '+'
-                token.cat.semCat.OUT.marking = '+'
-
-            # except
-            elif token.word.upper() == "EXCEPT":
-                # (N\+N)/.NP, pos = IN: all students except engineers
-                token.cat.semCat.marking = None
-                token.cat.semCat.OUT.marking = "+"
-
-            # cardinals
-            elif token.pos.upper() == "CD": # and token.cat.typeWOfeats == r'(S\NP)\(S\NP)':
-                # you can smoke *2* a day
-                token.cat.semCat.assignRecursive("+", EXCLUDE)
-
-            # TODO verbs
-            elif token.pos.upper().startswith('VB'):
-                # TODO add monotone DOWN verbs
-                if token.lemma.upper() in ['REFUSE', 'FAIL'] and \
-                        token.cat.typeWOfeats == r'(S\NP)/(S\NP)':
-                    token.cat.semCat.marking = '-'
-                    token.cat.semCat.OUT.marking = '+'
-                    token.cat.semCat.IN.marking = '+'  # (S+\NP)-/(S+\NP)
-                    # token.cat.semCat.IN.IN.marking = '+'
-                    # token.cat.semCat.OUT.IN.marking = '+'  # (S+\NP+)-/(S+\NP+)
-
-                else:
-                    token.cat.semCat.marking = '+'
-                    if token.cat.typeWOfeats == r'(S\NP)/NP':  # transitive verb
-                        token.cat.semCat.OUT.marking = '+'  # make it (S+\NP)+/NP
-                    elif token.cat.typeWOfeats == r'((S\NP)/PP)/NP':  # 'put' with a PP argument
-                        token.cat.semCat.OUT.marking = '+'
-                        token.cat.semCat.OUT.OUT.marking = '+'  # make it ((S\+NP)/+PP)+/NP
-                    # elif (token.word.upper() in ['DID', 'DO']) and \
-                    #         (token.cat.typeWOfeats == r'(S\NP)/(S\NP)'):  # 'did' in 'did not'
-                    elif token.cat.typeWOfeats == r'(S\NP)/(S\NP)':
-                        # 'did' in 'did not', 'want' in I want to go
-                        token.cat.semCat.OUT.marking = '+'
-                        token.cat.semCat.IN.marking = '+'  # (S+\NP)+/(S+\NP)
-                        # token.cat.semCat.IN.IN.marking = '+'   # (S+\NP)+/(S+\NP+)
-                        # token.cat.semCat.OUT.IN.marking = '+'  # (S+\NP+)+/(S+\NP)
-                    elif token.cat.typeWOfeats == r'(S\NP)/PP':  # 'ask' as in 'ask about'
-                        token.cat.semCat.OUT.marking = '+'
-                    elif token.cat.typeWOfeats == r'(S\NP)/N':
-                        token.cat.semCat.OUT.marking = '+'
-                    elif token.cat.typeWOfeats == r'(S\NP)/PR':
-                        token.cat.semCat.OUT.marking = '+'
-                    elif token.cat.typeWOfeats == r'((S\NP)/NP)/PR':
-                        token.cat.semCat.OUT.marking = '+'
-                        token.cat.semCat.OUT.OUT.marking = '+'
-                    else:
-                        token.cat.semCat.assignRecursive("+", EXCLUDE)
-
-
-            # TODO modal verbs
-            elif token.pos.upper() == 'MD' and token.cat.typeWOfeats != 'N':
-                # can: (S\NP)/(S\NP)
-                token.cat.semCat.marking = '+'
-                token.cat.semCat.IN.marking = '+'  # ??
-                token.cat.semCat.OUT.marking = '+'  # ??
-
-            # TODO to
-            # elif (token.pos.upper() == 'TO') and \
-            #         (token.cat.typeWOfeats == r'(S\NP)/(S\NP)'):
-            #     # 'to' in 'I want to', 'refused to' # (S+\NP)+/(S+\NP)
-            #     token.cat.semCat.marking = '+'
-            #     token.cat.semCat.OUT.marking = '+'
-            #     token.cat.semCat.IN.marking = '+'
-            #     # token.cat.semCat.OUT.IN.marking = '+'
-            #     # token.cat.semCat.IN.IN.marking = '+'  # (S+\NP+)+/(S+\NP+)
-            elif token.pos.upper() == 'TO':
-                token.cat.semCat.assignRecursive("+", EXCLUDE)
-
-            # TODO adverbs 1
-            elif (token.pos.upper() == 'RB') and \
-                    (token.word.upper() not in ['NOT', "N'T"]):
-                if token.cat.typeWOfeats in [r'(S\NP)/(S\NP)', r'(S\NP)\(S\NP)'] :
-                    # adverbs; make it (S+\NP)+/(S+\NP)
-                    token.cat.semCat.marking = '+'
-                    token.cat.semCat.OUT.marking = token.cat.semCat.IN.marking = '+'
-                elif token.cat.typeWOfeats in [r'S\NP']:
-                    # adverbs; make it S+\NP
-                    token.cat.semCat.marking = '+'
-                elif token.cat.typeWOfeats in [r'(S\NP)/PP']:
-                    # as fast as him, fast = (S\NP)/PP
-                    token.cat.semCat.marking = '+'
-                    token.cat.semCat.OUT.marking = '+'
-                # TODO all other adverbs
-                else:
-                    token.cat.semCat.assignRecursive("+", EXCLUDE)
-
-            # -----------------------
-            # TODO adjectives, add +
-            elif token.pos.upper().startswith('JJ'):
-                if token.word.upper() not in ['FAKE','FORMER']:
-                    # token.cat.semCat.marking = '+'
-                    token.cat.semCat.assignRecursive("+", EXCLUDE)
-
-            # noun as noun modifiers, add +
-            elif (token.pos.upper() in ['NN', 'NNP']) and \
-                    (token.cat.typeWOfeats == r'N/N'):
-                token.cat.semCat.marking = '+'
-
-            # TODO than
-            elif token.word.upper() == "THAN":
-                if token.cat.typeWOfeats == r'((S\NP)\(S\NP))/NP':
-                    # ((S+\NP)+\(S+\NP))+/NP
-                    token.cat.semCat.marking = '+'
-                    token.cat.semCat.OUT.marking = '+'
-                    token.cat.semCat.OUT.IN.marking = '+'
-                    token.cat.semCat.OUT.OUT.marking = '+'
-
-
-            # TODO prepositions
-            elif token.word.upper() in {'IN', 'ON', 'TO', 'FROM', 'FOR',
-                                        'WITHIN', 'OF', 'AT', 'BY', 'INTO'}:
-                # prepositions like 'in' as an argument, as in 'He puts it in the box'
-                if token.cat.typeWOfeats == 'PP/NP':
-                    token.cat.semCat.marking = '+'  # make it PP/+NP'
-
-                # 'in' as an adjunct as in 'John sleeps in France'
-                # 'to' as in 'go to bed'
-                elif token.cat.typeWOfeats == r'((S\NP)\(S\NP))/NP':
-                    # TODO important!! the first 2 NPs should be None
-                    # make it ((S+\NP)+\(S+\NP))+/NP
-                    token.cat.semCat.marking = '+'
-                    token.cat.semCat.OUT.marking = '+'
-                    token.cat.semCat.OUT.OUT.marking = '+'
-                    token.cat.semCat.OUT.IN.marking = '+'
-                    # token.cat.semCat.OUT.IN.IN.marking = '+'
-                    # token.cat.semCat.OUT.OUT.IN.marking = '+'
-
-                # 'in' as a modifier for nouns as in 'the man in France sleeps'
-                # candc: (NP\NP)/NP; easyccg: (N\N)/NP
-                elif token.cat.typeWOfeats in [r'(NP\NP)/NP', r'(N\N)/NP']:
-                    # make it (NP+\NP)+/NP
-                    token.cat.semCat.marking = '+'
-                    token.cat.semCat.OUT.marking = '+'
-
-                # 'in' in a PP that serves as sentential adverb, as in 'In theory, ...'
-                elif token.cat.typeWOfeats in [r'(S/S)/NP', r'(S\S)/NP']:
-                    # make it (S+/S)+/NP
-                    token.cat.semCat.marking = '+'
-                    token.cat.semCat.OUT.marking = '+'
-
-            elif token.word.upper() in DE_PREP:  # out, without, outside
-                if token.cat.typeWOfeats == r'((S\NP)\(S\NP))/NP':  # without
-                    token.cat.semCat.marking = '-'
-                    token.cat.semCat.OUT.marking = '+'
-                    token.cat.semCat.OUT.IN.marking = '+'
-                    token.cat.semCat.OUT.OUT.marking = '+'
-                    # token.cat.semCat.OUT.IN.IN.marking = '+'
-                    # token.cat.semCat.OUT.OUT.IN.marking = '+'  # ((S+\NP+)+\(S+\NP+))-/NP
-                elif token.cat.typeWOfeats == r'(S\NP)\(S\NP)':
-                    # `they are playing outside`
-                    token.cat.semCat.marking = '-'
-                    token.cat.semCat.OUT.marking = '+'
-                    token.cat.semCat.IN.marking = '+'
-                elif token.cat.typeWOfeats == r'S\NP':
-                    token.cat.semCat.marking = '+'  # 'out' in '2 men are looking out'
-                else:
-                    token.cat.semCat.marking = '-'
-                    if token.cat.semCat.IN:
-                        token.cat.semCat.IN.assignRecursive("+", EXCLUDE)
-                    if token.cat.semCat.OUT:
-                        token.cat.semCat.OUT.assignRecursive("+", EXCLUDE)
-
-            elif token.pos.upper() == "IN":
-                token.cat.semCat.assignRecursive("+", EXCLUDE)
-
-            elif token.pos.upper() == "RP":  # preposition??
-                token.cat.semCat.assignRecursive("+", EXCLUDE)
+            mark(token)
 
     def mark_NTN(self):
         ''' mark non terminal node '''
@@ -1451,9 +1382,11 @@ class CCGtree:
     def mark_NTN_helper(self, node):
         # we can only set our parent when all its DESCENDANTS
         # have been set
+        parent = node.parent
+        n_sisters = len(node.sisters)
 
         # no sisters
-        if len(node.sisters) == 0:
+        if n_sisters == 0:
             # print('\n\nnode:', node)
             # print('no sister')
             if node.visited:  # either leafNode or a visited parent of a unary rule
@@ -1467,15 +1400,14 @@ class CCGtree:
 
             # IMPORTANT: now all its descendants have been marked!
             # so we can set node.parent
-            if node.parent.ruleType == 'conj': self.mark_NTN_myparent_conj(node)
+            if parent.ruleId == RULE_CONJ: self.mark_NTN_myparent_conj(node)
             else: self.mark_NTN_myparent(node)
 
         # 1 sister
-        elif len(node.sisters) == 1:
+        elif n_sisters == 1:
             # only if BOTH me and my sister have been marked,
             # can we set marking for parent
             # I can either be 'left' or 'right', so is my sister
-            parent = node.parent
             left = parent.children[0]
             right = parent.children[1]
             if left.visited and right.visited: pass
@@ -1494,210 +1426,31 @@ class CCGtree:
 
         # check all descendants are marked
         if len(node.children) != 0:
-            for child in node.parent.children: assert child.visited
+            for child in parent.children: assert child.visited
         # now all its descendants have been marked! Mark node.parent
         # but only do this when parent not already set by my sister
-        if not node.parent.visited:
+        if not parent.visited:
             self.mark_NTN_myparent(node)
-        if node.parent.ruleType == 'conj':
+        if parent.ruleId == RULE_CONJ:
             self.mark_NTN_myparent_conj(node)
 
         node.visited = True
 
     def mark_NTN_myparent(self, node):
-        ''' assign the marking of node.parent '''
-
+        ''' assign the marking of node.parent, by its combinator (see Combinator) '''
+        parent = node.parent
+        n_sisters = len(node.sisters)
         # if I'm single child, then rule can be 'lex', 'tr', 'unlex'
-        if len(node.sisters) == 0:
-            # eprint('\n\n-- Now getting parent')
-            # eprint('I am node:', node)
-            if node.depth != 0:
-                # eprint('my parent before:', node.parent)
-                pass
-
-            if node.parent.ruleType == 'tr':
-                node.parent.cat.semCat.marking = '+'
-                # * syntactically 2 possibilities:
-                #   X                  X
-                # -------     or     -------
-                # Y\(Y/X)            Y/(Y\X)
-                # * but semantically only 1:
-                #     x
-                # --------- tr
-                # (x->y)->y
-                # make sure the markings on x is populated down
-                # eprint(node.parent.cat.semCat)
-                # eprint(node.cat.semCat)
-                node.parent.cat.semCat.IN.IN.marking = node.cat.semCat.marking  # TODO
-                # eprint(node.parent.cat.semCat)
-                # eprint(node.cat.semCat)
-                # store the 2 y's in self.trTypes
-                self.trTypes.append( (node.parent.cat.semCat.IN.OUT,
-                                      node.parent.cat.semCat.OUT) )
-                # eprint('------')
-                # eprint(node)
-                # eprint(node.parent)
-            elif node.parent.ruleType == 'lex':
-                # probably we don't have to do anything
-                # 'lex' happens for 'John' or 'reading' in 'this is the book that
-                #   I burnt without reading'
-                # we want 'John' to be NP+
-                # eprint('node:', node)
-                node.parent.cat.semCat.marking = '+'
-                # eprint('node.parent:', node.parent)
-            elif node.parent.ruleType == 'unlex':
-                # NP -> N: rule added by me, for RC, do nothing
-                pass
-            else:  # terminal node
-                pass
-
+        if n_sisters == 0:
+            RULES[parent.ruleId].mark_unary(self, parent, node)
         # if I got one sister
-        elif len(node.sisters) == 1:
-            parent = node.parent
-            left = parent.children[0]
-            right = parent.children[1]
-
-            if node.depth != 0:
-                pass
-            if parent.ruleType == 'fa':
-                # X/Y Y -> X
-                # make sure input and output of FA is correct
-                # may not be true after fixQuantifier: e.g. Several man in a competition are running in door
-                try:
-                    assert parent.cat.semCat.semCatStr == left.cat.semCat.OUT.semCatStr
-                    assert left.cat.semCat.IN.semCatStr == right.cat.semCat.semCatStr
-                except AssertionError:
-                    eprint("Error in fa, likely due to fixQuantifier:")
-                    eprint("parent: {}\nleft  : {}\nright : {}".format(parent, left, right))
-                parent.cat.semCat = left.cat.semCat.OUT  # assign marking
-
-                # TODO comparator
-                self.compareSemCat(left.cat.semCat.IN, right.cat.semCat, parent)
-                # left.cat.semCat.IN = right.cat.semCat
-
-            elif parent.ruleType == 'ba':
-                # Y X\Y -> X
-                # make sure input and output of BA is correct
-                assert parent.cat.semCat.semCatStr == right.cat.semCat.OUT.semCatStr
-                assert right.cat.semCat.IN.semCatStr == left.cat.semCat.semCatStr
-
-                # --- FOR RELATIVE CLAUSES --- #
-                # TODO: COULD BE DELETED NOW since fixTree() fixes the RC
-                # if X\Y is NP\NP, the RC in English (English RC comes after the head NP)
-                # TODO, ONLY do this for RC, but NOT conjunction!
-                if (right.cat.typeWOfeats == r'NP\NP') and \
-                        (right.ruleType.upper() != 'CONJ'):
-                    # then the OUT NP should have the same marking as the IN NP in right
-                    # assert right.cat.semCat.OUT.marking is None
-                    right.cat.semCat.OUT.marking = left.cat.semCat.marking
-                # --- END: FOR RELATIVE CLAUSES --- #
-
-                parent.cat.semCat = right.cat.semCat.OUT  # assign marking
-
-                # TODO comparator
-                self.compareSemCat(right.cat.semCat.IN, left.cat.semCat, parent)  # IMPORTANT
-                # right.cat.semCat.IN = left.cat.semCat
-
-            elif parent.ruleType == 'bx':
-                # two possibilities
-                # X/Y Y\Z -> X\Z
-                if parent.cat.direction == 'l':
-                    # if left.cat.right.typeWOfeats == right.cat.left.typeWOfeats:
-                    # make sure input and output of BX is correct
-                    assert parent.cat.semCat.IN.semCatStr == right.cat.semCat.IN.semCatStr
-                    assert parent.cat.semCat.OUT.semCatStr == left.cat.semCat.OUT.semCatStr
-                    parent.cat.semCat.IN = right.cat.semCat.IN  # assign marking
-                    parent.cat.semCat.OUT = left.cat.semCat.OUT  # assign marking
-                    # TODO comparator here
-                    self.compareSemCat(left.cat.semCat.IN, right.cat.semCat.OUT, parent)
-                    # left.cat.semCat.IN = right.cat.semCat.OUT
-
-                # Y/Z X\Y -> X/Z  "DID NOT" is this pattern
-                # z-->y  y-->x  ->  z-->x
-                else:
-                    # make sure input and output of BX is correct
-                    # TODO
-                    # if parent.cat.semCat.IN and parent.cat.semCat.OUT:
-                    try:
-                        assert parent.cat.semCat.IN.semCatStr == left.cat.semCat.IN.semCatStr
-                        assert parent.cat.semCat.OUT.semCatStr == right.cat.semCat.OUT.semCatStr
-                    except AssertionError:
-                        eprint('AssertionError in mark, rule = bx')
-                        eprint('left:', left.cat.semCat)
-                        eprint('right:', right.cat.semCat)
-                        eprint('parent:', parent.cat.semCat)
-                        raise ErrorCCGtree('error in mark_NTN_myparent')
-                    parent.cat.semCat.IN = left.cat.semCat.IN  # assign marking
-                    parent.cat.semCat.OUT = right.cat.semCat.OUT  # assign marking
-
-                    # TODO comparator here
-                    self.compareSemCat(right.cat.semCat.IN, left.cat.semCat.OUT, parent)
-                    # right.cat.semCat.IN = left.cat.semCat.OUT
-
-                # assign marking
-                # if at least one of them is None (i.e. dot), result = None:
-                if (right.cat.semCat.marking is None) or (left.cat.semCat.marking is None):
-                    parent.cat.semCat.marking = None
-                elif right.cat.semCat.marking == left.cat.semCat.marking:
-                    parent.cat.semCat.marking = '+'
-                else:
-                    parent.cat.semCat.marking = '-'
-
-            elif parent.ruleType == 'fc':
-                # X/Y Y/Z -> X/Z
-                if left.cat.right.typeWOfeats == right.cat.left.typeWOfeats:
-                    # make sure input and output of fc is correct
-                    assert parent.cat.semCat.IN.semCatStr == right.cat.semCat.IN.semCatStr
-                    assert parent.cat.semCat.OUT.semCatStr == left.cat.semCat.OUT.semCatStr
-                    parent.cat.semCat.IN = right.cat.semCat.IN  # assign marking
-                    parent.cat.semCat.OUT = left.cat.semCat.OUT  # assign marking
-                    # TODO comparator here
-                    self.compareSemCat(left.cat.semCat.IN, right.cat.semCat.OUT, parent)
-                    # left.cat.semCat.IN = right.cat.semCat.OUT
-
-                # Y\Z X\Y -> X\Z
-                else:
-                    assert parent.cat.semCat.IN.semCatStr == left.cat.semCat.IN.semCatStr
-                    assert parent.cat.semCat.OUT.semCatStr == right.cat.semCat.OUT.semCatStr
-                    parent.cat.semCat.IN = left.cat.semCat.IN  # assign marking
-                    parent.cat.semCat.OUT = right.cat.semCat.OUT  # assign marking
-                    # TODO comparator here
-                    self.compareSemCat(right.cat.semCat.OUT, left.cat.semCat.IN, parent)
-                    # right.cat.semCat.OUT = left.cat.semCat.IN
-
-                # assign marking
-                # if at least one of them is None (i.e. dot), result = None:
-                if (right.cat.semCat.marking is None) or (left.cat.semCat.marking is None):
-                    parent.cat.semCat.marking = None
-                elif right.cat.semCat.marking == left.cat.semCat.marking:
-                    parent.cat.semCat.marking = '+'
-                else:
-                    parent.cat.semCat.marking = '-'
-
-            elif parent.ruleType in ['rp', 'lp']:
-                # rp: right punctuation?
-                # punctuation, make parent.marking = non-punctuation-child.marking
-                if parent.cat.semCat.semCatStr == left.cat.semCat.semCatStr:
-                    parent.cat = left.cat
-                else:
-                    parent.cat = right.cat
-
-            elif parent.ruleType == 'conj': pass  # already handled
-
-            else:
-                eprint('\nunable to process rule in mark_NTN_myparent(): {}'.format(
-                    node.parent.ruleType))
-                eprint(node)
-                eprint(node.parent)
-                self.printSent(stream=sys.stderr)
-                raise ErrorCCGtree('error in mark_NTN_myparent()')
-
-                # TODO
+        elif n_sisters == 1:
+            RULES[parent.ruleId].mark_binary(self, parent, parent.children[0], parent.children[1])
         else:
-            eprint('wrong number of sisters: {}'.format(node))
+            log.debug('wrong number of sisters: {}', node)
             raise ErrorCCGtree('error in mark_NTN_myparent()')
 
-        node.parent.visited = True
+        parent.visited = True
 
         # do this every time when we mark a parent
         self.assignEqualMarkingTR()
@@ -1707,22 +1460,22 @@ class CCGtree:
     def mark_NTN_helper_conj(self, node):
         ''' get marking for CONJ rule '''
         if len(node.children) == 0:
-            if node.parent.ruleType == 'conj':
+            if node.parent.ruleId == RULE_CONJ:
                 self.mark_NTN_myparent_conj(node)
         else:
             if len(node.children) == 2:  # 2 children
                 self.mark_NTN_helper_conj(node.children[0])  # left child
                 self.mark_NTN_helper_conj(node.children[1])  # right child
                 # now fix node.parent
-                if node.parent.ruleType == 'conj':
+                if node.parent.ruleId == RULE_CONJ:
                     self.mark_NTN_myparent_conj(node)
             elif len(node.children) == 1:  # only one child, rule is either 'lex' or 'tr'
                 self.mark_NTN_helper_conj(node.children[0])
                 # now fix node itself
-                if node.parent.ruleType == 'conj':
+                if node.parent.ruleId == RULE_CONJ:
                     self.mark_NTN_myparent_conj(node)
             else:
-                eprint('number of children more than 2: {}'.format(node))
+                log.debug('number of children more than 2: {}', node)
                 raise ErrorCCGtree('error in mark_NTN_myparent()')
 
     def mark_NTN_myparent_conj(self, node):
@@ -1752,10 +1505,10 @@ class CCGtree:
 
             # check if X1 type = X2 type
             if X1.cat.typeWOpolarity != X2.cat.typeWOpolarity:
-                eprint("bad conjunction! setting conjuction type to 'conj'")
-                eprint("\tX1:", X1.cat.typeWOpolarity)
-                eprint("\tX2:", X2.cat.typeWOpolarity)
-                eprint("\tconj:", conj.cat)
+                log.debug("bad conjunction! setting conjuction type to 'conj'")
+                log.debug("\tX1: {}", X1.cat.typeWOpolarity)
+                log.debug("\tX2: {}", X2.cat.typeWOpolarity)
+                log.debug("\tconj: {}", conj.cat)
                 return
 
             X2Type = str(X2.cat.typeWOpolarity)
@@ -1794,8 +1547,8 @@ class CCGtree:
                 # assert X1 and X2 are exactly the same
                 try: assert X1.cat.semCat.semCatStr == X2.cat.semCat.semCatStr
                 except AssertionError:
-                    eprint('X1.cat.semCat:', X1.cat.semCat)
-                    eprint('X2.cat.semCat:', X2.cat.semCat)
+                    log.debug('X1.cat.semCat: {}', X1.cat.semCat)
+                    log.debug('X2.cat.semCat: {}', X2.cat.semCat)
                     raise ErrorCCGtree('error in mark_NTN_myparent_conj')
                 parent.cat.semCat.OUT = X2.cat.semCat
 
@@ -1830,8 +1583,8 @@ class CCGtree:
         try:
             assert semCat1.semCatStr == semCat2.semCatStr  # semCatStr does not have +/-
         except AssertionError:
-            eprint('semCat1.semCatStr: {}'.format(semCat1.semCatStr))
-            eprint('semCat2.semCatStr: {}'.format(semCat2.semCatStr))
+            log.debug('semCat1.semCatStr: {}', semCat1.semCatStr)
+            log.debug('semCat2.semCatStr: {}', semCat2.semCatStr)
             raise ErrorCompareSemCat('parent is: {}'.format(parent))
 
         # eprint('---\nbefore:\nsemCat1:', semCat1, semCat1.semCatStr)
@@ -1857,9 +1610,9 @@ class CCGtree:
         if self.semCatGreater(semCat1, semCat2):  # semCat2 is more specific
             semCat1.marking = semCat2.marking
         else:
-            eprint(semCat1, semCat2)
-            eprint(semCat1.marking, semCat2.marking)
-            eprint("parent: {}".format(parent))
+            log.debug('{} {}', semCat1, semCat2)
+            log.debug('{} {}', semCat1.marking, semCat2.marking)
+            log.debug("parent: {}", parent)
             raise ErrorCompareSemCat("{} not greater than {}\n\n".format(semCat1, semCat2))
 
     def semCatGreater(self, semCat1, semCat2):
@@ -1954,14 +1707,27 @@ class CCGtree:
         else:
             self.polarizeHelper(functor, monoDirection)
 
-    def polarize(self):
-        self.polarizeHelper(self.root, 'UP')
+    def polarize(self, impSign=False):
+        ''' with impSign=True, also do getImpSign() in the same walk '''
+        if not impSign:
+            self.polarizeHelper(self.root, 'UP')
+            return
+        self.impSignWalk = object()  # marks the nodes reached by polarizeHelper
+        self.root.impSign = "+"
+        try: self.polarizeHelper(self.root, 'UP')
+        except Exception:
+            self.clearImpSign(self.root)  # as if getImpSign() had not run
+            raise
+        finally: self.impSignWalk = None
         # for leafNode in self.leafNodes:
         #     self.finalFlip(leafNode)
 
     def polarizeHelper(self, node, monoDirection):
         # assign UP/DOWN to node
         node.cat.monotonicity = monoDirection
+        if self.impSignWalk is not None:
+            self.polarizeImpSign(node, monoDirection)
+            return
 
         r"""
         # -----------------------
@@ -1994,128 +1760,34 @@ class CCGtree:
         if len(node.children) == 0:  # leaf
             return
         if len(node.children) == 2:  # 2 children
-            left = node.children[0]
-            right = node.children[1]
-
-            if node.ruleType == 'ba':  # Y X\Y --> X   functor = right
-                try:
-                    if right.ruleType.upper() == 'CONJ':
-                        self.polarizeHelper(left, self.calcMono(right, monoDirection))
-                        self.polarizeHelper(right, monoDirection)
-                    else:
-                        if right.cat.semCat.IN.semCatStr == '((e,t),t)':  # NP
-                            self.Krule(right, monoDirection)  # k rule
-                        else:
-                            self.polarizeHelper(right, monoDirection)
-                        self.polarizeHelper(left, self.calcMono(right, monoDirection))
-                except AttributeError:  # 'LeafNode' (right) object has no attribute 'ruleType'
-                    if right.cat.semCat.IN.semCatStr == '((e,t),t)':  # NP
-                        self.Krule(right, monoDirection)  # k rule
-                    else:
-                        self.polarizeHelper(right, monoDirection)
-                    self.polarizeHelper(left, self.calcMono(right, monoDirection))
-
-            elif node.ruleType == 'fa':  # X/Y Y --> X   functor = left
-                try:
-                    if left.ruleType.upper() == 'CONJ':
-                        self.polarizeHelper(right, self.calcMono(left, monoDirection))
-                        self.polarizeHelper(left, monoDirection)
-                    else:
-                        if left.cat.semCat.IN.semCatStr == '((e,t),t)':  # NP
-                            self.Krule(left, monoDirection)  # k rule
-                        else:
-                            self.polarizeHelper(left, monoDirection)
-                        self.polarizeHelper(right, self.calcMono(left, monoDirection))
-                except AttributeError:  # 'LeafNode' (left) object has no attribute 'ruleType'
-                    if left.cat.semCat.IN.semCatStr == '((e,t),t)':  # NP
-                        self.Krule(left, monoDirection)  # k rule
-                    else:
-                        self.polarizeHelper(left, monoDirection)
-                    self.polarizeHelper(right, self.calcMono(left, monoDirection))
-
-            elif node.ruleType == 'bx':
-                # X/Y Y\Z -> X\Z    functor = left
-                if node.cat.direction == 'l':
-                    if (len(left.children) != 0) and \
-                            (left.cat.semCat.IN.semCatStr == '((e,t),t)'):  # NP
-                        self.Krule(left, monoDirection)  # TODO no k rule if leafNode
-                    else:
-                        self.polarizeHelper(left, monoDirection)
-                    self.polarizeHelper(right, self.calcMono(left, monoDirection))
-                # Y/Z X\Y -> X/Z    functor = right
-                else:
-                    if (len(right.children) != 0) and \
-                            (right.cat.semCat.IN.semCatStr == '((e,t),t)'):  # NP
-                        self.Krule(right, monoDirection)  # TODO no k rule if leafNode
-                    else:
-                        self.polarizeHelper(right, monoDirection)
-                    self.polarizeHelper(left, self.calcMono(right, monoDirection))
-
-            elif node.ruleType == 'fc':  # Z/Y Y/X -> Z/X or Y\X Z\Y -> Z\X
-                # X/Y Y/Z -> X/Z    functor = left
-                if node.cat.direction == 'r':
-                    if (len(left.children) != 0) and \
-                            (left.cat.semCat.IN.semCatStr == '((e,t),t)'):  # NP
-                        self.Krule(left, monoDirection)  # TODO no k rule if leafNode
-                    else:
-                        self.polarizeHelper(left, monoDirection)
-                    self.polarizeHelper(right, self.calcMono(right, monoDirection))
-                # Y\Z X\Y -> X\Z    functor = right
-                else:
-                    if (len(right.children) != 0) and \
-                            (right.cat.semCat.IN.semCatStr == '((e,t),t)'):  # NP
-                        self.Krule(right, monoDirection)  # TODO no k rule if leafNode
-                    else:
-                        self.polarizeHelper(right, monoDirection)
-                    self.polarizeHelper(left, self.calcMono(right, monoDirection))
-
-            elif node.ruleType == 'conj':  # conjunction
-                try:  #
-                    if left.cat.typeWOfeats == "conj":
-                        eprint("unable to polarize conj rule! X1, X2 not same type!")
-                    elif left.pos.upper() == 'CC':
-                        #        conj(left)      NP(right)
-                        #        -------------------------- conj
-                        # NP(sister)           NP\NP(parent)
-                        # ----------------------------------- fa/ba
-                        #             NP
-                        # right.mono = sister.mono
-                        self.polarizeHelper(right, right.parent.sisters[0].cat.monotonicity)
-                        left.cat.monotonicity = 'UP'  # set the conj to UP, no matter what
-                except AttributeError:  # 'NonTermNode' object has no attribute 'pos'
-                    try:
-                        if right.pos.upper() == 'CC':
-                            self.polarizeHelper(left, left.parent.sisters[0].cat.monotonicity)
-                            right.cat.monotonicity = 'UP'  # set the conj to UP, no matter what
-                    except AttributeError:
-                        eprint('unable to polarize conj rule!\nNo "CC" pos')
-                except:
-                    eprint('unable to polarize conj rule!\n')
-                    eprint(left)
-                    eprint(right)
-                    raise ErrorCCGtree('unable to polarize conj rule!')
-            elif node.ruleType in ['rp', 'lp']: # punctuation
-                self.polarizeHelper(left, monoDirection)
-                self.polarizeHelper(right, monoDirection)
-            else:
-                raise ErrorCCGtree('unknown ruleType in polarize (two children): '
-                                   '{}'.format(node.ruleType))
-
+            RULES[node.ruleId].polarize_binary(self, node, node.children[0], node.children[1],
+                                               monoDirection)
         elif len(node.children) == 1:  # 1 child
-            child = node.children[0]
-            if node.ruleType == 'lex':
-                self.polarizeHelper(child, monoDirection)
-            elif node.ruleType == 'unlex':  # keep the same direction
-                self.polarizeHelper(child, monoDirection)
-            elif node.ruleType == 'tr':  # type raising
-                # for (x->y)->y, the +/- on the first (i.e. left) arrow
-                # determines the monoDirection of child
-                self.polarizeHelper(child,
-                                    self.calcMono(node.cat.semCat.IN.marking,
-                                                  monoDirection))
-            else:
-                eprint('unknown ruleType in polarize (one child): {}'.format(node.ruleType))
-                pass
+            RULES[node.ruleId].polarize_unary(self, node, node.children[0], monoDirection)
+
+    def polarizeImpSign(self, node, monoDirection):
+        ''' polarizeHelper() when polarize(impSign=True): node.impSign is
+        known, set the impSign of the children before going down to them '''
+        node.impSignWalk = self.impSignWalk
+        children = node.children
+        if len(children) == 0:  # leaf
+            return
+        self.getImpSignChildren(node)
+        try:
+            if len(children) == 2:  # 2 children
+                RULES[node.ruleId].polarize_binary(self, node, children[0], children[1],
+                                                   monoDirection)
+            elif len(children) == 1:  # 1 child
+                RULES[node.ruleId].polarize_unary(self, node, children[0], monoDirection)
+        finally:
+            # some rules do not polarize all children (e.g. conj), or raise
+            # an error another rule recovers from; finish their impSign
+            for child in children:
+                if child.impSignWalk is not self.impSignWalk: self.getImpSignHelper(child)
+
+    def clearImpSign(self, node):
+        node.impSign = None
+        for child in node.children: self.clearImpSign(child)
 
     def calcMono(self, functorORmarking, monoDirection):
         ''' functorORmarking can either be a functor or simply marking(+/-) '''
@@ -2134,8 +1806,8 @@ class CCGtree:
         elif monoDirection == 'UNK' or marking is None:  # None = 'dot':
             return 'UNK'
         else:
-            self.printTree()
-            eprint(marking, monoDirection)
+            if log.enabled(DEBUG): self.printTree(stream=sys.stderr)
+            log.debug('{} {}', marking, monoDirection)
             raise ErrorCCGtree('Unknown Mono monoDirection/functor!')
 
     def flip(self, monoDirection):
@@ -2172,9 +1844,14 @@ class CCGtree:
     def getImpSignHelper(self, node):
         """ node is the parent """
         if len(node.children) == 0: return
+        self.getImpSignChildren(node)
+        for child in node.children:
+            self.getImpSignHelper(child)
+
+    def getImpSignChildren(self, node):
+        """ the impSign of the children of node, from node.impSign """
         if len(node.children) == 1:
             node.children[0].impSign = node.impSign
-            self.getImpSignHelper(node.children[0])
         else:  # 2 children
             # find out if any child has impType
             functor, argument = None, None
@@ -2196,8 +1873,6 @@ class CCGtree:
             else:  # just propagate up
                 node.children[0].impSign = node.impSign
                 node.children[1].impSign = node.impSign
-            self.getImpSignHelper(node.children[0])
-            self.getImpSignHelper(node.children[1])
 
     def computeImpSign(self, functor):
         """ if functor = forget +-|-+, then return the flipped impSign """
@@ -2219,9 +1894,9 @@ class CCGtree:
         # make sure there are same number of { and }
         try: assert easyccg_tree_str.count('{') == easyccg_tree_str.count('}')
         except AssertionError:
-            eprint('unequal num of { and }\n#{: %s, #}: %s' %
-                  (easyccg_tree_str.count('{'), easyccg_tree_str.count('}')))
-            eprint(easyccg_tree_str)
+            log.debug('unequal num of {{ and }}\n#{{: {}, #}}: {}',
+                      easyccg_tree_str.count('{'), easyccg_tree_str.count('}'))
+            log.debug('{}', easyccg_tree_str)
             raise ErrorCCGtree("Error in build_easyccg()")
 
         def findIdxStr(s, char_set):
@@ -2278,7 +1953,7 @@ class CCGtree:
                         category_str, token, lemma, pos, NER, chunk = \
                         node_lst[1], node_lst[2], node_lst[3], node_lst[4], node_lst[5], node_lst[6]
                 except IndexError:
-                    eprint('node_str index error: {}'.format(node_str))
+                    log.debug('node_str index error: {}', node_str)
                     raise ErrorCCGtree("Error in build_easyccg()")
 
                 cat = Cat(originalType=category_str, word=token)
@@ -2317,7 +1992,7 @@ class CCGtree:
                         category_str, rule, start, end = \
                         node_lst[1], node_lst[2], node_lst[3], node_lst[4]
                 except IndexError:
-                    eprint('node_str index error: {}'.format(node_str))
+                    log.debug('node_str index error: {}', node_str)
                     raise ErrorCCGtree("Error in build_easyccg()")
 
                 cat = Cat(originalType=category_str)
@@ -2363,14 +2038,14 @@ class CCGtree:
         except AssertionError: return 
         last_node = stack.pop(-1)
         self.root = last_node
-        self.regetDepth()
 
-        dummy_root = NonTermNode(depth=-1)  # dummy root, as the parent of real self.root
+        # dummy root, as the parent of real self.root
+        self.dummyRoot = dummy_root = NonTermNode(depth=-1)
         dummy_root.children = [self.root]
         self.root.parent = dummy_root
 
         # self.printTree()
-        self.getWholeStrAllNodes()
+        self.getDepthWholeStrAllNodes()
         self.wholeStr = self.root.wholeStr
         # allNodes
         self.allNodes = self.leafNodes + self.nonTermNodes
@@ -2379,59 +2054,45 @@ class CCGtree:
 
     def recover_tree(self, changes_onetree):
         ''' recover tree from changes: e.g. no => at most 5 '''
-        # changes_onetree is a list of changes
-        # [ {'before':at most 5, 'after':no, 'idx':0}, {} ... ]
-        eprint('changes:')
-        eprint(changes_onetree)
-        changes = changes_onetree
-
-        change_cnt = 0
+        # changes_onetree is a list of changes, see changelog.py
+        # [ {'before':at-most-5, 'after':no, 'idx':0, 'len_sent':6, 'tokens':[at-most, 5]}, {} ... ]
+        # idx is the leaf to replace. Changes are recovered from right to left,
+        # so the leaves before a change keep their idx; the tree is rebuilt once at the end
+        log.debug('changes:')
+        log.debug('{}', changes_onetree)
+        changes = sorted(changes_onetree, key=lambda change: change['idx'], reverse=True)
 
         for change in changes:
+            if change['idx'] == -1:  # a-lot-of in the old csv log: position unknown
+                self.recover_a_lot_of()
+                continue
+            # make sure the leaves are the tokens the log is about
+            if len(self.leafNodes) != change['len_sent'] or \
+                    self.leafNodes[change['idx']].word.lower() != change['after'].lower():
+                log.warning("*** change does not match the sentence, not recovered: {}", change)
+                if log.enabled(DEBUG): self.printSent_raw(sys.stderr)
+                continue
             # check whether it's `at most' or `at least' or `a-lot-of'
-            if change['after'] in {"no", "some", "some-exactly"}:
-                self.recover_at_most_least(change, change_cnt)
-                change_cnt += 1
-            elif change['before'] == "a-lot-of":
-                self.recover_a_lot_of()  # TODO
+            if change['before'] == "a-lot-of":
+                self.recover_a_lot_of(self.leafNodes[change['idx']])
+            elif change['after'] in {"no", "some", "some-exactly"}:
+                self.recover_at_most_least(change)
             else:
-                eprint("*** something wrong in changes for sentence:")
-                self.printSent()
+                log.warning("*** something wrong in changes for sentence:")
+                if log.enabled(DEBUG): self.printSent(stream=sys.stderr)
                 return
 
-    def recover_at_most_least(self, change, change_cnt):
+        self.buildFromRoot()
+
+    def recover_at_most_least(self, change):
         """ recover 'at most' and 'at leat', more than, less than """
         # change is a dict
-        # {'before':at most 5, 'after':no, 'idx':0}
-        if change_cnt > 0:
-            # we have already recovered something,
-            # so len_sent increased the number of changes we recovered
-            # since one change results in one more leafNode
-            change['len_sent'] += change_cnt
-            change['idx'] += change_cnt
-
-        # step 1. Make sure len_sent is correct
-        try: assert len(self.leafNodes) == change['len_sent']
-        except AssertionError:
-            eprint(len(self.leafNodes))
-            eprint(change['len_sent'])
-            self.printSent_raw(sys.stderr)
-            eprint("something wrong in recovering at most/least")
-            exit()
-
+        # {'before':at-most-5, 'after':no, 'idx':0, 'tokens':[at-most, 5]}
         node_old = self.leafNodes[change["idx"]]  # !!! replace this with `at most 5'
-        try: assert node_old.word.lower() == change["after"].lower()
-        except AssertionError:
-            eprint("words don't match in recovering at most/least")
-            exit()
-
-        # quant = exaclty
-        if change["before"].startswith("exactly-"):
-            quant = "exactly"
-        else:  # quant = at-most or at-least
-            quant = "-".join(change["before"].split("-")[:2])
+        # quant = exactly, at-most, at-least, ...
+        quant, num_str = change["tokens"]
 
-        # step 2. build 'at-most 5'
+        # step 1. build 'at-most 5'
         #   at-most          5               let's say numbers are of type N/N
         #   (NP/N)/(N/N)     N/N
         #   ---------------------- fa        people
@@ -2444,7 +2105,6 @@ class CCGtree:
                                 word=quant, impType=None, fixed=True,
                                 note=quant)
 
-        num_str = change['before'].split("-")[-1]
         node_num = LeafNode(depth=0, cat=Cat(originalType="N/N",
                                                     word=num_str),
                                 chunk=None, entity=None,
@@ -2456,21 +2116,18 @@ class CCGtree:
         node_at_most_num.children = [node_at_most, node_num]
         node_at_most.parent, node_num.parent = node_at_most_num, node_at_most_num
 
-        # step 3. replace `no' with `at most 5'    kEY STEP!!
+        # step 2. replace `no' with `at most 5'    kEY STEP!!
         node_old.parent.children[0] = node_at_most_num
         node_at_most_num.parent = node_old.parent
 
-        # step 4. rebuld tree
-        self.buildFromRoot()
-
         # self.printSent()
         # self.printTree()
 
-    def recover_a_lot_of(self):
+    def recover_a_lot_of(self, lnode_much=None):
         """ recover. Change 'much' to 'a lot of' """
-        # step 1: find the node 'much'
+        # step 1: find the node 'much', unless the log says where it is
         for lnode in self.leafNodes:
-            if lnode.word == 'much':
+            if lnode is lnode_much or (lnode_much is None and lnode.word == 'much'):
                 # step 2: replace it with 'a lot of'
                 node_a_lot_of = LeafNode(depth=0,
                                          cat=Cat(originalType=lnode.cat.typeWOfeats, word='a-lot-of'),
@@ -2484,11 +2141,10 @@ class CCGtree:
                 node_a_lot_of.parent = lnode.parent
                 lnode.parent = None
 
-        self.buildFromRoot()
-
     def build_CandC(self, ccgXml, changes_onetree=None):
         ''' build the tree recursively from xml output of CandC '''
-        self.root = NonTermNode(depth=-1)  # dummy root; important for building the tree from candc
+        # dummy root; important for building the tree from candc
+        self.root = self.dummyRoot = NonTermNode(depth=-1)
         self.build_CandC_helper(ccgXml, self.root, -1)
         self.getWholeStrAllNodes()
         # allNodes
@@ -2657,7 +2313,7 @@ class CCGtree:
             #  ----------------------fa
             #              NP   =  node_NP
             if nodeMost:
-                eprint('\nfixing\n\tmost/many/several + N + RC')
+                log.debug('\nfixing\n\tmost/many/several + N + RC')
                 node_most_new = LeafNode(depth=0, cat=Cat('NP/N', word=quant.lower()),
                                              chunk=None, entity=None,
                                              lemma=nodeMost.lemma, pos='DT', span=None, start=None,
@@ -2668,7 +2324,7 @@ class CCGtree:
 
                 # something wrong, cannot fix it
                 if node_NP.cat.typeWOfeats != 'NP':
-                    eprint('something wrong fixing most + N + RC; cannot fix it')
+                    log.debug('something wrong fixing most + N + RC; cannot fix it')
                     nodeMost.fixed = True
                     return False 
 
@@ -2790,7 +2446,7 @@ class CCGtree:
                             self.nonTermNodes.append(nodeNewNP2)
                             self.nonTermNodes.append(nodeNtmp)
                         except ValueError:
-                            eprint('error removing node from nonTermNodes')
+                            log.debug('error removing node from nonTermNodes')
                             pass
 
                         # sanity check: after the fix, 2 more NonTermNodes for each RC
@@ -2835,6 +2491,7 @@ class CCGtree:
                         in {"do", "does", "did", "is"}:  # TODO "is" ok here?
                     if lfnode.cat.typeWOpolarity == r"(S\NP)\(S\NP)":
                         node_not_s.append(lfnode)
+        fixed = False
         for node_not in node_not_s:
             # name other nodes
             node_did = node_not.parent.children[0]
@@ -2844,7 +2501,7 @@ class CCGtree:
 
             # check node_VP.cat = S\NP
             if node_VP.cat.typeWOfeats != r"S\NP":
-                eprint("warning: something weird in fixNot()")
+                log.debug("warning: something weird in fixNot()")
                 continue  # then don't fix this 'not'
 
             # make a new node_not, could be NOT or N'T
@@ -2867,7 +2524,10 @@ class CCGtree:
             node_did.parent = node_whole_VP
 
             node_whole_VP.children = [node_did, node_new]
-            self.buildFromRoot()
+            fixed = True
+        # the fixes only use parents and sisters of nodes that no other fix
+        # changes, so the tree is rebuilt once, after all of them
+        if fixed: self.buildFromRoot()
 
     def regetDepth(self):
         ''' calculate depth again, just need to traverse the tree '''
@@ -2919,7 +2579,355 @@ class CCGtree:
         else:
             return (None, None)
 
-class LeafNode:
+class Combinator:
+    """ a combinator rule, i.e. a ruleType of the parser (fa, ba, ...):
+    how mark_NTN_myparent marks the parent from its children, and how
+    polarizeHelper passes the monotonicity of the parent to its children.
+
+    Every NonTermNode gets the integer id of its combinator (node.ruleId)
+    when its ruleType is set; RULES[node.ruleId] is the combinator. A rule
+    of a new parser is a subclass registered with register(). This class
+    itself handles the unknown ruleTypes. """
+    names = ()  # ruleTypes of the rule
+
+    def mark_unary(self, tree, parent, child):
+        pass  # terminal node, or the dummy root
+
+    def mark_binary(self, tree, parent, left, right):
+        log.debug('\nunable to process rule in mark_NTN_myparent(): {}', parent.ruleType)
+        log.debug('{}', parent)
+        if log.enabled(DEBUG): tree.printSent(stream=sys.stderr)
+        raise ErrorCCGtree('error in mark_NTN_myparent()')
+
+    def polarize_unary(self, tree, parent, child, monoDirection):
+        log.debug('unknown ruleType in polarize (one child): {}', parent.ruleType)
+
+    def polarize_binary(self, tree, parent, left, right, monoDirection):
+        raise ErrorCCGtree('unknown ruleType in polarize (two children): '
+                           '{}'.format(parent.ruleType))
+
+class TypeRaising(Combinator):
+    names = ('tr',)
+
+    def mark_unary(self, tree, parent, child):
+        parent.cat.semCat.marking = '+'
+        # * syntactically 2 possibilities:
+        #   X                  X
+        # -------     or     -------
+        # Y\(Y/X)            Y/(Y\X)
+        # * but semantically only 1:
+        #     x
+        # --------- tr
+        # (x->y)->y
+        # make sure the markings on x is populated down
+        parent.cat.semCat.IN.IN.marking = child.cat.semCat.marking  # TODO
+        # store the 2 y's in tree.trTypes
+        tree.trTypes.append( (parent.cat.semCat.IN.OUT, parent.cat.semCat.OUT) )
+
+    def polarize_unary(self, tree, parent, child, monoDirection):
+        # for (x->y)->y, the +/- on the first (i.e. left) arrow
+        # determines the monoDirection of child
+        tree.polarizeHelper(child, tree.calcMono(parent.cat.semCat.IN.marking, monoDirection))
+
+class Lex(Combinator):
+    names = ('lex',)
+
+    def mark_unary(self, tree, parent, child):
+        # 'lex' happens for 'John' or 'reading' in 'this is the book that
+        #   I burnt without reading'
+        # we want 'John' to be NP+
+        parent.cat.semCat.marking = '+'
+
+    def polarize_unary(self, tree, parent, child, monoDirection):
+        tree.polarizeHelper(child, monoDirection)
+
+class Unlex(Combinator):
+    """ NP -> N: rule added by me, for RC """
+    names = ('unlex',)
+
+    def polarize_unary(self, tree, parent, child, monoDirection):
+        tree.polarizeHelper(child, monoDirection)  # keep the same direction
+
+class ForwardApplication(Combinator):
+    """ X/Y Y -> X   functor = left """
+    names = ('fa',)
+
+    def mark_binary(self, tree, parent, left, right):
+        # make sure input and output of FA is correct
+        # may not be true after fixQuantifier: e.g. Several man in a competition are running in door
+        try:
+            assert parent.cat.semCat.semCatStr == left.cat.semCat.OUT.semCatStr
+            assert left.cat.semCat.IN.semCatStr == right.cat.semCat.semCatStr
+        except AssertionError:
+            log.debug("Error in fa, likely due to fixQuantifier:")
+            log.debug("parent: {}\nleft  : {}\nright : {}", parent, left, right)
+        parent.cat.semCat = left.cat.semCat.OUT  # assign marking
+
+        # TODO comparator
+        tree.compareSemCat(left.cat.semCat.IN, right.cat.semCat, parent)
+
+    def polarize_binary(self, tree, parent, left, right, monoDirection):
+        try:
+            if left.ruleId == RULE_CONJ:
+                tree.polarizeHelper(right, tree.calcMono(left, monoDirection))
+                tree.polarizeHelper(left, monoDirection)
+            else:
+                if left.cat.semCat.IN.semCatStr == '((e,t),t)':  # NP
+                    tree.Krule(left, monoDirection)  # k rule
+                else:
+                    tree.polarizeHelper(left, monoDirection)
+                tree.polarizeHelper(right, tree.calcMono(left, monoDirection))
+        except AttributeError:  # 'LeafNode' (left) object has no attribute 'ruleId'
+            if left.cat.semCat.IN.semCatStr == '((e,t),t)':  # NP
+                tree.Krule(left, monoDirection)  # k rule
+            else:
+                tree.polarizeHelper(left, monoDirection)
+            tree.polarizeHelper(right, tree.calcMono(left, monoDirection))
+
+class BackwardApplication(Combinator):
+    """ Y X\\Y -> X   functor = right """
+    names = ('ba',)
+
+    def mark_binary(self, tree, parent, left, right):
+        # make sure input and output of BA is correct
+        assert parent.cat.semCat.semCatStr == right.cat.semCat.OUT.semCatStr
+        assert right.cat.semCat.IN.semCatStr == left.cat.semCat.semCatStr
+
+        # --- FOR RELATIVE CLAUSES --- #
+        # TODO: COULD BE DELETED NOW since fixTree() fixes the RC
+        # if X\Y is NP\NP, the RC in English (English RC comes after the head NP)
+        # TODO, ONLY do this for RC, but NOT conjunction!
+        if (right.cat.typeWOfeats == r'NP\NP') and (right.ruleId != RULE_CONJ):
+            # then the OUT NP should have the same marking as the IN NP in right
+            right.cat.semCat.OUT.marking = left.cat.semCat.marking
+        # --- END: FOR RELATIVE CLAUSES --- #
+
+        parent.cat.semCat = right.cat.semCat.OUT  # assign marking
+
+        # TODO comparator
+        tree.compareSemCat(right.cat.semCat.IN, left.cat.semCat, parent)  # IMPORTANT
+
+    def polarize_binary(self, tree, parent, left, right, monoDirection):
+        try:
+            if right.ruleId == RULE_CONJ:
+                tree.polarizeHelper(left, tree.calcMono(right, monoDirection))
+                tree.polarizeHelper(right, monoDirection)
+            else:
+                if right.cat.semCat.IN.semCatStr == '((e,t),t)':  # NP
+                    tree.Krule(right, monoDirection)  # k rule
+                else:
+                    tree.polarizeHelper(right, monoDirection)
+                tree.polarizeHelper(left, tree.calcMono(right, monoDirection))
+        except AttributeError:  # 'LeafNode' (right) object has no attribute 'ruleId'
+            if right.cat.semCat.IN.semCatStr == '((e,t),t)':  # NP
+                tree.Krule(right, monoDirection)  # k rule
+            else:
+                tree.polarizeHelper(right, monoDirection)
+            tree.polarizeHelper(left, tree.calcMono(right, monoDirection))
+
+def compose_marking(parent, left, right):
+    """ marking of the composed function: + if the markings of left and right
+    are the same, - if not, None if one of them is None (i.e. dot) """
+    if (right.cat.semCat.marking is None) or (left.cat.semCat.marking is None):
+        parent.cat.semCat.marking = None
+    elif right.cat.semCat.marking == left.cat.semCat.marking:
+        parent.cat.semCat.marking = '+'
+    else:
+        parent.cat.semCat.marking = '-'
+
+class BackwardCrossedComposition(Combinator):
+    names = ('bx',)
+
+    def mark_binary(self, tree, parent, left, right):
+        # two possibilities
+        # X/Y Y\Z -> X\Z
+        if parent.cat.direction == 'l':
+            # make sure input and output of BX is correct
+            assert parent.cat.semCat.IN.semCatStr == right.cat.semCat.IN.semCatStr
+            assert parent.cat.semCat.OUT.semCatStr == left.cat.semCat.OUT.semCatStr
+            parent.cat.semCat.IN = right.cat.semCat.IN  # assign marking
+            parent.cat.semCat.OUT = left.cat.semCat.OUT  # assign marking
+            # TODO comparator here
+            tree.compareSemCat(left.cat.semCat.IN, right.cat.semCat.OUT, parent)
+
+        # Y/Z X\Y -> X/Z  "DID NOT" is this pattern
+        # z-->y  y-->x  ->  z-->x
+        else:
+            # make sure input and output of BX is correct
+            try:
+                assert parent.cat.semCat.IN.semCatStr == left.cat.semCat.IN.semCatStr
+                assert parent.cat.semCat.OUT.semCatStr == right.cat.semCat.OUT.semCatStr
+            except AssertionError:
+                log.debug('AssertionError in mark, rule = bx')
+                log.debug('left: {}', left.cat.semCat)
+                log.debug('right: {}', right.cat.semCat)
+                log.debug('parent: {}', parent.cat.semCat)
+                raise ErrorCCGtree('error in mark_NTN_myparent')
+            parent.cat.semCat.IN = left.cat.semCat.IN  # assign marking
+            parent.cat.semCat.OUT = right.cat.semCat.OUT  # assign marking
+
+            # TODO comparator here
+            tree.compareSemCat(right.cat.semCat.IN, left.cat.semCat.OUT, parent)
+
+        compose_marking(parent, left, right)
+
+    def polarize_binary(self, tree, parent, left, right, monoDirection):
+        # X/Y Y\Z -> X\Z    functor = left
+        if parent.cat.direction == 'l':
+            if (len(left.children) != 0) and \
+                    (left.cat.semCat.IN.semCatStr == '((e,t),t)'):  # NP
+                tree.Krule(left, monoDirection)  # TODO no k rule if leafNode
+            else:
+                tree.polarizeHelper(left, monoDirection)
+            tree.polarizeHelper(right, tree.calcMono(left, monoDirection))
+        # Y/Z X\Y -> X/Z    functor = right
+        else:
+            if (len(right.children) != 0) and \
+                    (right.cat.semCat.IN.semCatStr == '((e,t),t)'):  # NP
+                tree.Krule(right, monoDirection)  # TODO no k rule if leafNode
+            else:
+                tree.polarizeHelper(right, monoDirection)
+            tree.polarizeHelper(left, tree.calcMono(right, monoDirection))
+
+class ForwardComposition(Combinator):
+    """ Z/Y Y/X -> Z/X or Y\\X Z\\Y -> Z\\X """
+    names = ('fc',)
+
+    def mark_binary(self, tree, parent, left, right):
+        # X/Y Y/Z -> X/Z
+        if left.cat.right.typeWOfeats == right.cat.left.typeWOfeats:
+            # make sure input and output of fc is correct
+            assert parent.cat.semCat.IN.semCatStr == right.cat.semCat.IN.semCatStr
+            assert parent.cat.semCat.OUT.semCatStr == left.cat.semCat.OUT.semCatStr
+            parent.cat.semCat.IN = right.cat.semCat.IN  # assign marking
+            parent.cat.semCat.OUT = left.cat.semCat.OUT  # assign marking
+            # TODO comparator here
+            tree.compareSemCat(left.cat.semCat.IN, right.cat.semCat.OUT, parent)
+
+        # Y\Z X\Y -> X\Z
+        else:
+            assert parent.cat.semCat.IN.semCatStr == left.cat.semCat.IN.semCatStr
+            assert parent.cat.semCat.OUT.semCatStr == right.cat.semCat.OUT.semCatStr
+            parent.cat.semCat.IN = left.cat.semCat.IN  # assign marking
+            parent.cat.semCat.OUT = right.cat.semCat.OUT  # assign marking
+            # TODO comparator here
+            tree.compareSemCat(right.cat.semCat.OUT, left.cat.semCat.IN, parent)
+
+        compose_marking(parent, left, right)
+
+    def polarize_binary(self, tree, parent, left, right, monoDirection):
+        # X/Y Y/Z -> X/Z    functor = left
+        if parent.cat.direction == 'r':
+            if (len(left.children) != 0) and \
+                    (left.cat.semCat.IN.semCatStr == '((e,t),t)'):  # NP
+                tree.Krule(left, monoDirection)  # TODO no k rule if leafNode
+            else:
+                tree.polarizeHelper(left, monoDirection)
+            tree.polarizeHelper(right, tree.calcMono(right, monoDirection))
+        # Y\Z X\Y -> X\Z    functor = right
+        else:
+            if (len(right.children) != 0) and \
+                    (right.cat.semCat.IN.semCatStr == '((e,t),t)'):  # NP
+                tree.Krule(right, monoDirection)  # TODO no k rule if leafNode
+            else:
+                tree.polarizeHelper(right, monoDirection)
+            tree.polarizeHelper(left, tree.calcMono(right, monoDirection))
+
+class Conjunction(Combinator):
+    """ the marking is done by mark_NTN_myparent_conj """
+    names = ('conj',)
+
+    def mark_binary(self, tree, parent, left, right):
+        pass  # already handled
+
+    def polarize_binary(self, tree, parent, left, right, monoDirection):
+        try:  #
+            if left.cat.typeWOfeats == "conj":
+                log.debug("unable to polarize conj rule! X1, X2 not same type!")
+            elif left.pos.upper() == 'CC':
+                #        conj(left)      NP(right)
+                #        -------------------------- conj
+                # NP(sister)           NP\NP(parent)
+                # ----------------------------------- fa/ba
+                #             NP
+                # right.mono = sister.mono
+                tree.polarizeHelper(right, right.parent.sisters[0].cat.monotonicity)
+                left.cat.monotonicity = 'UP'  # set the conj to UP, no matter what
+        except AttributeError:  # 'NonTermNode' object has no attribute 'pos'
+            try:
+                if right.pos.upper() == 'CC':
+                    tree.polarizeHelper(left, left.parent.sisters[0].cat.monotonicity)
+                    right.cat.monotonicity = 'UP'  # set the conj to UP, no matter what
+            except AttributeError:
+                log.debug('unable to polarize conj rule!\nNo "CC" pos')
+        except:
+            log.debug('unable to polarize conj rule!\n')
+            log.debug('{}', left)
+            log.debug('{}', right)
+            raise ErrorCCGtree('unable to polarize conj rule!')
+
+class Punctuation(Combinator):
+    """ rp: right punctuation, lp: left punctuation """
+    names = ('rp', 'lp')
+
+    def mark_binary(self, tree, parent, left, right):
+        # punctuation, make parent.marking = non-punctuation-child.marking
+        if parent.cat.semCat.semCatStr == left.cat.semCat.semCatStr:
+            parent.cat = left.cat
+        else:
+            parent.cat = right.cat
+
+    def polarize_binary(self, tree, parent, left, right, monoDirection):
+        tree.polarizeHelper(left, monoDirection)
+        tree.polarizeHelper(right, monoDirection)
+
+RULES = []      # [ Combinator ], by rule id
+RULE_IDS = {}   # { ruleType : rule id }
+
+def register(combinator):
+    """ add a Combinator for its ruleTypes, return its rule id; nodes built
+    before keep the rule id they had """
+    ruleId = len(RULES)
+    RULES.append(combinator)
+    for name in combinator.names: RULE_IDS[name] = ruleId
+    return ruleId
+
+RULE_UNKNOWN = register(Combinator())
+for combinator in (TypeRaising, Lex, Unlex, ForwardApplication, BackwardApplication,
+                   BackwardCrossedComposition, ForwardComposition, Punctuation):
+    register(combinator())
+RULE_CONJ = register(Conjunction())
+
+class TreeNode:
+    """ parent and sisters are weak references: a tree is owned top-down,
+    through children (and CCGtree.dummyRoot for the root), so it has no
+    reference cycles, and a tree nobody refers to any more is freed right
+    away by reference counting instead of by the cyclic gc """
+    @property
+    def parent(self):
+        ref = self._parent
+        return None if ref is None else ref()
+    @parent.setter
+    def parent(self, node):
+        self._parent = None if node is None else weakref.ref(node)
+    @property
+    def sisters(self):
+        return [ref() for ref in self._sisters]
+    @sisters.setter
+    def sisters(self, nodes):
+        self._sisters = [weakref.ref(node) for node in nodes]
+    def __getstate__(self):
+        # strong references, so deepcopy/pickle take the copied parent and sisters
+        state = self.__dict__.copy()
+        state['_parent'], state['_sisters'] = self.parent, self.sisters
+        return state
+    def __setstate__(self, state):
+        state = state.copy()
+        parent, sisters = state.pop('_parent'), state.pop('_sisters')
+        self.__dict__.update(state)
+        self.parent, self.sisters = parent, sisters
+
+class LeafNode(TreeNode):
     def __init__(self,depth,cat,chunk,entity,lemma,pos,span,start,word,impType=None,fixed=False,note=None,number=None):
         self.parent = None; self.children = []; self.sisters = []
         self.depth = depth
@@ -2935,6 +2943,7 @@ class LeafNode:
         self.word_raw = word
         # --------------
         self.visited = True  # whether visited or not when assigning plus/minus sign
+        self.impSignWalk = None  # reached by polarize(impSign=True)?
         self.span_id = None  # an id, for mytree2transccg.py
         if impType is None: self.impType = ImpType()
         else: self.impType = impType  # type of implicative
@@ -2960,19 +2969,27 @@ class LeafNode:
     def __repr__(self):
         return self.__str__()
 
-class NonTermNode:
+class NonTermNode(TreeNode):
     def __init__(self,depth=None,cat=None,ruleType=None,wholeStr='',impType=None,note=None,number=None):
         self.parent = None; self.children = []; self.sisters = []
         self.depth = depth
-        self.cat = cat; self.ruleType = ruleType
+        self.cat = cat; self.ruleType = ruleType  # also sets self.ruleId
         self.wholeStr = wholeStr.upper()
         self.visited = False  # whether visited or not when assigning plus/minus sign
+        self.impSignWalk = None  # reached by polarize(impSign=True)?
         self.span_id = None   # an id, for mytree2transccg.py
         if impType is None: self.impType = ImpType()
         else: self.impType = impType  # type of implicative
         self.impSign = None   # sign of implicative
         self.note = note      # note: "at-most", "at-least", "at-most-N", "at-least-N"
         self.number = number  # sg = singular, pl = plural
+    @property
+    def ruleType(self):
+        return self._ruleType
+    @ruleType.setter
+    def ruleType(self, ruleType):
+        self._ruleType = ruleType
+        self.ruleId = RULE_IDS.get(ruleType, RULE_UNKNOWN)  # see Combinator
     def copy(self):
         cat = copy.deepcopy(self.cat)  # recursively create new copy
         newNode = NonTermNode(self.depth, cat, self.ruleType, self.wholeStr)
@@ -3050,6 +3067,12 @@ class SemCat:
                 # print(semcat)
                 self.assignRecursiveHelper(semcat.IN, plusORminus, exclude)
                 self.assignRecursiveHelper(semcat.OUT, plusORminus, exclude)
+    def copy(self):
+        ''' a copy of the whole SemCat tree '''
+        return SemCat(semCatStr=self.semCatStr,
+                      IN=self.IN.copy() if self.IN is not None else None,
+                      OUT=self.OUT.copy() if self.OUT is not None else None,
+                      marking=self.marking)
     def getsemCatStrWithPM(self):
         """ return semCatStr with + - """
         if (self.IN is None) and (self.OUT is None):
@@ -3085,6 +3108,47 @@ class ImpType:
             elif lemma in {"not", "n't"}:
                 self.impType_str = "pn|np"
 
+class CatCache:
+    """ hash-consing of categories: the Cats parsed so far, by category
+    string, in a bounded LRU. Cat('(S\\NP)/NP', word) on a category seen
+    before copies the parsed template instead of parsing the string again.
+
+    The templates are never handed out: mark and polarize write markings into
+    the SemCats of a tree, so every Cat gets its own copy. The word only
+    matters for the semCat of conj when there is none, hence the key. """
+    def __init__(self, size=4096):
+        self.size = size
+        self.templates = collections.OrderedDict()  # { (type, word is None) : Cat }
+        self.hits = self.misses = 0
+
+    def get(self, originalType, word):
+        if not self.size: return None
+        template = self.templates.get((originalType, word is None))
+        if template is None:
+            self.misses += 1
+            return None
+        self.templates.move_to_end((originalType, word is None))
+        self.hits += 1
+        return template
+
+    def put(self, originalType, word, cat):
+        """ keep a copy of the freshly parsed cat, before anyone marks it """
+        if not self.size: return
+        template = Cat.__new__(Cat)
+        cat.copyInto(template, word)
+        self.templates[(originalType, word is None)] = template
+        if len(self.templates) > self.size: self.templates.popitem(last=False)
+
+    def clear(self):
+        self.templates.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        return {'size': len(self.templates), 'hits': self.hits, 'misses': self.misses}
+
+# CCG2MONO_CAT_CACHE=0 turns hash-consing of categories off
+CAT_CACHE = CatCache(int(os.environ.get('CCG2MONO_CAT_CACHE', 4096)))
+
 class Cat:
     '''
     we need to parse a type into
@@ -3096,6 +3160,11 @@ class Cat:
     '''
 
     def __init__(self, originalType=None, word=None):
+        if originalType:
+            template = CAT_CACHE.get(originalType, word)
+            if template is not None:
+                template.copyInto(self, word)
+                return
         self.direction = None       # str: \=l, /=r and s(single)
         self.left = None            # another Cat object
         self.right = None           # another Cat object
@@ -3120,6 +3189,7 @@ class Cat:
 
         self.typeWOpolarity = self.originalType.replace('_i','').replace('_r','')
         self.typeWOfeats = re.sub(self.regexBrk, '', self.typeWOpolarity)
+        CAT_CACHE.put(originalType, word, self)
 
         # TODO why this? intransitive verb = (((e,t),t),t)
         # if self.semCat.semCatStr == '(((e,t),t),t)':
@@ -3274,8 +3344,8 @@ class Cat:
             elif self.originalType[ind] == '/':
                 self.direction = 'r'
             else:
-                eprint('something went wrong when converting types!')
-                eprint(self.originalType, self.originalType[ind])
+                log.debug('something went wrong when converting types!')
+                log.debug('{} {}', self.originalType, self.originalType[ind])
                 raise ErrorCat()
 
             self.left = self.originalType[:ind]
@@ -3302,6 +3372,21 @@ class Cat:
             self.semCat = SemCat(**{'IN': self.right.semCat,
                                     'OUT': self.left.semCat})
 
+    def copyInto(self, cat, word):
+        ''' make cat a copy of self, with new Cats and SemCats all the way down,
+        the semCat of a complex Cat is built from the copies of left and right '''
+        cat.__dict__.update(self.__dict__)
+        cat.word = word
+        if self.left is None:
+            cat.semCat = self.semCat.copy()
+            return
+        cat.left = Cat.__new__(Cat)
+        self.left.copyInto(cat.left, word)
+        cat.right = Cat.__new__(Cat)
+        self.right.copyInto(cat.right, word)
+        cat.semCat = SemCat(semCatStr=self.semCat.semCatStr, IN=cat.right.semCat,
+                            OUT=cat.left.semCat, marking=self.semCat.marking)
+
     def __str__(self):
         return('{}'.format(self.typeWOpolarity))
 
@@ -3352,5 +3437,9 @@ class ErrorAssignEqualMarking(Exception):
     """ Exception thrown when AssignEqualMarking """
     def __init__(self, message=""): Exception.__init__(self, message)
 
+# errors that mean "this sentence cannot be polarized", caught by polarize()
+POLARIZE_ERRORS = (ErrorCompareSemCat, ErrorCCGtree, ErrorCat, ErrorAssignEqualMarking,
+                   AssertionError, AttributeError)
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+'''
+lexical marking rules of the leaf nodes, for CCGtree.mark_LeafNodes
+
+The rules are data, in lexicon.json next to this file: a list tried in
+order, the first rule whose conditions all hold for a token is applied.
+-lexicon FILE on getMono.py / --lexicon FILE on mytree2transccg.py (or
+CCG2MONO_LEXICON=FILE for getMono.polarize()) uses FILE instead; copy
+lexicon.json to extend it.
+
+{"word": ["EVERY", "ALL", "EACH"], "mark": {".": "-", "OUT": "+"}}
+
+conditions (all optional, a list of values each):
+    word, lemma     uppercased word / lemma of the token
+    pos             POS tag, pos_prefix: POS tag starts with one of them
+    note            token.note, e.g. at-most (see preprocess.py)
+    cat, not_cat    typeWOfeats of the category, e.g. NP/N
+    type            originalType of the category
+    semcat          semCatStr of the category, e.g. ((e,t),t)
+actions:
+    mark            {path: marking}, marking is +, - or null
+    recursive       {path: marking}, semCat.assignRecursive(marking, EXCLUDE)
+                    on each path that exists, after mark
+    ignore_errors   a path that does not exist is not an error
+path: . is the semCat of the token, OUT.IN is semCat.OUT.IN.
+A rule without actions leaves the token alone and stops the search.
+
+The rules are compiled once into a dispatch table keyed by the signature
+of the token: its word and lemma (if some rule names them), POS tag,
+note and category. The first token with a signature is matched against the
+rules, all the others are a dict lookup, whatever the number of rules.
+'''
+
+import os
+
+__author__ = "Hai Hu"
+
+from utils import log
+
+ENV_LEXICON = 'CCG2MONO_LEXICON'
+DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexicon.json')
+
+CONDITIONS = ('word', 'lemma', 'pos', 'pos_prefix', 'note', 'cat', 'not_cat', 'type', 'semcat')
+ACTIONS = ('mark', 'recursive', 'ignore_errors')
+PATH_ATTRS = {'IN', 'OUT'}
+
+class Rule:
+    __slots__ = CONDITIONS + ('marks', 'recursive', 'ignore_errors', 'n')
+
+    def __init__(self, n, rule):
+        self.n = n  # index in the file
+        unknown = set(rule) - set(CONDITIONS + ACTIONS + ('comment',))
+        if unknown:
+            raise ErrorLexicon('rule {}: unknown keys {}'.format(n, ', '.join(sorted(unknown))))
+        for key in CONDITIONS:
+            values = rule.get(key)
+            if values is not None and not isinstance(values, list):
+                raise ErrorLexicon('rule {}: {} must be a list'.format(n, key))
+            if key == 'pos_prefix': setattr(self, key, tuple(values) if values else None)
+            else: setattr(self, key, frozenset(values) if values is not None else None)
+        self.marks = [(parse_path(n, path), marking) for path, marking in rule.get('mark', {}).items()]
+        self.recursive = [(parse_path(n, path), marking)
+                          for path, marking in rule.get('recursive', {}).items()]
+        self.ignore_errors = bool(rule.get('ignore_errors'))
+
+    def matches(self, word, lemma, pos, note, cat, originalType, semCatStr):
+        return (self.word is None or word in self.word) and \
+               (self.lemma is None or lemma in self.lemma) and \
+               (self.pos is None or pos in self.pos) and \
+               (self.pos_prefix is None or pos.startswith(self.pos_prefix)) and \
+               (self.note is None or note in self.note) and \
+               (self.cat is None or cat in self.cat) and \
+               (self.not_cat is None or cat not in self.not_cat) and \
+               (self.type is None or originalType in self.type) and \
+               (self.semcat is None or semCatStr in self.semcat)
+
+    def apply(self, semCat, exclude):
+        for path, marking in self.marks:
+            node = semCat
+            for attr in path: node = getattr(node, attr)
+            node.marking = marking
+        for path, marking in self.recursive:
+            node = semCat
+            for attr in path:
+                node = getattr(node, attr)
+                if node is None: break
+            if node is not None: node.assignRecursive(marking, exclude)
+
+class Lexicon:
+    def __init__(self, rules, exclude=None, fn=None):
+        self.fn = fn
+        self.exclude = exclude
+        self.rules = [Rule(n, rule) for n, rule in enumerate(rules)]
+        # only the words and lemmas some rule looks at are part of the signature
+        self.words = frozenset().union(*(rule.word for rule in self.rules if rule.word))
+        self.lemmas = frozenset().union(*(rule.lemma for rule in self.rules if rule.lemma))
+        self.table = {}  # { signature : Rule, or None if no rule matches }
+
+    def signature(self, token):
+        word = token.word.upper()
+        lemma = token.lemma.upper() if self.lemmas and token.lemma else None
+        cat = token.cat
+        return (word if word in self.words else None,
+                lemma if lemma in self.lemmas else None,
+                token.pos.upper(), token.note,
+                cat.typeWOfeats, cat.originalType, cat.semCat.semCatStr)
+
+    def lookup(self, token):
+        """ the rule of token, or None """
+        sig = self.signature(token)
+        try: return self.table[sig]
+        except KeyError: pass
+        rule = self.table[sig] = next((rule for rule in self.rules if rule.matches(*sig)), None)
+        return rule
+
+    def mark(self, token):
+        """ mark the semCat of a leaf node """
+        rule = self.lookup(token)
+        if rule is None: return
+        if not rule.ignore_errors:
+            rule.apply(token.cat.semCat, self.exclude)
+            return
+        try: rule.apply(token.cat.semCat, self.exclude)
+        except AttributeError: log.debug('Attribute error')
+
+def parse_path(n, path):
+    """ '.' -> (), 'OUT.IN' -> ('OUT', 'IN') """
+    if path == '.': return ()
+    attrs = tuple(path.split('.'))
+    if not set(attrs) <= PATH_ATTRS:
+        raise ErrorLexicon('rule {}: bad path {}, must be . or made of IN and OUT'.format(n, path))
+    return attrs
+
+def load(fn=None, exclude=None):
+    """ the Lexicon of fn, by default lexicon.json """
+    import json
+    fn = fn or DEFAULT
+    try:
+        with open(fn) as f: data = json.load(f)
+    except ValueError as e:
+        raise ErrorLexicon('{}: {}'.format(fn, e))
+    rules = data['rules'] if isinstance(data, dict) else data
+    return Lexicon(rules, exclude, fn)
+
+class ErrorLexicon(Exception):
+    """ Exception thrown when loading a lexicon file """
+    def __init__(self, message=""): Exception.__init__(self, message)
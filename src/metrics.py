@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+'''
+metrics of a corpus run, for dashboards
+
+-metrics PREFIX on getMono.py / --metrics PREFIX on mytree2transccg.py writes
+PREFIX.json and PREFIX.prom (Prometheus text exposition format, e.g. for the
+node_exporter textfile collector) with
+
+- sentences by outcome: polarized, error, failed_to_parse, parse_exception
+- throughput: sentences/sec overall and per --metrics-window seconds
+- a latency histogram of each stage (build, fixQuantifier, ..., polarize)
+- errors by exception type and by the function that raised it
+  (e.g. ErrorCompareSemCat in CCGtree.compareSemCat)
+- how often each ruleType branch of mark_NTN_myparent (mark) and
+  polarizeHelper (polarize) fired
+
+Metrics has the interface of timers.StageTimers (sentence(), stage(),
+end_sentence()), so it is passed to the pipeline through stage_hooks().
+'''
+
+import time, json, bisect, collections
+
+__author__ = "Hai Hu"
+
+PREFIX = 'ccg2mono'
+
+# upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+OUTCOMES = ('polarized', 'error', 'failed_to_parse', 'parse_exception')
+
+class Metrics:
+    def __init__(self, window=1.0):
+        self.window = window
+        self.start = time.perf_counter()
+        self.n_sent = 0
+        self.in_sentence = False
+        self.windows = collections.Counter()    # { window number : sentences finished }
+        self.outcomes = collections.Counter()   # { outcome : sentences }
+        self.errors = collections.Counter()     # { (exception, function, stage) : count }
+        self.rules = {'mark': collections.Counter(), 'polarize': collections.Counter()}
+        self.hists = {}     # { stage : [ count of each bucket, +Inf last ] }
+        self.sums = {}      # { stage : seconds }
+        self.run = {}       # { stage : seconds }, for stages outside any sentence
+        self.instrumented = []
+
+    def sentence(self, idx=None):
+        self.end_sentence()
+        self.in_sentence = True
+
+    def end_sentence(self):
+        if not self.in_sentence: return
+        self.in_sentence = False
+        self.n_sent += 1
+        self.windows[int((time.perf_counter() - self.start) / self.window)] += 1
+
+    def stage(self, name):
+        return MetricStage(self, name)
+
+    def observe(self, name, seconds):
+        if not self.in_sentence:
+            self.run[name] = self.run.get(name, 0) + seconds
+            return
+        hist = self.hists.get(name)
+        if hist is None:
+            hist = self.hists[name] = [0] * (len(BUCKETS) + 1)
+            self.sums[name] = 0
+        hist[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sums[name] += seconds
+
+    def outcome(self, name):
+        self.outcomes[name] += 1
+
+    def error(self, exc, stage=None):
+        """ count a sentence that raised exc, by type and raising function """
+        self.outcomes['error'] += 1
+        self.errors[(type(exc).__name__, raised_in(exc), stage or '')] += 1
+
+    def instrument(self, tree_cls):
+        """ count the ruleType seen by every call of tree_cls.mark_NTN_myparent
+        and tree_cls.polarizeHelper, i.e. which branch fired """
+        mark_counts, polarize_counts = self.rules['mark'], self.rules['polarize']
+        mark_NTN_myparent = tree_cls.mark_NTN_myparent
+        polarizeHelper = tree_cls.polarizeHelper
+        def counted_mark(self, node):
+            mark_counts[node.parent.ruleType] += 1
+            return mark_NTN_myparent(self, node)
+        def counted_polarize(self, node, monoDirection):
+            if node.children: polarize_counts[node.ruleType] += 1
+            return polarizeHelper(self, node, monoDirection)
+        tree_cls.mark_NTN_myparent = counted_mark
+        tree_cls.polarizeHelper = counted_polarize
+        self.instrumented += [(tree_cls, 'mark_NTN_myparent', mark_NTN_myparent),
+                              (tree_cls, 'polarizeHelper', polarizeHelper)]
+
+    def uninstrument(self):
+        for cls, name, original in reversed(self.instrumented):
+            setattr(cls, name, original)
+        self.instrumented = []
+
+    def report(self):
+        self.end_sentence()
+        elapsed = time.perf_counter() - self.start
+        stages = {}
+        for name, hist in self.hists.items():
+            count = sum(hist)
+            stages[name] = {'count': count, 'sum_sec': round(self.sums[name], 6),
+                            'mean_ms': round(1000 * self.sums[name] / count, 4),
+                            'buckets': {str(le): n for le, n in zip(BUCKETS + ('+Inf',), hist)}}
+        last = max(self.windows) + 1 if self.windows else 0
+        return {
+            'sentences': self.n_sent,
+            'elapsed_sec': round(elapsed, 4),
+            'sentences_per_sec': round(self.n_sent / elapsed, 2) if elapsed else None,
+            'outcomes': {name: self.outcomes[name] for name in OUTCOMES},
+            'throughput': {'window_sec': self.window,
+                           'sentences_per_sec': [round(self.windows[i] / self.window, 2)
+                                                 for i in range(last)]},
+            'run_sec': {name: round(secs, 6) for name, secs in self.run.items()},
+            'stages': stages,
+            'errors': [{'type': exc, 'function': func, 'stage': stage, 'count': n}
+                       for (exc, func, stage), n in self.errors.most_common()],
+            'rules': {name: dict(counts.most_common()) for name, counts in self.rules.items()},
+        }
+
+    def prometheus(self):
+        """ the report in the Prometheus text exposition format """
+        report = self.report()
+        lines = []
+        def metric(name, kind, doc, samples):
+            lines.append('# HELP {}_{} {}'.format(PREFIX, name, doc))
+            lines.append('# TYPE {}_{} {}'.format(PREFIX, name, kind))
+            for labels, value in samples:
+                lines.append('{}_{}{} {}'.format(PREFIX, name, format_labels(labels), value))
+        metric('sentences_total', 'counter', 'sentences by outcome',
+               [({'outcome': name}, n) for name, n in report['outcomes'].items()])
+        metric('run_seconds', 'gauge', 'wall time of the run', [({}, report['elapsed_sec'])])
+        metric('sentences_per_second', 'gauge', 'mean throughput of the run',
+               [({}, report['sentences_per_sec'] or 0)])
+        metric('stage_seconds', 'histogram', 'latency of each stage per sentence',
+               histogram_samples(self.hists, self.sums))
+        metric('run_stage_seconds', 'gauge', 'time of the stages outside any sentence',
+               [({'stage': name}, secs) for name, secs in report['run_sec'].items()])
+        metric('errors_total', 'counter', 'sentences that raised, by exception and function',
+               [({'type': e['type'], 'function': e['function'], 'stage': e['stage']}, e['count'])
+                for e in report['errors']])
+        metric('rules_total', 'counter', 'ruleType branches taken in mark and polarize',
+               [({'pass': name, 'rule': rule}, n)
+                for name, counts in report['rules'].items() for rule, n in counts.items()])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, prefix):
+        """ write PREFIX.json and PREFIX.prom """
+        with open(prefix + '.json', 'w') as f:
+            json.dump(self.report(), f, indent=1)
+            f.write('\n')
+        with open(prefix + '.prom', 'w') as f:
+            f.write(self.prometheus())
+
+class MetricStage:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics, self.name = metrics, name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+def raised_in(exc):
+    """ qualified name of the function that raised exc, e.g. Cat.processComplexType """
+    tb = exc.__traceback__
+    if tb is None: return ''
+    while tb.tb_next is not None: tb = tb.tb_next
+    code = tb.tb_frame.f_code
+    return getattr(code, 'co_qualname', code.co_name)
+
+def histogram_samples(hists, sums):
+    samples = []
+    for name, hist in hists.items():
+        cumulative = 0
+        for le, n in zip(BUCKETS + ('+Inf',), hist):
+            cumulative += n
+            samples.append(({'stage': name, 'le': le, '__name__': 'bucket'}, cumulative))
+        samples.append(({'stage': name, '__name__': 'sum'}, round(sums[name], 6)))
+        samples.append(({'stage': name, '__name__': 'count'}, sum(hist)))
+    return samples
+
+def format_labels(labels):
+    """ {'stage': 'build'} -> {stage="build"}; __name__ is a suffix (_sum, _count) """
+    labels = dict(labels)
+    suffix = '_' + labels.pop('__name__') if '__name__' in labels else ''
+    if not labels: return suffix
+    return suffix + '{' + ','.join('{}="{}"'.format(
+        key, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for key, value in labels.items()) + '}'
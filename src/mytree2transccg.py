@@ -11,8 +11,12 @@ TODO: what is transccg?
 
 __author__ = "Hai Hu"
 
-from getMono import CCGtree, CCGtrees, ErrorCCGtree, ErrorCompareSemCat, eprint, ErrorCat
-import sys
+from getMono import CCGtree, CCGtrees, ErrorCCGtree, ErrorCompareSemCat, eprint, ErrorCat, \
+    Cat, PARSERS, Result, set_lexicon, freeze_heap
+from utils import log, DEBUG, LEVELS
+from formats import FormatWriter, FORMATS as TEXT_FORMATS
+import timers as stage_timers
+import sys, contextlib
 
 # <token start="0" span="1" pos="DT" chunk="I-NP" entity="O" cat="NP[nb]/N" id="t0_0" surf="Every" base="every" ETtype="None" polarity="None"/>
 str_token = '<token start="{}" span="{}" pos="{}" chunk="{}" entity="{}" ' \
@@ -30,20 +34,104 @@ str_span_root = '<span root="true" id="{}" child="{}" pos="None" ' \
 str_span_nonTerm = '<span id="{}" child="{}" pos="None" category="{}" ' \
                  'rule="{}" ETtype="{}" polarity="{}"/>'
 
+# errors of mark and polarize that leave a sentence unpolarized
+CANNOT_POLARIZE = (ErrorCompareSemCat, ErrorCCGtree, AssertionError, AttributeError, ErrorCat)
+
 message = "\nUsage: ./mytree2transccg.py filename parser filename_log\n" \
           "e.g. filename=test.easyccg.parsed.txt,\n" \
-          "filename_log=test.tok.preprocess.log\n"
+          "filename_log=test.tok.preprocess.jsonl (or test.tok.preprocess.log)\n"
 
 def main():
-    if len(sys.argv) < 4:
-        eprint(message)
-    else:
-        filename = sys.argv[1]
-        parser = sys.argv[2]
-        filename_log = sys.argv[3]
-        convert2transccg(filename, parser, filename_log)
-
-def convert2transccg(filename, parser, filename_log):
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip(),
+                                     epilog=message,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('filename', help='parser output')
+    parser.add_argument('parser', choices=PARSERS)
+    parser.add_argument('filename_log', help='preprocess log')
+    parser.add_argument('--dedup', dest='dedup', type=str, default=None,
+                        help='filename is the parse of the distinct sentences only; fan the '
+                             'results out to all sentences with this map, e.g. test.tok.dedup '
+                             '(see dedup.py)')
+    parser.add_argument('--timers', dest='timers', type=str, default=None,
+                        help='write a JSON report of the time spent in each stage '
+                             'to this file, - for stderr (see timers.py)')
+    parser.add_argument('--timers-per-sent', dest='timers_per_sent', action='store_true',
+                        help='include the timings of every sentence in the --timers report')
+    parser.add_argument('--profile', dest='profile', type=str, default=None,
+                        help='profile each stage: write PREFIX.prof, PREFIX.STAGE.prof '
+                             '(pstats) and PREFIX.collapsed (flamegraph) (see profiling.py)')
+    parser.add_argument('--profile-every', dest='profile_every', type=int, default=1,
+                        help='with --profile, profile only every Nth sentence [default: %(default)s]')
+    parser.add_argument('--metrics', dest='metrics', type=str, default=None,
+                        help='write throughput, stage latency histograms, errors and rule '
+                             'counts to PREFIX.json and PREFIX.prom (Prometheus) (see metrics.py)')
+    parser.add_argument('--metrics-window', dest='metrics_window', type=float, default=1.0,
+                        help='seconds per throughput sample of --metrics [default: %(default)s]')
+    parser.add_argument('--slow', dest='slow', type=str, default=None,
+                        help='write reproducer bundles of the slowest sentences to this '
+                             'directory (see watchdog.py)')
+    parser.add_argument('--slow-top', dest='slow_top', type=int, default=10,
+                        help='with --slow, keep the N slowest sentences [default: %(default)s]')
+    parser.add_argument('--slow-budget', dest='slow_budget', type=float, default=None,
+                        help='with --slow, also keep every sentence slower than this many seconds')
+    parser.add_argument('--log-level', dest='log_level', choices=sorted(LEVELS), default=None,
+                        help='messages on stderr: error, warning, info (reading banners) or '
+                             'debug (per-sentence diagnostics) [default: warning, or $CCG2MONO_LOG]')
+    parser.add_argument('--progress', dest='progress', type=float, default=10,
+                        help='write a progress line every this many seconds, 0 for none '
+                             '[default: %(default)s]')
+    parser.add_argument('--lexicon', dest='lexicon', type=str, default=None,
+                        help='lexical marking rules (see lexicon.py) '
+                             '[default: lexicon.json, or $CCG2MONO_LEXICON]')
+    parser.add_argument('--npz', dest='npz', type=str, default=None,
+                        help='also write token ids and polarities as numpy arrays to this '
+                             'directory of .npy files, or .npz file (see arrays.py)')
+    parser.add_argument('--npz-spans', dest='npz_spans', action='store_true',
+                        help='with --npz, also write the polarities of the non-terminal spans')
+    parser.add_argument('--format', dest='format', choices=sorted(FORMATS), default='transccg',
+                        help='output on stdout, one record per sentence as it is polarized '
+                             '(see formats.py) [default: %(default)s]')
+    parser.add_argument('--tree', dest='tree', action='store_true',
+                        help='with --format jsonl or conll, also write the bracketed tree')
+    parser.add_argument('--html', dest='html', type=str, default=None,
+                        help='also write the pretty html of the trees to this file, as '
+                             'visualize.py of ccg2lambda over the xml (see pretty.py)')
+    args = parser.parse_args()
+    if args.log_level: log.set_level(args.log_level)
+    if args.lexicon: set_lexicon(args.lexicon)
+
+    timers = stage_timers.StageTimers(args.timers_per_sent) if args.timers else None
+    profiler = None
+    if args.profile:
+        from profiling import StageProfiler
+        profiler = StageProfiler(args.profile, args.profile_every)
+    metrics = None
+    if args.metrics:
+        from metrics import Metrics
+        metrics = Metrics(args.metrics_window)
+        metrics.instrument(CCGtree)
+    watchdog = None
+    if args.slow:
+        from watchdog import SlowSentences
+        watchdog = SlowSentences(args.slow, args.slow_top, args.slow_budget)
+    progress = stage_timers.Progress(args.progress) if args.progress > 0 else None
+    dedup_map = None
+    if args.dedup:
+        from dedup import read_map
+        dedup_map = read_map(args.dedup)
+    convert2transccg(args.filename, args.parser, args.filename_log, timers, profiler, metrics,
+                     watchdog, progress, dedup_map, args.npz, args.npz_spans,
+                     FORMATS[args.format](sys.stdout, args.tree), args.html)
+    if timers: timers.write(args.timers)
+    if profiler: profiler.close()
+    if metrics: metrics.write(args.metrics)
+    if watchdog: watchdog.close()
+    if progress: progress.close()
+
+def convert2transccg(filename, parser, filename_log, timers=None, profiler=None, metrics=None,
+                     watchdog=None, progress=None, dedup_map=None, npz=None,
+                     npz_spans=False, writer=None, html=None):
     """
     input: 
     - easyccg output (tmp.easyccg.parsed.txt) or 
@@ -51,115 +139,203 @@ def convert2transccg(filename, parser, filename_log):
 
     input is read into my CCGtree format. 
 
-    then traverse the tree and print xml to stdout
+    then traverse the tree and print xml to stdout, or write the format of writer
 
     return # of sents not polarized
+
+    timers: a timers.StageTimers to time each stage in, or None
+    profiler: a profiling.StageProfiler to profile each stage in, or None
+    metrics: a metrics.Metrics to count outcomes and errors in, or None
+    watchdog: a watchdog.SlowSentences to keep the slowest sentences in, or None
+    progress: a timers.Progress for the progress line, or None
+    dedup_map: with dedup.py, the parse has one tree per distinct sentence, and
+      dedup_map[i] is the tree of line i of the .tok.clean file, or None
+    npz: also write the polarities as arrays to this path with arrays.py, or None;
+      npz_spans: with the spans
+    writer: a formats.FormatWriter for stdout [default: TransccgWriter]
+    html: also write the pretty html to this path with pretty.py, or None
+
+    Each sentence is written to the .polarized file, stdout, npz and html as soon
+    as its tree is polarized.
     """
+    hooks = [hook for hook in (timers, profiler, metrics, watchdog, progress) if hook]
+    timed = stage_timers.stage_hooks(hooks)
+    if timers: timers.instrument(Cat, '__init__', 'cat')
+
     trees = CCGtrees(filename_log)
     
-    if parser == 'easyccg':
-        trees.readEasyccgStr(filename)  #('tmp.easyccg.parsed.txt')
-        raw_sentences = open(filename.replace(".easyccg.parsed.txt","") + ".tok.clean").readlines()
-    elif parser == 'candc':
-        trees.readCandCxml(filename)  #('tmp.candc.parsed.xml')
-        raw_sentences = open(filename.replace(".candc.parsed.xml","") + ".tok.clean").readlines()
-    elif parser == 'depccg':  # same as easyccg
-        trees.readEasyccgStr(filename)  
-        raw_sentences = open(filename.replace(".depccg.parsed.txt","") + ".tok.clean").readlines()
-    else:
-        eprint('parser can only be: easyccg, candc, depccg')
-        exit()
+    with timed('read'):
+        if parser == 'easyccg':
+            trees.readEasyccgStr(filename)  #('tmp.easyccg.parsed.txt')
+            raw_sentences = open(filename.replace(".easyccg.parsed.txt","") + ".tok.clean").readlines()
+        elif parser == 'candc':
+            trees.readCandCxml(filename)  #('tmp.candc.parsed.xml')
+            raw_sentences = open(filename.replace(".candc.parsed.xml","") + ".tok.clean").readlines()
+        elif parser == 'depccg':  # same as easyccg
+            trees.readEasyccgStr(filename)  
+            raw_sentences = open(filename.replace(".depccg.parsed.txt","") + ".tok.clean").readlines()
+        else:
+            log.error('parser can only be: easyccg, candc, depccg')
+            exit()
+    if watchdog: watchdog.attach(trees, parser)
+    # trees to polarize, and the tree of each sentence
+    if dedup_map is None: n_trees, tree_of = len(raw_sentences), range(len(raw_sentences))
+    else: n_trees, tree_of = max(dedup_map, default=-1) + 1, dedup_map
+    if progress: progress.total = n_trees
+    last_sent = [-1] * n_trees  # the last sentence of each tree, then it is freed
+    for i, idx in enumerate(tree_of): last_sent[idx] = i
+    freeze_heap()
+    if writer is None: writer = TransccgWriter(sys.stdout)
 
     # ----------------------------------
     # mark and polarize
     N_polar = 0
     N_unpolar = 0
     N_unparsed = 0
+    polarized = [None] * n_trees  # line of the .polarized file, None if not parsed
+    errors = [None] * n_trees     # exception name, if it could not be polarized
+    done = [False] * n_trees      # polarized, or could not be
+    next_sent = 0                 # the next sentence to write
+
     fh_polarized_trees = open(filename + ".polarized", "w")
+    arrays = None
+    if npz:
+        from arrays import ArrayWriter
+        arrays = ArrayWriter(npz, npz_spans)
+    pages = None
+    if html:
+        from pretty import HtmlWriter
+        pages = HtmlWriter(open(html, 'w'))
+        pages.begin()
+    writer.begin()
+
+    def emit():
+        """ write the sentences up to the first whose tree is not done """
+        nonlocal next_sent
+        while next_sent < len(tree_of) and done[tree_of[next_sent]]:
+            i, idx = next_sent, tree_of[next_sent]
+            t = None if polarized[idx] is None else trees.trees[idx]
+            with timed('output'):
+                if t is None:  # = for every token
+                    line = raw_sentences[i].replace(" ", "= ").replace("\n", "=\n")
+                else: line = polarized[idx]
+                fh_polarized_trees.write(line)
+                writer.sentence(i, t, line, errors[idx], raw_sentences[i])
+            if arrays:
+                with timed('npz'):
+                    if t is None: arrays.write(Result(error='failed_to_parse'))
+                    else: arrays.write(Result(t, error=errors[idx]))
+            if pages:
+                with timed('html'): pages.sentence(i, t, line, errors[idx], raw_sentences[i])
+            if last_sent[idx] == i: trees.trees.pop(idx, None)
+            next_sent += 1
 
     # sent_parsed = True
 
     # idx_cant_polarize = {}
-    for idx in range(len(raw_sentences)):
+    for idx in range(n_trees):
+        for hook in hooks: hook.sentence(idx)
         # build the tree here
-        t = trees.build_one_tree(idx, parser, use_lemma=False)
+        with timed('build'): t = trees.build_one_tree(idx, parser, use_lemma=False)
         # eprint(trees.easyccg_str.get(idx, None))
         # print(t)
         # return
 
         if t in ["failed_to_parse", "parse_exception"]:  # easyccg failed to parse the sent
-            eprint('easyccg failed to parse the sent')
-            eprint(raw_sentences[idx])
-            sent = raw_sentences[idx].replace(" ", "= ").replace("\n", "=\n")  # = for every token
-            fh_polarized_trees.write(sent)
+            log.debug('easyccg failed to parse the sent {}', idx)
             N_unparsed += 1
+            if metrics: metrics.outcome(t)
+            done[idx] = True
 
         else:  # t is a tree
             # fix tree
-            t.fixQuantifier()
-            try: t.fixNot()
+            with timed('fixQuantifier'): t.fixQuantifier()
+            try:
+                with timed('fixNot'): t.fixNot()
             except AttributeError: pass
-            if parser in ['candc']: t.fixRC()  # only fix RC for candc
+            if parser in ['candc']:  # only fix RC for candc
+                with timed('fixRC'): t.fixRC()
 
             try:
-                t.mark()
-                t.polarize()
-                t.getImpSign()
+                with timed('mark'): t.mark()
+                with timed('polarize'): t.polarize(impSign=True)  # and getImpSign()
                 N_polar += 1
-            except (ErrorCompareSemCat, ErrorCCGtree, AssertionError, AttributeError, ErrorCat) as e:
-                eprint(e)
-                eprint('-- cannot polarize sent: ', end='')
+                if metrics: metrics.outcome('polarized')
+            except CANNOT_POLARIZE as e:
+                log.debug('{}', e)
+                log.debug('-- cannot polarize sent:')
                 N_unpolar += 1
+                errors[idx] = type(e).__name__
+                if metrics: metrics.error(e)
             # t.printSent(stream=sys.stderr)
-            fh_polarized_trees.write(t.printSent_raw(stream=sys.stderr))
-            fh_polarized_trees.write("\n")
-        eprint()
+            polarized[idx] = t.printSent_raw(stream=sys.stderr if log.enabled(DEBUG) else None) + "\n"
+            done[idx] = True
+        log.debug('')
+        emit()
+
+    for hook in hooks: hook.end_sentence()
+    writer.end()
     fh_polarized_trees.close()
+    if arrays:
+        with timed('npz'): arrays.close()
+    if pages:
+        with timed('html'): pages.end()
+        pages.stream.close()
+    if dedup_map is not None:
+        from dedup import report
+        eprint(report(len(dedup_map), n_trees))
     eprint("\n\n===========\npolarized {} trees\n"
            "unable to parse {} trees\n"
            "unable to polarize {} trees".format(N_polar, N_unparsed, N_unpolar))
 
-    # ----------------------------------
-
-    print("""<?xml version='1.0' encoding='UTF-8'?>\n<root>\n<document>\n<sentences>""")
-    for idx, t in trees.trees.items():
-        if t in ["failed_to_parse", "parse_exception"]:
-            continue
-
-        print("<sentence>")
-
-        # ----------------------------
-        # print tokens
-        print("<tokens>")
-        counter = 0
-        for token in t.leafNodes:
-            # depth,cat,chunk,entity,lemma,pos,span,start,word
-            token_id = "t"+str(idx)+'_'+str(counter)
-            ETtype = token.cat.semCat.__str__()
-            polarity = getPolarityAsArrow(token)
-            print(str_token.format(token.start, token.span, token.pos, token.chunk,
-                                 token.entity, token.cat.originalType, token_id,
-                                 token.word, token.lemma, ETtype, polarity))
-            counter += 1
-        print("</tokens>")
-
-        # ----------------------------
-        # print nodes
-        # <ccg root="s0_sp0" id="s0_ccg0">
-        print('<ccg root="s{}_sp0" id="s{}_ccg0">'.format(str(idx), str(idx)))
-
-        # tree
-        # in-order traversal of tree to get span_id of non term node
-        traverse2get_span_id(t.root, -1, idx)
-
-        # in order traversal of tree
-        traverse(t.root, 0, idx)
-
-        print("</ccg>")
-        print("</sentence>")
-
-    print("""</sentences>\n</document>\n</root>""")
-
+class TransccgWriter(FormatWriter):
+    """ the transccg xml, without the sentences that did not parse """
+    def begin(self):
+        print("""<?xml version='1.0' encoding='UTF-8'?>\n<root>\n<document>\n<sentences>""",
+              file=self.stream)
+
+    def sentence(self, idx, t, line, error, raw):
+        if t is not None:
+            with contextlib.redirect_stdout(self.stream): sentence2transccg(t, idx)
+
+    def end(self):
+        print("""</sentences>\n</document>\n</root>""", file=self.stream)
+
+FORMATS = dict(TEXT_FORMATS, transccg=TransccgWriter)
+
+def sentence2transccg(t, idx):
+    """ print one polarized tree as a transccg <sentence> """
+    print("<sentence>")
+
+    # ----------------------------
+    # print tokens
+    print("<tokens>")
+    counter = 0
+    for token in t.leafNodes:
+        # depth,cat,chunk,entity,lemma,pos,span,start,word
+        token_id = "t"+str(idx)+'_'+str(counter)
+        ETtype = token.cat.semCat.__str__()
+        polarity = getPolarityAsArrow(token)
+        print(str_token.format(token.start, token.span, token.pos, token.chunk,
+                             token.entity, token.cat.originalType, token_id,
+                             token.word, token.lemma, ETtype, polarity))
+        counter += 1
+    print("</tokens>")
+
+    # ----------------------------
+    # print nodes
+    # <ccg root="s0_sp0" id="s0_ccg0">
+    print('<ccg root="s{}_sp0" id="s{}_ccg0">'.format(str(idx), str(idx)))
+
+    # tree
+    # in-order traversal of tree to get span_id of non term node
+    traverse2get_span_id(t.root, -1, idx)
+
+    # in order traversal of tree
+    traverse(t.root, 0, idx)
+
+    print("</ccg>")
+    print("</sentence>")
 
 def traverse2get_span_id(node, counter, idx):
     '''
@@ -31,6 +31,21 @@ candcModelsDir="../../candc-1.00/models"
 ccg2lambdaDir="../../ccg2lambda"
 # -------------------------------------------------
 
+# sentences to parse, and their preprocess log: with DEDUP=1 ./parse.sh ...
+# only the distinct sentences are parsed and polarized, then fanned out
+# to all lines (see dedup.py)
+parse_input() {
+    parseIn=${OUTname}.tok.clean
+    logIn=${OUTname}.tok.preprocess.jsonl
+    dedupOpt=""
+    if [ -n "$DEDUP" ]; then
+        ./dedup.py ${OUTname}.tok
+        parseIn=${OUTname}.tok.uniq
+        logIn=${OUTname}.tok.uniq.preprocess.jsonl
+        dedupOpt="--dedup ${OUTname}.tok.dedup"
+    fi
+}
+
 # outputDir
 if [ "$#" -eq 3 ]; then
     outputDir=$3
@@ -59,22 +74,18 @@ if [ $2 == "candc" ]; then
 
     # clean: at most n -> no
     ./preprocess.py ${OUTname}.tok
+    parse_input
 
     # parse:
     printf "parsing...\n"
     ${candcBinDir}/candc --models ${candcModelsDir} \
-    --candc-printer xml --input ${OUTname}.tok.clean \
+    --candc-printer xml --input ${parseIn} \
     --output ${outputDir}/${OUTname}.candc.parsed.xml --log mylog
 
-    # convert to transccg
-    ./mytree2transccg.py "${outputDir}/${OUTname}.candc.parsed.xml" candc ${OUTname}.tok.preprocess.log \
-    > ${outputDir}/${OUTname}.candc2transccg.xml > \
-    ${outputDir}/${OUTname}.candc2transccg.xml
-
-    # to html
-    python ${ccg2lambdaDir}/scripts/visualize.py \
-    ${outputDir}/${OUTname}.candc2transccg.xml > \
-    "${outputDir}/${OUTname}.candc_pretty.html"
+    # convert to transccg, and to html
+    ./mytree2transccg.py "${outputDir}/${OUTname}.candc.parsed.xml" candc ${logIn} ${dedupOpt} \
+    --html "${outputDir}/${OUTname}.candc_pretty.html" \
+    > ${outputDir}/${OUTname}.candc2transccg.xml
 
 elif [ $2 == "easyccg" ]; then
     ################  easyccg parser  ################
@@ -90,9 +101,10 @@ elif [ $2 == "easyccg" ]; then
 
     # clean: at most n -> no, output file: ${OUTname}.tok.clean
     ./preprocess.py ${OUTname}.tok
+    parse_input
 
     # get pos and ner using candc: (copied from easyccg README)
-    cat ${OUTname}.tok.clean | $candc/bin/pos --model $candc/models/pos | \
+    cat ${parseIn} | $candc/bin/pos --model $candc/models/pos | \
     $candc/bin/ner -model $candc/models/ner -ofmt "%w|%p|%n \n" > \
     "${outputDir}/${OUTname}.candc.pos.ner"
 
@@ -107,15 +119,11 @@ elif [ $2 == "easyccg" ]; then
     # change ( ) to {} so we can easily find nodes from easyccg output; IMPORTANT!
     sed -i -e 's/(</{</g; s/>)/>}/g; s/ )/ }/g' "${outputDir}/${OUTname}.easyccg.parsed.txt"
 
-    # convert to transccg
-    ./mytree2transccg.py "${outputDir}/${OUTname}.easyccg.parsed.txt" easyccg  ${OUTname}.tok.preprocess.log \
+    # convert to transccg, and to pretty html
+    ./mytree2transccg.py "${outputDir}/${OUTname}.easyccg.parsed.txt" easyccg ${logIn} ${dedupOpt} \
+    --html ${outputDir}/${OUTname}.easyccg_pretty.html \
     > ${outputDir}/${OUTname}.easyccg2transccg.xml
 
-    # convert to pretty html
-    python ${ccg2lambdaDir}/scripts/visualize.py \
-    ${outputDir}/${OUTname}.easyccg2transccg.xml > \
-    ${outputDir}/${OUTname}.easyccg_pretty.html
-
 elif [ $2 == "depccg" ]; then
     ################  depccg parser  ################
     printf "*** parsing using depccg ***\n"
@@ -129,23 +137,20 @@ elif [ $2 == "depccg" ]; then
 
     # clean: at most n -> no, output file: ${OUTname}.tok.clean
     ./preprocess.py ${OUTname}.tok
+    parse_input
 
     # parse to text file using depccg (now using rebanked CCG model)
-    cat ${OUTname}.tok.clean | python -m depccg en --model elmo_rebank -f auto_extended -a spacy > \
+    cat ${parseIn} | python -m depccg en --model elmo_rebank -f auto_extended -a spacy > \
     "${outputDir}/${OUTname}.depccg.parsed.txt"
 
     # change ( ) to {} so we can easily find nodes from easyccg output; IMPORTANT!
     sed -i -e 's/(</{</g; s/>)/>}/g; s/ )/ }/g' "${outputDir}/${OUTname}.depccg.parsed.txt"
 
-    # convert to transccg
-    ./mytree2transccg.py "${outputDir}/${OUTname}.depccg.parsed.txt" depccg  ${OUTname}.tok.preprocess.log \
+    # convert to transccg, and to pretty html
+    ./mytree2transccg.py "${outputDir}/${OUTname}.depccg.parsed.txt" depccg ${logIn} ${dedupOpt} \
+    --html ${outputDir}/${OUTname}.depccg_pretty.html \
     > ${outputDir}/${OUTname}.depccg2transccg.xml
 
-    # convert to pretty html
-    python ${ccg2lambdaDir}/scripts/visualize.py \
-    ${outputDir}/${OUTname}.depccg2transccg.xml > \
-    ${outputDir}/${OUTname}.depccg_pretty.html
-
 else
 
     printf "parser not supported\ntry one of: candc, easyccg, depccg\n"
@@ -11,15 +11,17 @@ input: tokenized text
 output: 
 1. tokenized text (test.tok.clean) 
 2. a logfile (test.tok.preprocess.log)
+3. the same changes with token alignment, and its index
+   (test.tok.preprocess.jsonl, test.tok.preprocess.jsonl.idx), see changelog.py
 
 '''
 
 __author__ = "Hai Hu"
 __email__ = "huhai@indiana.edu"
 
-import sys, os, re, copy, argparse
+import sys, os, re, io, functools
 # import utils
-from getMono import eprint
+from utils import eprint
 # from pass2act import P2A_transformer
 # import spacy
 # from stanfordcorenlp import StanfordCoreNLP
@@ -61,71 +63,208 @@ QUANTIFIERS = {
     "some-but-not-all"
 }
 
-def main():
-    # fn = "test.tok"
-    fn = sys.argv[1]
-    preprocess(fn)
+# csv preprocess log, read by CCGtrees.readLog() in getMono.py
+LOG_HEADER = "sentId,before,after,idx,len_sent\n"
+LOG_PATTERN = "{},{},{},{},{}\n"
+
+# lines per chunk in preprocess_stream()
+CHUNK_SIZE = 1000
+
+# ----------------------------------------------
+# rewrite tables for preprocess_line(), applied in order.
+# each entry is (gates, rules): the rules can only change the line if one of
+# the gates is a substring of it, so entries are skipped with a few `in` tests
+# instead of running every str.replace and re.sub on every line
+REWRITES_GROUP = [
+    (("#",), [("#", "number")]),
+    (("group of", "cluster of"), [
+        ("A group of four", "Four"), ("A group of five", "Five"),
+        ("A cluster of four", "Four"),
+        ("A group of", "Some"), ("a group of", "some")]),
+]
+
+REWRITES_PRONOUN = [
+    (("one", "body"), [
+        (PAT_someone, "some person"), (PAT_noone, "no person"), (PAT_everyone, "every person")]),
+    (("thing",), [
+        (PAT_something, "some thing"), (PAT_nothing, "no thing"), (PAT_everything, "every thing")]),
+    (("where",), [
+        (PAT_somewhere, "some place"), (PAT_nowhere, "no place"), (PAT_everywhere, "every place")]),
+    ((" n't ",), [(" n't ", " not ")]),
+]
+
+REWRITES_NUMBER = [
+    (("wo ",), [('Two ', '2 '), (' two ', ' 2 ')]),
+    (("hree ",), [('Three ', '3 '), (' three ', ' 3 ')]),
+    (("our ",), [('Four ', '4 '), (' four ', ' 4 ')]),
+    (("ive ",), [('Five ', '5 '), (' five ', ' 5 ')]),
+    (("ix ",), [('Six ', '6 '), (' six ', ' 6 ')]),
+    (("even ",), [('Seven ', '7 '), (' seven ', ' 7 ')]),
+    (("ight ",), [('Eight ', '8 '), (' eight ', ' 8 ')]),
+    (("ine ",), [('Nine ', '9 '), (' nine ', ' 9 ')]),
+]
+
+REWRITES_QUANT = [
+    (("ore than ",), [(PAT_more_than_n, "more-than-\\1")]),
+    (("ess than ",), [(PAT_less_than_n, "less-than-\\1")]),
+    (("t least ",), [(PAT_at_least_n, "at-least-\\1")]),
+    (("t most ",), [(PAT_at_most_n, "at-most-\\1")]),
+    (("xactly ",), [(PAT_exactly_n, "exactly-\\1")]),
+    (("ome but not all",), [(PAT_some_but_not_all, "some-but-not-all")]),
+]
+
+# tokens produced by REWRITES_QUANT, replaced by `some` or `no` and logged
+PREFIX_TO_SOME = ("more-than-", "at-least-", "exactly-")
+PREFIX_TO_NO = ("less-than-", "at-most-")
 
-def preprocess(fn):
+def main():
+    import argparse
+    description = """
+    Preprocess tokenized sentences before parsing. With a filename, write
+    FILENAME.clean and FILENAME.preprocess.log; without one (or with -),
+    stream stdin to stdout and write the log to --log.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('filename', nargs='?', default='-',
+                        help='tokenized text, e.g. test.tok; - for stdin '
+                             "[default: %(default)s]")
+    parser.add_argument('--log', dest='filename_log', type=str, default=None,
+                        help='preprocess log when streaming; stderr if not given')
+    parser.add_argument('--jsonl', dest='filename_jsonl', type=str, default=None,
+                        help='structured change log (and its .idx) when streaming; '
+                             'not written if not given')
+    parser.add_argument('--workers', dest='workers', type=int, default=1,
+                        help='number of processes, each preprocesses a chunk of '
+                             "--chunk-size lines [default: %(default)s]")
+    parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=CHUNK_SIZE,
+                        help="lines per chunk when --workers > 1 [default: %(default)s]")
+    parser.add_argument('-v', dest='verbose', action='store_true',
+                        help='print each sentence before/after to stderr')
+    args = parser.parse_args()
+    from changelog import ChangeLogWriter  # not on import: it needs json
+
+    if args.filename != '-':
+        preprocess(args.filename, args.verbose, args.workers, args.chunk_size)
+        return
+    fh_log = open(args.filename_log, 'w') if args.filename_log else sys.stderr
+    changelog = ChangeLogWriter(args.filename_jsonl) if args.filename_jsonl else None
+    preprocess_stream(sys.stdin, sys.stdout, fh_log, args.verbose,
+                      args.workers, args.chunk_size, changelog)
+    if changelog: changelog.close()
+    if args.filename_log: fh_log.close()
+
+def preprocess(fn, verbose=False, workers=1, chunk_size=None):
     """ produce a clean file named: test.tok.clean
-    and log file: test.tok.preprocess.log """
-    sent_id = -1
-    fh_log = open(fn + '.preprocess.log', 'w')
-    fh_log.write("sentId,before,after,idx,len_sent\n")
-    fh_clean = open(fn + '.clean', 'w')
-    s_pattern = "{},{},{},{},{}\n"
+    and log files: test.tok.preprocess.log, test.tok.preprocess.jsonl(.idx) """
+    from changelog import ChangeLogWriter
+    with open(fn) as f, open(fn + '.clean', 'w') as fh_clean, \
+            open(fn + '.preprocess.log', 'w') as fh_log, \
+            ChangeLogWriter(fn + '.preprocess.jsonl') as changelog:
+        preprocess_stream(f, fh_clean, fh_log, verbose, workers, chunk_size, changelog)
+
+def preprocess_stream(fh_in, fh_clean, fh_log, verbose=False, workers=1, chunk_size=None,
+                      changelog=None):
+    """ preprocess every non-empty line of fh_in, write clean lines to fh_clean,
+    the log (with header) to fh_log and, if given, the structured log to
+    changelog (a ChangeLogWriter).
+
+    sentId counts non-empty lines from 0, so it matches the tree index of the
+    parser output. With workers > 1, chunks of lines are preprocessed in
+    parallel and written back in input order, so the output is the same.
+    """
     # p2a = P2A_transformer(spacy.load('en'))
     # corenlp = StanfordCoreNLP('http://localhost', port=9000, lang='en')
-
-    eprint('\npreprocessing...')
-    with open(fn) as f:
-        for line in f:
-            line = line.strip()
-            if line == "": continue
-
-            sent_id += 1
-            # print('\npreprocessing:', sent_id)
-
-            # line = line.lower()
-
-            eprint('\nbefore:', line)
-
-            # with passitve to active transformation
-            # line = preprocess_line(line, fh_log, s_pattern, sent_id, p2a, corenlp)
-
-            # no passive to active transformation
-            line = preprocess_line(line, fh_log, s_pattern, sent_id)
-            eprint('after :', line)
-
-            # write to clean file
-            fh_clean.write(line)
-            fh_clean.write('\n')
-
-    fh_log.close()
-    fh_clean.close()
-    eprint('...done!\n')
+    if verbose: eprint('\npreprocessing...')
+    fh_log.write(LOG_HEADER)
+    chunks = read_chunks(fh_in, chunk_size or CHUNK_SIZE)
+    if workers > 1:
+        import multiprocessing
+        with multiprocessing.Pool(workers) as pool:
+            func = functools.partial(preprocess_chunk, verbose=verbose)
+            for result in pool.imap(func, chunks):
+                write_chunk(fh_clean, fh_log, changelog, *result, verbose=verbose)
+    else:
+        for chunk in chunks:
+            result = preprocess_chunk(chunk, verbose)
+            write_chunk(fh_clean, fh_log, changelog, *result, verbose=verbose)
+    if verbose: eprint('...done!\n')
+
+def read_chunks(fh_in, chunk_size):
+    """ yield lists of (sent_id, line), skipping empty lines """
+    sent_id = -1
+    chunk = []
+    for line in fh_in:
+        line = line.strip()
+        if line == "": continue
+        sent_id += 1
+        chunk.append((sent_id, line))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk: yield chunk
+
+def preprocess_chunk(chunk, verbose=False):
+    """ preprocess a list of (sent_id, line); return clean lines and log rows
+    as strings, the records of the structured log, and (if verbose) the
+    before/after pairs as a string """
+    fh_log = io.StringIO()
+    clean = []
+    records = []
+    before_after = []
+    for sent_id, line in chunk:
+        pos = fh_log.tell()
+        # with passitve to active transformation
+        # line_new = preprocess_line(line, fh_log, LOG_PATTERN, sent_id, p2a, corenlp)
+
+        # no passive to active transformation
+        line_new = preprocess_line(line, fh_log, LOG_PATTERN, sent_id)
+        clean.append(line_new)
+        if fh_log.tell() != pos:  # sentence changed
+            rows = fh_log.getvalue()[pos:]
+            records.append((sent_id,) + log_record(line, line_new, rows))
+        if verbose: before_after.append('\nbefore: {}\nafter : {}\n'.format(line, line_new))
+    return '\n'.join(clean) + '\n', fh_log.getvalue(), records, ''.join(before_after)
+
+def log_record(line, line_new, rows):
+    """ (len_sent, changes) of one sentence for the structured log,
+    from its rows in the csv log """
+    from changelog import change_tokens
+    words = line_new.split()
+    changes = []
+    for row in rows.splitlines():
+        _, before, after, idx, _ = row.split(',')
+        if before == "a-lot-of":
+            # fix_a_lot_of() logs no position: it is every `much` of the
+            # clean sentence, unless the sentence already had one
+            if 'much' in line.lower().split(): idxs = [-1]
+            else: idxs = [i for i, w in enumerate(words) if w.lower() == 'much']
+        else: idxs = [int(idx)]
+        for i in idxs:
+            changes.append({"before": before, "after": after, "idx": i,
+                            "tokens": change_tokens(before)})
+    return len(words), changes
+
+def write_chunk(fh_clean, fh_log, changelog, clean, log, records, before_after, verbose):
+    fh_clean.write(clean)
+    fh_log.write(log)
+    if changelog:
+        for sent_id, len_sent, changes in records:
+            changelog.write(sent_id, len_sent, changes)
+    if verbose: sys.stderr.write(before_after)
 
 def preprocess_line(line, fh_log, s_pattern, sent_id, p2a=None, corenlp=None):
-    """ preprocess one line """
+    """ preprocess one line
+
+    same rewrites, in the same order, as the original chain of str.replace and
+    re.sub, but driven by the tables above so that rewrites whose gate is not
+    in the line are skipped
+    """
     line_lower = line.lower()
 
     # ----------------------------------------------
-    # change `#` to `number`
+    # change `#` to `number`, `a group of` -> some
     # e.g.: # 6 tries her best to help her team to victory
-    line = line.replace("#", "number")
-
-    # ----------------------------------------------
-    # green/blue ... colored -> green/blue
-    #line = line.replace("blue colored", "blue").replace("green colored", "green").\
-    #    replace("brown colored", "brown").replace("dark colored", "dark").\
-    #    replace("light colored", "light").replace("orange colored", "orange").\
-    #    replace("purple colored", "purple")
-
-    # ----------------------------------------------
-    # a group of -> some
-    line = line.replace("A group of four", "Four").replace("A group of five", "Five")
-    line = line.replace("A cluster of four", "Four")
-    line = line.replace("A group of", "Some").replace("a group of", "some")
+    line = apply_rewrites(line, REWRITES_GROUP)
 
     # ----------------------------------------------
     # fix ``a lot of''
@@ -133,51 +272,10 @@ def preprocess_line(line, fh_log, s_pattern, sent_id, p2a=None, corenlp=None):
         line = fix_a_lot_of(line, fh_log, s_pattern, sent_id)
 
     # ----------------------------------------------
-    # someone/body -> some person; nobody/no one -> no person
-    line = PAT_someone.sub("some person", line)
-    line = PAT_noone.sub("no person", line)
-    line = PAT_everyone.sub("every person", line)
-
-    line = PAT_something.sub("some thing", line)
-    line = PAT_nothing.sub("no thing", line)
-    line = PAT_everything.sub("every thing", line)
-
-    line = PAT_somewhere.sub("some place", line)
-    line = PAT_nowhere.sub("no place", line)
-    line = PAT_everywhere.sub("every place", line)
-
-    # ----------------------------------------------
-    # n't -> not
-    line = line.replace(" n't ", " not ")
-
-    # ----------------------------------------------
-    # the -> a
-    # line = line.replace("The ", "A ").replace(" the ", " a ")
-
-    # ----------------------------------------------
-    # there is no ... -> no boy/woman/person ...
-    #if PAT_there_be_no.match(line):
-    #    new_sent, new_sent2, diff = utils.there_be_no_sent(line, corenlp)
-    #    line = new_sent2
-    # else:  pass # TODO only pass2act if not "there be no"
-
-    # ----------------------------------------------
-    # pass2actPAT_a_few
-    #    line_old = line[:]
-    #    line = p2a.pass2act(line).strip('. ')
-    #    if line == line_old and line.endswith(" by a thing"):
-    #        line = line[:-11]  # remove by a thing if still not activized
-
-    # ----------------------------------------------
-    # numbers
-    line = line.replace('Two ', '2 ').replace(' two ', ' 2 ')
-    line = line.replace('Three ', '3 ').replace(' three ', ' 3 ')
-    line = line.replace('Four ', '4 ').replace(' four ', ' 4 ')
-    line = line.replace('Five ', '5 ').replace(' five ', ' 5 ')
-    line = line.replace('Six ', '6 ').replace(' six ', ' 6 ')
-    line = line.replace('Seven ', '7 ').replace(' seven ', ' 7 ')
-    line = line.replace('Eight ', '8 ').replace(' eight ', ' 8 ')
-    line = line.replace('Nine ', '9 ').replace(' nine ', ' 9 ')
+    # someone/body -> some person; nobody/no one -> no person; n't -> not
+    # two -> 2, Three -> 3, ...
+    line = apply_rewrites(line, REWRITES_PRONOUN)
+    line = apply_rewrites(line, REWRITES_NUMBER)
 
     # ----------------------------------------------
     if 'a few' in line_lower:
@@ -185,50 +283,44 @@ def preprocess_line(line, fh_log, s_pattern, sent_id, p2a=None, corenlp=None):
         # no need to write to log, just use 'several'
 
     # ----------------------------------------------
-    # fix quantifiers
-
-    line = PAT_more_than_n.sub("more-than-\\1", line)
-    line = PAT_less_than_n.sub("less-than-\\1", line)
-    line = PAT_at_least_n.sub("at-least-\\1", line)
-    line = PAT_at_most_n.sub("at-most-\\1", line)
-    line = PAT_exactly_n.sub("exactly-\\1", line)
-    line = PAT_some_but_not_all.sub("some-but-not-all", line)
-
-    quant_cnt = 0
-    new_line = []
-    len_sent = len(line.split())
-    for idx, word in enumerate(line.split()):
-        if word.lower() in QUANTIFIERS:
-            quant_cnt += 1
-            new_line.append(word)
-        # more than n, at least n -> some
-        elif word.lower().startswith("more-than-") or word.lower().startswith("at-least-"):
-            new_line.append("some")
-            # write to log
-            fh_log.write(s_pattern.format(str(sent_id), word, "some", str(idx), len_sent))
-        # less than n, at most n -> no
-        elif word.lower().startswith("less-than-") or word.lower().startswith("at-most-"):
-            new_line.append("no")
-            # write to log
-            fh_log.write(s_pattern.format(str(sent_id), word, "no", str(idx), len_sent))
-        # exactly n -> some
-        elif word.lower().startswith("exactly-"):
-            new_line.append("some")
-            fh_log.write(s_pattern.format(str(sent_id), word, "some", str(idx), len_sent))
-        # many -> most
-        # elif word.lower().startswith("many"):
-        #     new_line.append("every")
-        #     fh_log.write(s_pattern.format(str(sent_id), word, "every", str(idx), len_sent))
-        else:
-            new_line.append(word)
-
-    line = " ".join(new_line)
+    # fix quantifiers: more than n -> more-than-n, ...
+    line = apply_rewrites(line, REWRITES_QUANT)
+
+    words = line.split()
+    if '-' in line:  # only tokens like at-most-5 are changed
+        len_sent = len(words)
+        for idx, word in enumerate(words):
+            word_lower = word.lower()
+            # more than n, at least n, exactly n -> some
+            if word_lower.startswith(PREFIX_TO_SOME):
+                words[idx] = "some"
+                # write to log
+                fh_log.write(s_pattern.format(str(sent_id), word, "some", str(idx), len_sent))
+            # less than n, at most n -> no
+            elif word_lower.startswith(PREFIX_TO_NO):
+                words[idx] = "no"
+                # write to log
+                fh_log.write(s_pattern.format(str(sent_id), word, "no", str(idx), len_sent))
+
+    line = " ".join(words)
 
     # make sure first letter is capital
     line = line[0].upper() + line[1:]
 
     return line
 
+def apply_rewrites(line, rewrites):
+    """ apply a rewrite table: [ (gates, [(old, new), ...]), ... ]
+    old is either a str (str.replace) or a compiled regex (re.sub) """
+    for gates, rules in rewrites:
+        for gate in gates:
+            if gate in line: break
+        else: continue  # none of the gates in line, nothing to rewrite
+        for old, new in rules:
+            if old.__class__ is str: line = line.replace(old, new)
+            else: line = old.sub(new, line)
+    return line
+
 def subst(line, quantifier, fh_log, s_pattern, sent_id, verbose=False):
     """ substitute: word = most/least """
     # find the index of `at' in line.split()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+'''
+the *_pretty.html of parse.sh, straight from the polarized trees
+
+Before, parse.sh wrote the transccg xml, then ran visualize.py of
+ccg2lambda on it (files_for_ccg2lambda/), which parsed it with lxml and
+rebuilt every tree to render it. --html FILE on mytree2transccg.py
+renders the same html from the CCGtree objects, one sentence at a time
+as they are polarized: categories, ETtypes, polarity arrows and impSigns
+(as visualization_tools.convert_root_to_mathml, with ccg2lambda's
+settings: upwards trees, features as subscripts).
+
+Needs neither lxml nor ccg2lambda. Sentences that did not parse are
+skipped, as they are not in the xml.
+'''
+
+import re
+from html import escape
+
+__author__ = "Hai Hu"
+
+from formats import FormatWriter
+
+# as visualization_tools.py
+FEATURE_SIZE = 0.8
+OTHER_SIZE = 1.0
+CATEGORY_COLOR = 'Red'
+FEATURE_COLOR = 'Purple'
+LEXICAL_COLOR = 'Black'
+ENTITY_COLOR = 'Green'
+POS_COLOR = 'Green'
+ETTYPE_COLOR = 'Blue'
+POLARITY_COLOR = 'Navy'
+
+HTML_HEAD = """\
+    <!DOCTYPE html>
+    <html lang='en'>
+    <head>
+      <meta charset='UTF-8'/>
+      <title>CCG to Lambda conversion</title>
+      <style>
+        body {
+          font-size: 1em;
+        }
+      </style>
+      <script type="text/javascript"
+              src="http://cdn.mathjax.org/mathjax/latest/MathJax.js?config=TeX-AMS-MML_HTMLorMML">
+      </script>
+    </head>
+    <body>
+    """
+HTML_TAIL = "\n    </body>\n    </html>\n    \n"
+
+RE_CATEGORY = re.compile(r'([\w\\/()]+)(\[.+?\])*')
+
+class HtmlWriter(FormatWriter):
+    """ the html of visualize.py over the transccg xml. The last sentence is
+    the Conclusion, the others Premises, so a sentence is written when the
+    next one comes (or at end()) """
+    def begin(self):
+        self.n_sent = 0
+        self.pending = None
+        self.stream.write(HTML_HEAD)
+
+    def sentence(self, idx, t, line, error, raw):
+        if t is None: return
+        self.flush('Premise {}'.format(self.n_sent - 1))
+        self.pending = (idx, t)
+        self.n_sent += 1
+
+    def flush(self, label):
+        if self.pending is None: return
+        idx, t = self.pending
+        self.pending = None
+        surf = ' '.join(leaf.word if leaf.word != '*' else leaf.lemma for leaf in t.leafNodes)
+        self.stream.write("<p>{0}, tree {1}: {2}</p>\n".format(label, 's{}_ccg0'.format(idx), surf)
+                          + "<math xmlns='http://www.w3.org/1998/Math/MathML'>\n"
+                          + node_mathml(t.root) + "</math>\n")
+
+    def end(self):
+        self.flush('Conclusion')
+        self.stream.write(HTML_TAIL)
+
+def node_mathml(node):
+    """ convert_node_to_mathml() of the span of node """
+    polarity = {'UP': '↑', 'DOWN': '↓'}.get(node.cat.monotonicity, '=')
+    if node.impSign: polarity += ' : ' + node.impSign
+    if not node.children:
+        return leaf_mathml(node.cat.originalType, str(node.cat.semCat), polarity,
+                           str(node.word), str(node.pos), str(node.entity))
+    return span_mathml(node.cat.originalType, str(node.cat.semCat), polarity, str(node.ruleType),
+                       ''.join(node_mathml(child) for child in node.children))
+
+def leaf_mathml(category, ETtype, polarity, word, pos, entity):
+    """ a leaf, with the attributes of its span and token in the xml (the
+    xml always has an entity, "None" if there is none) """
+    category_mathml = category2mathml(category.strip())
+    surf_mathml = mtext(escape(word, quote=False), LEXICAL_COLOR)
+    if pos == '.':  # punctuation
+        return fraction(category_mathml, surf_mathml, '0')
+    pos_mathml = mtext(escape(pos, quote=False), POS_COLOR) + \
+        "<mtext>,</mtext><mspace width='.1em'/>" + mtext(escape(entity, quote=False), ENTITY_COLOR)
+    mathml = fraction(fraction(category_mathml, pos_mathml, '0'), surf_mathml, '0')
+    return polarize(mathml, ETtype, polarity)
+
+def span_mathml(category, ETtype, polarity, rule, children_mathml):
+    """ a non-terminal, over the mathml of its children """
+    mathml = fraction(category2mathml(category.strip()), children_mathml, '3', rule)
+    return polarize(mathml, ETtype, polarity)
+
+def polarize(mathml, ETtype, polarity):
+    """ the ETtype, then the polarity below mathml """
+    mathml = fraction(mtext(ETtype.replace('(e,t)', 'et').strip(), ETTYPE_COLOR), mathml, '0')
+    return fraction(mtext(polarity, POLARITY_COLOR), mathml, '0')
+
+def fraction(numerator, denominator, line_thickness, rule=''):
+    """ get_fraction_mathml(), upwards: the numerator goes below """
+    mathml = "<mfrac linethickness='" + line_thickness + "px'>\n" \
+             + "  <mrow>" + denominator + "</mrow>\n" \
+             + "  <mrow>" + numerator + "</mrow>\n" \
+             + "</mfrac>\n"
+    if rule: mathml = "<mrow><mo>" + escape(rule, quote=False) + "</mo>" + mathml + "</mrow>"
+    return mathml
+
+def category2mathml(category):
+    """ get_category_mathml(): the features of each basic category as subscripts """
+    mathml = ''
+    for cat, feat in RE_CATEGORY.findall(category):
+        cat_mathml = "  <mi mathvariant='italic' fontsize='{}' color='{}'>{}  </mi>\n".format(
+            OTHER_SIZE, CATEGORY_COLOR, cat)
+        if feat:
+            mathml += "<msub>\n" + cat_mathml + "  <mrow>\n" \
+                      + "    <mi mathvariant='italic' fontsize='{}' color='{}'>{}  </mi>\n".format(
+                          FEATURE_SIZE, FEATURE_COLOR, feat) \
+                      + "  </mrow>\n</msub>\n"
+        else: mathml += cat_mathml
+    return mathml
+
+def mtext(text, color):
+    return "<mtext  fontsize='{}' color='{}'>{}</mtext>\n".format(OTHER_SIZE, color, text)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+'''
+profiling mode for the polarization pipeline
+
+-profile PREFIX on getMono.py / --profile PREFIX on mytree2transccg.py writes
+
+- PREFIX.prof          pstats of the whole run (all stages merged)
+- PREFIX.STAGE.prof    pstats of one stage: read, build, fixQuantifier, ...
+- PREFIX.collapsed     collapsed stacks (`stage;frame;frame count` per line)
+                       for flamegraph.pl / speedscope, from a sampling
+                       profiler (SIGPROF every 1ms of CPU time; Unix only)
+
+read them with: python -m pstats PREFIX.prof, or flamegraph.pl PREFIX.collapsed
+
+With -profile-every N only every Nth sentence is profiled, to keep the
+overhead low on big inputs. Stages run outside any sentence (read, output)
+are always profiled.
+'''
+
+import os, sys, signal, cProfile, pstats, collections
+
+__author__ = "Hai Hu"
+
+from timers import NULL_STAGE
+
+HOOK_FILES = {'timers.py', 'profiling.py'}
+
+class StageProfiler:
+    """ same interface as timers.StageTimers: sentence(), stage(), end_sentence() """
+    def __init__(self, prefix, every=1, interval=0.001):
+        self.prefix = prefix
+        self.every = max(1, every)
+        self.interval = interval
+        self.profiles = {}      # { stage : cProfile.Profile }
+        self.stacks = collections.Counter()  # { 'stage;frame;frame' : samples }
+        self.n_sent = 0
+        self.sampled = True     # profile the current sentence?
+        self.current_stage = None
+        self.base_frame = None  # frame that entered the current stage
+        self.sampling = hasattr(signal, 'setitimer')
+        if self.sampling:
+            signal.signal(signal.SIGPROF, self.sample)
+            signal.setitimer(signal.ITIMER_PROF, interval, interval)
+
+    def sentence(self, idx=None):
+        self.sampled = self.n_sent % self.every == 0
+        self.n_sent += 1
+
+    def end_sentence(self):
+        self.sampled = True
+
+    def stage(self, name):
+        if not self.sampled: return NULL_STAGE
+        return ProfiledStage(self, name)
+
+    def sample(self, signum, frame):
+        """ SIGPROF handler: count the stack below the frame that entered the stage """
+        if self.current_stage is None: return
+        stack = []
+        while frame is not None and frame is not self.base_frame:
+            code = frame.f_code
+            stack.append('{}:{}'.format(os.path.basename(code.co_filename),
+                                        getattr(code, 'co_qualname', code.co_name)))
+            frame = frame.f_back
+        stack.append(self.current_stage)
+        self.stacks[';'.join(reversed(stack))] += 1
+
+    def close(self):
+        """ stop sampling and write the .prof and .collapsed files """
+        if self.sampling:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        whole = None
+        for name, profile in self.profiles.items():
+            stats = pstats.Stats(profile)
+            stats.dump_stats('{}.{}.prof'.format(self.prefix, name))
+            if whole is None: whole = stats
+            else: whole.add(stats)
+        if whole is not None: whole.dump_stats(self.prefix + '.prof')
+        with open(self.prefix + '.collapsed', 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write('{} {}\n'.format(stack, count))
+        print('profile of {} stage(s), {} of {} sentence(s), written to {}.*'.format(
+            len(self.profiles), -(-self.n_sent // self.every), self.n_sent, self.prefix),
+            file=sys.stderr)
+
+class ProfiledStage:
+    __slots__ = ('profiler', 'name', 'profile')
+
+    def __init__(self, profiler, name):
+        self.profiler, self.name = profiler, name
+        self.profile = profiler.profiles.get(name)
+        if self.profile is None:
+            self.profile = profiler.profiles[name] = cProfile.Profile()
+
+    def __enter__(self):
+        # the frame of the `with`, above the stage wrappers of timers.py
+        frame = sys._getframe(1)
+        while os.path.basename(frame.f_code.co_filename) in HOOK_FILES: frame = frame.f_back
+        self.profiler.current_stage = self.name
+        self.profiler.base_frame = frame
+        self.profile.enable()
+
+    def __exit__(self, *exc):
+        self.profile.disable()
+        self.profiler.current_stage = None
+        self.profiler.base_frame = None
+        return False
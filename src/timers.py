@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+'''
+stage timers for the polarization pipeline
+
+build -> fixQuantifier -> fixNot -> fixRC -> mark -> polarize (+ getImpSign)
+
+Off unless asked for: with -timers on getMono.py / --timers on
+mytree2transccg.py, or for library use (getMono.polarize()) with the
+environment variable CCG2MONO_TIMERS=report.json (- for stderr); add
+CCG2MONO_TIMERS_PER_SENT=1 for per-sentence timings.
+
+When off, the pipeline gets no_stage(), which returns one shared no-op
+context manager, and Cat.__init__ is left alone. stage_hooks() combines
+the timers with the profiler of profiling.py and the other hooks.
+
+Progress writes the periodic progress line of corpus runs.
+
+The report is JSON, times in ms:
+{"sentences": 3, "total_ms": ..., "run": {"read": ...},
+ "stages": {"build": {"count", "total_ms", "mean_ms", "p50_ms", "p90_ms",
+                      "p99_ms", "max_ms"}, ...},
+ "per_sentence": [{"idx": 0, "build": ..., ...}, ...]}
+
+stage statistics are over sentences. `cat` is the time spent constructing
+Cat objects, which is already counted in the stage that built them, so it
+is not part of total_ms.
+'''
+
+import os, sys, time, contextlib
+
+__author__ = "Hai Hu"
+
+ENV_TIMERS = 'CCG2MONO_TIMERS'
+ENV_TIMERS_PER_SENT = 'CCG2MONO_TIMERS_PER_SENT'
+
+STAGES = ('build', 'fixQuantifier', 'fixNot', 'fixRC', 'mark', 'polarize')  # getImpSign is done by polarize
+NESTED_STAGES = ('cat',)  # timed inside the other stages
+
+NULL_STAGE = contextlib.nullcontext()
+
+def no_stage(name):
+    """ stage() of disabled timers """
+    return NULL_STAGE
+
+def stage_hooks(hooks):
+    """ stage() that enters the stage of every hook (StageTimers,
+    profiling.StageProfiler); no_stage if there is none """
+    if not hooks: return no_stage
+    if len(hooks) == 1: return hooks[0].stage
+    return lambda name: MultiStage([hook.stage(name) for hook in hooks])
+
+class MultiStage:
+    __slots__ = ('stages',)
+
+    def __init__(self, stages):
+        self.stages = stages
+
+    def __enter__(self):
+        for stage in self.stages: stage.__enter__()
+
+    def __exit__(self, *exc):
+        for stage in reversed(self.stages): stage.__exit__(*exc)
+        return False
+
+class StageTimers:
+    def __init__(self, per_sentence=False):
+        self.per_sentence = per_sentence
+        self.times = {}         # { stage : [ seconds of each sentence ] }
+        self.run = {}           # { stage : seconds }, for stages outside any sentence
+        self.sentences = []     # [ {'idx':0, stage:seconds} ], if per_sentence
+        self.current = None     # { stage : seconds } of the current sentence
+        self.n_sent = 0
+        self.instrumented = []  # [ (cls, name, original method) ]
+
+    def sentence(self, idx=None):
+        """ start timing a new sentence """
+        self.end_sentence()
+        self.current = {'idx': self.n_sent if idx is None else idx}
+        self.n_sent += 1
+
+    def end_sentence(self):
+        if self.current is None: return
+        for name, seconds in self.current.items():
+            if name != 'idx': self.times.setdefault(name, []).append(seconds)
+        if self.per_sentence: self.sentences.append(self.current)
+        self.current = None
+
+    def stage(self, name):
+        """ context manager timing one stage """
+        return Stage(self, name)
+
+    def add(self, name, seconds):
+        if self.current is None:
+            self.run[name] = self.run.get(name, 0) + seconds
+        else:
+            self.current[name] = self.current.get(name, 0) + seconds
+
+    def instrument(self, cls, name, stage):
+        """ time every call of cls.name as `stage`; nested calls (e.g.
+        Cat.__init__ building the left and right Cat) are counted once """
+        original = getattr(cls, name)
+        timers = self
+        depth = [0]
+        def timed(*args, **kwargs):
+            if depth[0]: return original(*args, **kwargs)
+            depth[0] += 1
+            start = time.perf_counter()
+            try: return original(*args, **kwargs)
+            finally:
+                timers.add(stage, time.perf_counter() - start)
+                depth[0] -= 1
+        setattr(cls, name, timed)
+        self.instrumented.append((cls, name, original))
+
+    def uninstrument(self):
+        for cls, name, original in reversed(self.instrumented):
+            setattr(cls, name, original)
+        self.instrumented = []
+
+    def report(self):
+        self.end_sentence()
+        stages = {}
+        for name in STAGES + NESTED_STAGES + tuple(sorted(set(self.times) - set(STAGES + NESTED_STAGES))):
+            if name in self.times: stages[name] = summary(self.times[name])
+        report = {
+            'sentences': self.n_sent,
+            'total_ms': ms(sum(sum(secs) for name, secs in self.times.items()
+                               if name not in NESTED_STAGES)),
+            'run': {name: ms(secs) for name, secs in self.run.items()},
+            'stages': stages,
+        }
+        if self.per_sentence:
+            report['per_sentence'] = [{name: (value if name == 'idx' else ms(value))
+                                       for name, value in sent.items()}
+                                      for sent in self.sentences]
+        return report
+
+    def write(self, fn):
+        """ write the JSON report to fn, or to stderr if fn is - """
+        import json
+        if fn == '-':
+            json.dump(self.report(), sys.stderr, indent=1)
+            sys.stderr.write('\n')
+        else:
+            with open(fn, 'w') as f:
+                json.dump(self.report(), f, indent=1)
+                f.write('\n')
+
+class Stage:
+    __slots__ = ('timers', 'name', 'start')
+
+    def __init__(self, timers, name):
+        self.timers, self.name = timers, name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timers.add(self.name, time.perf_counter() - self.start)
+        return False
+
+class Progress:
+    """ a progress line on stderr every `every` seconds, e.g.
+    progress: 12000/100000 sentences, 310.5 sent/s, eta 251 s
+    same interface as StageTimers, so it goes through stage_hooks() """
+    def __init__(self, every=10.0, total=None):
+        self.every = every
+        self.total = total
+        self.n_sent = 0
+        self.start = time.perf_counter()
+        self.next = self.start + every
+
+    def sentence(self, idx=None):
+        self.n_sent += 1
+        now = time.perf_counter()
+        if now >= self.next:
+            self.write(now)
+            self.next = now + self.every
+
+    def end_sentence(self):
+        pass
+
+    def stage(self, name):
+        return NULL_STAGE
+
+    def write(self, now):
+        secs = now - self.start
+        rate = self.n_sent / secs if secs else 0
+        line = 'progress: {}{} sentences, {:.1f} sent/s'.format(
+            self.n_sent, '/{}'.format(self.total) if self.total else '', rate)
+        if self.total and rate:
+            line += ', eta {:.0f} s'.format((self.total - self.n_sent) / rate)
+        sys.stderr.write(line + '\n')
+
+    def close(self):
+        """ the last line, if any was written """
+        if time.perf_counter() - self.start >= self.every: self.write(time.perf_counter())
+
+def ms(seconds):
+    return round(seconds * 1000, 4)
+
+def percentile(values_sorted, q):
+    """ nearest-rank percentile, q in [0, 100] """
+    idx = max(0, -(-len(values_sorted) * q // 100) - 1)
+    return values_sorted[int(idx)]
+
+def summary(values):
+    values = sorted(values)
+    return {'count': len(values), 'total_ms': ms(sum(values)),
+            'mean_ms': ms(sum(values) / len(values)),
+            'p50_ms': ms(percentile(values, 50)), 'p90_ms': ms(percentile(values, 90)),
+            'p99_ms': ms(percentile(values, 99)), 'max_ms': ms(values[-1])}
+
+def from_env():
+    """ StageTimers if CCG2MONO_TIMERS is set, else None """
+    if not os.environ.get(ENV_TIMERS): return None
+    return StageTimers(per_sentence=bool(os.environ.get(ENV_TIMERS_PER_SENT)))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+'''
+small helpers shared by getMono.py, preprocess.py and mytree2transccg.py
+
+kept free of heavy imports, so that `from utils import eprint` is cheap
+
+Hai Hu
+'''
+
+import os, sys
+
+__author__ = "Hai Hu"
+
+ERROR, WARNING, INFO, DEBUG = 40, 30, 20, 10
+LEVELS = {'error': ERROR, 'warning': WARNING, 'info': INFO, 'debug': DEBUG}
+ENV_LOG = 'CCG2MONO_LOG'
+
+def eprint(*args, **kwargs):
+    """ print to stderr """
+    print(*args, file=sys.stderr, **kwargs)
+
+class Log:
+    """ leveled messages to stderr
+
+    log.debug('building tree {}...', idx) formats its arguments only if
+    debug messages are on; a message below the level costs one comparison.
+    Levels: error, warning (the default), info (reading banners), debug
+    (per-sentence diagnostics). The level comes from -log-level /
+    --log-level, or from the environment variable CCG2MONO_LOG.
+    """
+    def __init__(self, level=WARNING):
+        self.level = level
+
+    def set_level(self, level):
+        """ level: a name of LEVELS or a number """
+        self.level = LEVELS[level.lower()] if isinstance(level, str) else level
+
+    def enabled(self, level):
+        """ guard for diagnostics that are expensive to produce, e.g. tree dumps """
+        return level >= self.level
+
+    def write(self, msg, args):
+        sys.stderr.write((msg.format(*args) if args else str(msg)) + '\n')
+
+    def error(self, msg, *args):
+        if self.level <= ERROR: self.write(msg, args)
+
+    def warning(self, msg, *args):
+        if self.level <= WARNING: self.write(msg, args)
+
+    def info(self, msg, *args):
+        if self.level <= INFO: self.write(msg, args)
+
+    def debug(self, msg, *args):
+        if self.level <= DEBUG: self.write(msg, args)
+
+log = Log(LEVELS.get(os.environ.get(ENV_LOG, '').lower(), WARNING))
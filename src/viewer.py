@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+'''
+local viewer of a big transccg xml, rendered on demand
+
+pretty.py (--html) and visualize.py render every sentence into one page,
+which takes long and is too big for a browser with 10k+ sentences.
+viewer.py serves the xml on http://localhost:PORT instead, and renders
+the MathML of a tree only when its page is requested:
+
+/                   the sentences with their arrows, a page at a time
+/sent/ID            the tree of sentence ID (as in the .tok.clean file)
+/search?q=...       a sentence ID, or a word: the sentences that have it
+
+test.easyccg2transccg.xml.idx: offset index, the sorted sentence IDs
+followed by the byte offset of their <sentence>, both as arrays of int64
+in native byte order (as the .idx of changelog.py). It is built by one
+pass over the xml the first time (or when the xml is newer), then mmapped,
+so opening a sentence is a binary search and one seek, whatever the size
+of the corpus. The word index for search is built on the first search.
+
+usage: ./viewer.py test.easyccg2transccg.xml [--port 8000]
+'''
+
+import os, re, mmap, array, bisect
+import xml.etree.ElementTree as ET
+from html import escape
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit, parse_qs, quote
+
+__author__ = "Hai Hu"
+
+from utils import eprint, log, DEBUG
+from pretty import HTML_HEAD, HTML_TAIL, leaf_mathml, span_mathml
+
+PAGE_SIZE = 50
+RE_SENT_ID = re.compile(rb'<ccg root="s(\d+)_sp0"')
+RE_SURF = re.compile(rb' surf="([^"]*)"')
+
+class SentenceIndex:
+    """ read-only view of a transccg xml: get(sent_id) is the <sentence>
+    element of that sentence, or None """
+    def __init__(self, fn):
+        self.fn = fn
+        self.fh = open(fn, 'rb')
+        self.mm = None
+        self.words = None  # { lower-cased word : array of positions in sent_ids }
+        fn_idx = fn + '.idx'
+        if not os.path.isfile(fn_idx) or os.path.getmtime(fn_idx) < os.path.getmtime(fn):
+            sent_ids, offsets = self.build_index()
+            with open(fn_idx, 'wb') as fh_idx:
+                sent_ids.tofile(fh_idx)
+                offsets.tofile(fh_idx)
+        if os.path.getsize(fn_idx) > 0:
+            with open(fn_idx, 'rb') as fh_idx:
+                self.mm = mmap.mmap(fh_idx.fileno(), 0, access=mmap.ACCESS_READ)
+            index = memoryview(self.mm).cast('q')
+            n = len(index) // 2
+            self.sent_ids, self.offsets = index[:n], index[n:]
+        else: self.sent_ids, self.offsets = [], []
+
+    def build_index(self):
+        """ (sent_ids, offsets), sorted by sent_id """
+        pairs = []
+        offset = start = 0
+        for line in self.fh:
+            if line.startswith(b'<sentence>'): start = offset
+            elif line.startswith(b'<ccg root='):
+                pairs.append((int(RE_SENT_ID.match(line).group(1)), start))
+            offset += len(line)
+        pairs.sort()
+        return array.array('q', [p[0] for p in pairs]), array.array('q', [p[1] for p in pairs])
+
+    def position(self, sent_id):
+        """ index of sent_id in sent_ids, or None """
+        i = bisect.bisect_left(self.sent_ids, sent_id)
+        if i == len(self.sent_ids) or self.sent_ids[i] != sent_id: return None
+        return i
+
+    def read(self, i):
+        """ the text of the <sentence> at position i """
+        self.fh.seek(self.offsets[i])
+        lines = []
+        for line in self.fh:
+            lines.append(line)
+            if line.startswith(b'</sentence>'): break
+        return b''.join(lines)
+
+    def get(self, sent_id):
+        i = self.position(sent_id)
+        return None if i is None else ET.fromstring(self.read(i))
+
+    def search(self, word):
+        """ positions of the sentences with word (case-insensitive) """
+        if self.words is None:
+            self.words = {}
+            for i in range(len(self.sent_ids)):
+                for surf in set(RE_SURF.findall(self.read(i).split(b'<ccg ', 1)[0])):
+                    self.words.setdefault(surf.decode().lower(), array.array('q')).append(i)
+        return self.words.get(word.lower(), ())
+
+    def __len__(self):
+        return len(self.sent_ids)
+
+def sentence_mathml(sentence):
+    """ the MathML of a <sentence> element, as visualize.py """
+    tokens = {token.get('id'): token for token in sentence.find('tokens')}
+    ccg = sentence.find('ccg')
+    spans = {span.get('id'): span for span in ccg}
+    def helper(span):
+        if span.get('child') is None:
+            token = tokens[span.get('terminal')]
+            return leaf_mathml(span.get('category'), span.get('ETtype'), span.get('polarity'),
+                               token.get('surf'), token.get('pos'), token.get('entity'))
+        return span_mathml(span.get('category'), span.get('ETtype'), span.get('polarity'),
+                           span.get('rule'),
+                           ''.join(helper(spans[child]) for child in span.get('child').split()))
+    return "<math xmlns='http://www.w3.org/1998/Math/MathML'>\n" + \
+        helper(spans[ccg.get('root')]) + "</math>\n"
+
+def sentence_text(sentence):
+    """ the words of a <sentence> element with their arrows """
+    return ' '.join(token.get('surf') + token.get('polarity') for token in sentence.find('tokens'))
+
+class ViewerHandler(BaseHTTPRequestHandler):
+    """ the pages of the viewer; self.server.index is the SentenceIndex """
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        try: page = max(0, int(query.get('page', ['0'])[0]))
+        except ValueError: page = 0
+        index = self.server.index
+        if url.path == '/':
+            self.listing(range(len(index)), page, '/?')
+        elif url.path.startswith('/sent/') and url.path[6:].isdigit():
+            self.sentence(int(url.path[6:]))
+        elif url.path == '/search':
+            q = query.get('q', [''])[0].strip()
+            if q.isdigit(): self.redirect('/sent/' + q)
+            else: self.listing(index.search(q), page, '/search?q={}&'.format(quote(q)),
+                               'sentences with {}'.format(q))
+        else: self.send_page('not found', '<p>not found</p>', 404)
+
+    def listing(self, positions, page, url, title=None):
+        index = self.server.index
+        start = page * PAGE_SIZE
+        rows = []
+        for i in positions[start:start + PAGE_SIZE]:
+            sent_id = index.sent_ids[i]
+            try: text = escape(sentence_text(ET.fromstring(index.read(i))))
+            except ET.ParseError: text = '(cannot read this sentence)'
+            rows.append('<li value="{0}"><a href="/sent/{0}">{1}</a></li>'.format(sent_id, text))
+        nav = []
+        if page > 0: nav.append('<a href="{}page={}">previous</a>'.format(url, page - 1))
+        if start + PAGE_SIZE < len(positions):
+            nav.append('<a href="{}page={}">next</a>'.format(url, page + 1))
+        title = '{} ({} sentences)'.format(title or self.server.index.fn, len(positions))
+        self.send_page(title, '<ol>\n{}\n</ol>\n<p>{}</p>\n'.format('\n'.join(rows), ' | '.join(nav)))
+
+    def sentence(self, sent_id):
+        index = self.server.index
+        try: sentence = index.get(sent_id)
+        except ET.ParseError as e:
+            self.send_page('sentence {}'.format(sent_id),
+                           '<p>cannot read this sentence: {}</p>'.format(escape(str(e))))
+            return
+        if sentence is None:
+            self.send_page('not found', '<p>no sentence {}</p>'.format(sent_id), 404)
+            return
+        i = index.position(sent_id)
+        nav = []
+        if i > 0: nav.append('<a href="/sent/{}">previous</a>'.format(index.sent_ids[i - 1]))
+        if i + 1 < len(index): nav.append('<a href="/sent/{}">next</a>'.format(index.sent_ids[i + 1]))
+        nav.append('<a href="/?page={}">list</a>'.format(i // PAGE_SIZE))
+        self.send_page('sentence {}'.format(sent_id),
+                       '<p>{}</p>\n{}<p>{}</p>\n'.format(escape(sentence_text(sentence)),
+                                                          sentence_mathml(sentence), ' | '.join(nav)))
+
+    def send_page(self, title, body, status=200):
+        html = HTML_HEAD + '<form action="/search"><a href="/">ccg2mono</a> ' \
+            '<input name="q" placeholder="sentence ID or word"/></form>\n' \
+            '<h3>{}</h3>\n{}'.format(escape(title), body) + HTML_TAIL
+        data = html.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def redirect(self, location):
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        if log.enabled(DEBUG): log.debug('{}', format % args)
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='browse a transccg xml (of mytree2transccg.py) '
+                                                 'in the browser, rendered on demand')
+    parser.add_argument('filename', help='transccg xml, e.g. test.easyccg2transccg.xml')
+    parser.add_argument('--port', dest='port', type=int, default=8000,
+                        help='[default: %(default)s]')
+    args = parser.parse_args()
+    index = SentenceIndex(args.filename)
+    server = HTTPServer(('localhost', args.port), ViewerHandler)
+    server.index = index
+    eprint('{} sentences, on http://localhost:{}/'.format(len(index), server.server_port))
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+'''
+slow-sentence watchdog for big runs
+
+-slow DIR on getMono.py / --slow DIR on mytree2transccg.py keeps the
+-slow-top N slowest sentences of the run, and every sentence that takes
+longer than -slow-budget SECONDS, and writes a reproducer bundle for each:
+
+DIR/sent{idx}/
+    sent.easyccg.parsed.txt     the parse of that sentence alone (or
+                                sent.candc.parsed.xml, sent.depccg.parsed.txt),
+                                renumbered as sentence 0
+    sent.tok.preprocess.jsonl   its preprocess changes (see changelog.py)
+    report.json                 idx, time, per-stage timings (ms), why it was kept
+    replay.sh                   runs the bundle through getMono.py with -timers -
+
+DIR/slow.json lists all bundles, slowest first.
+
+A sentence over budget gets its bundle as soon as the budget runs out
+(SIGALRM, Unix only), while it is still running, so a sentence that hangs
+or crashes the run is captured too; the bundle is rewritten with the full
+timings if the sentence finishes.
+'''
+
+import os, time, json, heapq, signal
+
+__author__ = "Hai Hu"
+
+from utils import eprint
+from changelog import ChangeLogWriter
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PARSE_FILES = {'candc': 'sent.candc.parsed.xml', 'easyccg': 'sent.easyccg.parsed.txt',
+               'depccg': 'sent.depccg.parsed.txt'}
+
+class SlowSentences:
+    """ same interface as timers.StageTimers: sentence(), stage(), end_sentence() """
+    def __init__(self, outdir, top=10, budget=None):
+        self.outdir = outdir
+        self.top = top
+        self.budget = budget
+        self.trees, self.parser = None, None
+        self.slowest = []       # min-heap of (seconds, idx, stage timings)
+        self.over_budget = {}   # { idx : (seconds, stage timings) }
+        self.idx = None         # current sentence
+        self.start = None
+        self.current = {}       # { stage : seconds } of the current sentence
+        self.current_stage = None
+        self.alarm = budget is not None and hasattr(signal, 'setitimer')
+        if self.alarm: signal.signal(signal.SIGALRM, self.on_budget)
+        os.makedirs(outdir, exist_ok=True)
+
+    def attach(self, trees, parser):
+        """ the CCGtrees the parses and changes are taken from """
+        self.trees, self.parser = trees, parser
+
+    def sentence(self, idx=None):
+        self.end_sentence()
+        self.idx, self.current = idx, {}
+        if self.alarm: signal.setitimer(signal.ITIMER_REAL, self.budget)
+        self.start = time.perf_counter()
+
+    def end_sentence(self):
+        if self.idx is None: return
+        seconds = time.perf_counter() - self.start
+        if self.alarm: signal.setitimer(signal.ITIMER_REAL, 0)
+        entry = (seconds, self.idx, self.current)
+        if len(self.slowest) < self.top: heapq.heappush(self.slowest, entry)
+        elif self.top and seconds > self.slowest[0][0]: heapq.heapreplace(self.slowest, entry)
+        if self.budget is not None and seconds > self.budget:
+            self.over_budget[self.idx] = (seconds, self.current)
+            self.write_bundle(self.idx, seconds, self.current, ['budget'])
+        self.idx = None
+
+    def stage(self, name):
+        return WatchedStage(self, name)
+
+    def on_budget(self, signum, frame):
+        """ SIGALRM: the current sentence is over budget and still running """
+        if self.idx is None: return
+        seconds = time.perf_counter() - self.start
+        self.write_bundle(self.idx, seconds, self.current, ['budget'],
+                          status='running {}'.format(self.current_stage))
+        eprint('watchdog: sentence {} over budget ({:.3f} s) in {}, bundle written to {}'.format(
+            self.idx, seconds, self.current_stage, self.bundle_dir(self.idx)))
+
+    def bundle_dir(self, idx):
+        return os.path.join(self.outdir, 'sent{}'.format(idx))
+
+    def write_bundle(self, idx, seconds, stages, reasons, status='done'):
+        dirname = self.bundle_dir(idx)
+        os.makedirs(dirname, exist_ok=True)
+        fn_parse = PARSE_FILES[self.parser]
+        with open(os.path.join(dirname, fn_parse), 'w') as f:
+            if self.parser == 'candc':
+                f.write('<?xml version="1.0" encoding="UTF-8"?>\n<candc>\n{}\n</candc>\n'.format(
+                    self.trees.CandC_xml[idx]))
+            else:
+                tree_str = self.trees.easyccg_str.get(idx, '')
+                if tree_str == 'failed_to_parse': tree_str = '\n'
+                f.write('ID=1\n' + tree_str)
+        changes = self.trees.idx2change(idx)
+        with ChangeLogWriter(os.path.join(dirname, 'sent.tok.preprocess.jsonl')) as changelog:
+            if changes: changelog.write_changes(0, changes)
+        report = {'idx': idx, 'parser': self.parser, 'ms': round(seconds * 1000, 4),
+                  'status': status, 'reasons': reasons,
+                  'stages_ms': {name: round(secs * 1000, 4) for name, secs in stages.items()}}
+        with open(os.path.join(dirname, 'report.json'), 'w') as f:
+            json.dump(report, f, indent=1)
+            f.write('\n')
+        fn_replay = os.path.join(dirname, 'replay.sh')
+        with open(fn_replay, 'w') as f:
+            f.write('#!/bin/bash\n# replay sentence {} of the run in isolation\n'
+                    'cd "$(dirname "$0")"\n'
+                    'python3 "${{CCG2MONO_SRC:-{}}}/getMono.py" -f {} '
+                    '-flog sent.tok.preprocess.jsonl -timers - "$@"\n'.format(idx, SRC_DIR, fn_parse))
+        os.chmod(fn_replay, 0o755)
+        return report
+
+    def close(self):
+        """ write the bundles of the slowest sentences and DIR/slow.json """
+        self.end_sentence()
+        if self.alarm: signal.signal(signal.SIGALRM, signal.SIG_DFL)
+        reports = []
+        kept = {idx: (seconds, stages, []) for idx, (seconds, stages) in self.over_budget.items()}
+        for rank, (seconds, idx, stages) in enumerate(sorted(self.slowest, reverse=True), 1):
+            kept.setdefault(idx, (seconds, stages, []))[2].append('top{}'.format(rank))
+        for idx, (seconds, stages, reasons) in kept.items():
+            if idx in self.over_budget: reasons.append('budget')
+            reports.append(self.write_bundle(idx, seconds, stages, reasons))
+        reports.sort(key=lambda report: -report['ms'])
+        with open(os.path.join(self.outdir, 'slow.json'), 'w') as f:
+            json.dump(reports, f, indent=1)
+            f.write('\n')
+        eprint('watchdog: {} slow sentence(s) ({} over budget), bundles in {}'.format(
+            len(reports), len(self.over_budget), self.outdir))
+
+class WatchedStage:
+    __slots__ = ('watchdog', 'name', 'start')
+
+    def __init__(self, watchdog, name):
+        self.watchdog, self.name = watchdog, name
+
+    def __enter__(self):
+        self.watchdog.current_stage = self.name
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        watchdog = self.watchdog
+        if watchdog.idx is not None:
+            watchdog.current[self.name] = watchdog.current.get(self.name, 0) \
+                                          + time.perf_counter() - self.start
+        watchdog.current_stage = None
+        return False
@@ -2,7 +2,10 @@ import argparse
 import xml.etree.ElementTree as ET
 
 """ Takes a polarity-labeled xml file from parse.sh and outputs tokenized
-strings followed by the polarity labels for those tokens. """
+strings followed by the polarity labels for those tokens.
+
+The same lines come straight from the polarizer, without the xml, with
+src/mytree2transccg.py ... --format text. """
 
 polarity_to_labels = {
     '\u2191': 'UP',
@@ -12,15 +15,21 @@ polarity_to_labels = {
 
 def main(args):
 
-    tree = ET.parse(args.in_file)
-    root = tree.getroot()
-
-    for sentence in root.iter('sentence'):
-        tokens = list(sentence.iter('token'))
+    # stream: each <sentence> is printed and dropped once it is read, so
+    # memory does not grow with the corpus
+    sentences = None
+    for event, elem in ET.iterparse(args.in_file, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'sentences': sentences = elem
+            continue
+        if elem.tag != 'sentence': continue
+        tokens = list(elem.iter('token'))
         string = ' '.join([token.attrib['surf'] for token in tokens])
         polarity = ' '.join([polarity_to_labels[token.attrib['polarity']] for token in tokens])
         print(string)
         print(polarity)
+        if sentences is not None: sentences.clear()
+        else: elem.clear()
 
 
 if __name__ == '__main__':